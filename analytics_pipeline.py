@@ -0,0 +1,137 @@
+from collections import defaultdict
+from utility import get_filename_extension
+import pandas as pd
+import csv
+
+'''
+Single pass analytics of one symbol and timeframe set, shared by the reports of Coin:
+    generate_retain_score, graph_look_ahead_data and graph_trading_simulation
+
+The historical scoring is brought up to date and read once, then the signal threshold, look ahead gains (see
+look_ahead.py), retain score aggregates and trade simulation rows are each derived from it on first use and held
+in memory, so generating every report of a symbol reads the scoring data once:
+    AnalyticsPipeline(Coin('INJ'), 'INJUSDT', []).generate_reports()
+'''
+
+
+class AnalyticsPipeline():
+    '''
+    Lazily computed analytics of a symbol_timeframes, every step runs at most once
+    '''
+
+    def __init__(self, coin, symbol, custom_timeframes, custom_threshold=None):
+
+        self.coin = coin # Coin object
+        self.symbol = symbol
+        self.custom_timeframes = custom_timeframes
+        self.custom_threshold = custom_threshold
+        self.filename_ext = get_filename_extension(custom_timeframes)
+        self.results = {} # step name: result
+        self.scoring_reads = 0 # reads of the historical scoring csv
+
+
+    def scoring(self):
+        '''
+        Returns the historical scoring DataFrame (index = UTS, columns 1.. = price, bull, bear, change, timeframe scores)
+        '''
+
+        if 'scoring' not in self.results:
+            self.coin.compute_historical_score(self.symbol, self.custom_timeframes) # latest scores
+            historical_score_path = f'{self.coin.historical_scoring_path}/{self.symbol}/historical_scoring_{self.symbol}_{self.filename_ext}.csv'
+            self.results['scoring'] = pd.read_csv(historical_score_path, index_col= 0, header=None, skiprows=1)
+            self.scoring_reads += 1
+        return self.results['scoring']
+
+
+    def threshold(self):
+        '''
+        Returns the custom threshold, or the optimal threshold (BULL:x|BEAR:y) of the scoring
+        '''
+
+        if 'threshold' not in self.results:
+            self.results['threshold'] = self.custom_threshold if self.custom_threshold else \
+                self.coin.optimise_signal_threshold(self.symbol, self.custom_timeframes, historical_DF=self.scoring())
+        return self.results['threshold']
+
+
+    def look_ahead(self):
+        '''
+        Returns the look_ahead_gains csv rows (without header), after appending the peaks of new scores
+        '''
+
+        if 'look_ahead' not in self.results:
+            look_ahead_gains_csv = self.coin.generate_look_ahead_gains(self.symbol, self.custom_timeframes, self.threshold(),
+                                                                       historical_scoring_DF=self.scoring())
+            with open(look_ahead_gains_csv, 'r') as infile:
+                lookahead_csv_reader = csv.reader(infile)
+                next(lookahead_csv_reader)
+                self.results['look_ahead'] = list(lookahead_csv_reader)
+        return self.results['look_ahead']
+
+
+    def retain_aggregates(self):
+        '''
+        Returns best gains per bull score and per bear score, and all gains per goal and look ahead
+        '''
+
+        if 'retain_aggregates' not in self.results:
+            bullscore_bestgain = defaultdict(list) # key = score, value = list of best %gains
+            bearscore_bestgain = defaultdict(list)
+            average_bestgain = {"buy_back":{"30m":[], "1h":[], "4h":[], "12h":[], "1d":[], "3d":[], "1w":[], "2w":[]},
+                                "sell_later":{"30m":[], "1h":[], "4h":[], "12h":[], "1d":[], "3d":[], "1w":[], "2w":[]}}
+            for row in self.look_ahead():
+                index = 5
+                if row[4] == "buy_back":
+                    bullscore_bestgain[int(row[2])].append(min([int(i) for i in row[5:13]]))
+                    for look_ahead in average_bestgain["buy_back"]:
+                        average_bestgain["buy_back"][look_ahead].append(int(row[index]))
+                        index += 1
+                else:
+                    bearscore_bestgain[int(row[2])].append(max([int(i) for i in row[5:13]]))
+                    for look_ahead in average_bestgain["sell_later"]:
+                        average_bestgain["sell_later"][look_ahead].append(int(row[index]))
+                        index += 1
+            self.results['retain_aggregates'] = (bullscore_bestgain, bearscore_bestgain, average_bestgain)
+        return self.results['retain_aggregates']
+
+
+    def look_ahead_gains_by_score(self):
+        '''
+        Returns {goal: {score: {look_ahead: [gains]}}} of the look ahead graph
+        '''
+
+        if 'look_ahead_gains_by_score' not in self.results:
+            make_dict = lambda : {"30m":[], "1h":[], "4h":[], "1d":[], "3d":[], "1w":[], "2w":[]}
+            best_gains = {"buy_back":defaultdict(make_dict), "sell_later":defaultdict(make_dict)}
+            for row in self.look_ahead():
+                index = 5
+                for look_ahead in best_gains[row[4]][int(row[2])]:
+                    best_gains[row[4]][int(row[2])][look_ahead].append(int(row[index]))
+                    index += 1
+            self.results['look_ahead_gains_by_score'] = best_gains
+        return self.results['look_ahead_gains_by_score']
+
+
+    def simulation(self):
+        '''
+        Returns the trade_simulation csv as (header row, ranked max strats row, trade log rows) of the current scoring
+        '''
+
+        if 'simulation' not in self.results:
+            scored_uts = int(self.scoring().index[-1])
+            if self.custom_threshold or not self.coin.threshold_cache.get(self.coin.get_threshold_cache_path(self.symbol), self.filename_ext, scored_uts):
+                self.coin.simulate_trading(self.symbol, self.custom_timeframes, historical_DF=self.scoring()) # not simulated by threshold()
+            with open(f'{self.coin.trading_simulation_path}/{self.symbol}/trade_simulation_{self.symbol}_{self.filename_ext}.csv', 'r') as f:
+                csv_reader = csv.reader(f)
+                self.results['simulation'] = (next(csv_reader), next(csv_reader), list(csv_reader))
+        return self.results['simulation']
+
+
+    def generate_reports(self, graph_type='bar', top_x=20):
+        '''
+        Writes the retain score and both graphs of the symbol_timeframes
+        '''
+
+        self.coin.generate_retain_score(self.symbol, self.custom_timeframes, pipeline=self)
+        self.coin.graph_look_ahead_data(self.symbol, self.custom_timeframes, graph_type, pipeline=self)
+        self.coin.graph_trading_simulation(self.symbol, self.custom_timeframes, top_x, pipeline=self)
@@ -0,0 +1,109 @@
+from collections import OrderedDict
+from threading import Lock
+from enums import INTERVALS
+from glob import glob
+import os
+
+'''
+Catalogue and candle array cache shared by every Coin of the process (and the notification server).
+
+__catalogue = the stored coins of a data path and the stored {symbol: [timeframes]} of a coin's candlestick path,
+    which otherwise cost a glob of the database on every lookup.
+__candles = {column: array} reads of candle stores, kept in least recently used order within a memory budget (bytes).
+    Cached arrays are read-only, as they are shared by every reader.
+
+Entries stay valid until the files under their path change, so Coin invalidates the paths it writes or removes:
+candle updates (get_candles, resampling), new coins and symbol folders and remove_timeframe/symbol/coin.
+invalidate(path) drops the candles under path and the catalogues of path and its parent folders. All access is locked.
+'''
+
+
+class CandleCache():
+    '''
+    Thread-safe catalogue and LRU candle array cache, keyed by path
+    '''
+
+    def __init__(self, budget):
+
+        self.budget = budget # max bytes of cached candle arrays
+        self.catalogue = {} # path: stored coins or {symbol: [timeframes]}
+        self.candles = OrderedDict() # (store path, columns): {column: array}, least recently used first
+        self.num_bytes = 0
+        self.hits, self.misses, self.evictions = 0, 0, 0
+        self.generation = 0 # number of invalidations, reads started before one are not cached
+        self.lock = Lock()
+
+
+    def stored_coins(self, data_path):
+        '''
+        Returns list of coins stored in data_path
+        '''
+
+        with self.lock:
+            if data_path not in self.catalogue:
+                self.catalogue[data_path] = [path.split('/')[-1] for path in glob(f'{data_path}/*') if 'binance_scan' not in path]
+            return list(self.catalogue[data_path])
+
+
+    def symbol_timeframes(self, candlestick_path, extension):
+        '''
+        Returns {symbol: [timeframes]} of the candle stores (files or folders with extension) in candlestick_path
+        '''
+
+        with self.lock:
+            if candlestick_path not in self.catalogue:
+                symbol_timeframes = {}
+                for symbol in [path.split('/')[-1] for path in glob(f'{candlestick_path}/*')]:
+                    stored_timeframes = [path.split('/')[-1].split('_')[-1].split('.')[0] for path in glob(f'{candlestick_path}/{symbol}/{symbol}_*{extension}')]
+                    symbol_timeframes[symbol] = sorted(stored_timeframes, key=lambda tf : INTERVALS.index(tf))
+                self.catalogue[candlestick_path] = symbol_timeframes
+            return {symbol:list(timeframes) for symbol, timeframes in self.catalogue[candlestick_path].items()}
+
+
+    def read(self, candle_store, columns):
+        '''
+        Returns candle_store.read(columns), from the cache when the store was read since it was last invalidated
+        '''
+
+        key = (candle_store.path, tuple(columns))
+        with self.lock:
+            if key in self.candles:
+                self.hits += 1
+                self.candles.move_to_end(key)
+                return dict(self.candles[key])
+            self.misses += 1
+            generation = self.generation
+        data = candle_store.read(list(columns)) # read outside the lock, other coins keep using the cache
+        for array in data.values():
+            array.flags.writeable = False
+        num_bytes = sum(array.nbytes for array in data.values())
+        with self.lock:
+            if num_bytes <= self.budget and key not in self.candles and generation == self.generation:
+                self.candles[key] = data
+                self.num_bytes += num_bytes
+                while self.num_bytes > self.budget:
+                    _, evicted = self.candles.popitem(last=False)
+                    self.num_bytes -= sum(array.nbytes for array in evicted.values())
+                    self.evictions += 1
+        return dict(data)
+
+
+    def invalidate(self, path):
+        '''
+        Drops the candles stored under path, and the catalogues of path, its subfolders and its parent folders
+        '''
+
+        path = os.path.normpath(path)
+        related = lambda key : key == path or key.startswith(path + '/') or path.startswith(key + '/')
+        with self.lock:
+            self.generation += 1
+            for key in [key for key in self.catalogue if related(os.path.normpath(key))]:
+                self.catalogue.pop(key)
+            for key in [key for key in self.candles if related(os.path.normpath(key[0]))]:
+                self.num_bytes -= sum(array.nbytes for array in self.candles.pop(key).values())
+
+
+    def stats(self):
+        with self.lock:
+            return {'hits':self.hits, 'misses':self.misses, 'evictions':self.evictions, 'entries':len(self.candles),
+                    'bytes':self.num_bytes, 'budget':self.budget}
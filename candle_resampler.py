@@ -0,0 +1,135 @@
+from candle_store import CANDLE_COLUMNS
+import numpy as np
+import sys
+
+'''
+Builds higher timeframe candles from the stored 5m candles of a symbol, instead of downloading every timeframe.
+
+Candles follow Binance's alignment (UTC):
+    5m - 1d = multiples of the interval since the epoch
+    3d = multiples of 3 days, offset one day from the epoch (Binance's 3d candles open on e.g. 2021-01-01)
+    1w = weeks starting Monday 00:00
+    1M = calendar months
+A candle aggregates every 5m candle within it: first open, max high, min low, last close and summed volumes/trades.
+
+resample_store keeps a derived store updated incrementally, only the 5m rows from the derived store's forming candle
+onwards are read and resampled. Check derived candles against downloaded candles with:
+    <python3 candle_resampler.py verify COIN SYMBOL TIMEFRAME>
+'''
+
+SOURCE_TIMEFRAME = '5m'
+INTERVAL_MS = {'5m':300000, '15m':900000, '30m':1800000, '1h':3600000, '2h':7200000, '3h':10800000, '4h':14400000,
+               '6h':21600000, '8h':28800000, '12h':43200000, '1d':86400000, '3d':259200000, '1w':604800000}
+INTERVAL_OFFSET_MS = {'3d':86400000, '1w':345600000} # epoch (Thursday 1 Jan 1970) to the first candle open
+SUMMED_COLUMNS = ['volume', 'asset_vol', 'num_trades', 'base_buyer_vol', 'quote_buyer_vol']
+
+
+def candle_open_uts(uts, timeframe):
+    '''
+    Returns the open uts of the timeframe candle holding each uts
+    '''
+
+    uts = np.asarray(uts, dtype=np.int64)
+    if timeframe == '1M':
+        return uts.astype('datetime64[ms]').astype('datetime64[M]').astype('datetime64[ms]').astype(np.int64)
+    offset = INTERVAL_OFFSET_MS.get(timeframe, 0)
+    return uts - (uts - offset) % INTERVAL_MS[timeframe]
+
+
+def candle_close_uts(open_uts, timeframe):
+    '''
+    Returns the Binance close time (final ms) of candles with the given open uts
+    '''
+
+    open_uts = np.asarray(open_uts, dtype=np.int64)
+    if timeframe == '1M':
+        next_open = (open_uts.astype('datetime64[ms]').astype('datetime64[M]') + 1).astype('datetime64[ms]').astype(np.int64)
+        return next_open - 1
+    return open_uts + INTERVAL_MS[timeframe] - 1
+
+
+def resample(data, timeframe):
+    '''
+    Aggregates dict of CANDLE_COLUMNS arrays (ascending open_uts) into timeframe candles, returns dict of arrays
+    '''
+
+    if not len(data['open_uts']):
+        return {column:np.empty(0, dtype=dtype) for column, dtype in CANDLE_COLUMNS.items()}
+    buckets = candle_open_uts(data['open_uts'], timeframe)
+    starts = np.flatnonzero(np.diff(buckets, prepend=buckets[0] - 1))
+    ends = np.append(starts[1:], len(buckets)) - 1
+    candles = {'open_uts':buckets[starts],
+               'open':np.asarray(data['open'])[starts],
+               'high':np.maximum.reduceat(data['high'], starts),
+               'low':np.minimum.reduceat(data['low'], starts),
+               'close':np.asarray(data['close'])[ends],
+               'close_time':candle_close_uts(buckets[starts], timeframe)}
+    for column in SUMMED_COLUMNS:
+        candles[column] = np.add.reduceat(data[column], starts)
+    return candles
+
+
+def candles_to_klines(candles):
+    '''
+    Returns Binance formatted klines (prices and volumes as 8 decimal strings) from dict of CANDLE_COLUMNS arrays
+    '''
+
+    columns = [candles[column].tolist() for column in CANDLE_COLUMNS]
+    return [[value if type(value) == int else f'{value:.8f}' for value in row] + ['0'] for row in zip(*columns)]
+
+
+def source_start_row(source, uts):
+    '''
+    Returns the row index of the first source candle at or after uts, reading only the tail of the source store
+    '''
+
+    num_rows = source.num_rows()
+    # every 5m interval has at most one row, so the rows after uts can not exceed the intervals after uts
+    lower_bound = max(num_rows - 1 - (source.latest_uts() - uts) // INTERVAL_MS[SOURCE_TIMEFRAME], 0)
+    tail_uts = source.read(['open_uts'], start=lower_bound)['open_uts']
+    return lower_bound + int(np.searchsorted(tail_uts, uts, side='left'))
+
+
+def resample_store(source, target, timeframe):
+    '''
+    Creates or updates target candle store from the 5m source candle store. Returns number of written candles.
+    '''
+
+    if not source.exists():
+        return 0
+    if target.exists() and target.num_rows():
+        start = source_start_row(source, target.latest_uts()) # from the forming candle onwards
+        klines = candles_to_klines(resample(source.read(start=start), timeframe))
+        target.append(klines)
+    else:
+        klines = candles_to_klines(resample(source.read(), timeframe))
+        target.write(klines)
+    return len(klines)
+
+
+def verify(coin, symbol, timeframe):
+    '''
+    Compares the stored (downloaded) candles of a symbol_timeframe with candles resampled from its 5m candles
+    '''
+
+    from get_candles import Coin
+
+    coin = Coin(coin)
+    source = coin.get_candle_store(symbol, SOURCE_TIMEFRAME).read()
+    stored = coin.get_candle_store(symbol, timeframe).read()
+    derived = resample(source, timeframe)
+    # the first resampled candle may be partial (listing) and the final candles are still forming
+    common, stored_index, derived_index = np.intersect1d(stored['open_uts'][:-1], derived['open_uts'][1:-1], return_indices=True)
+    derived_index += 1
+    print(f'{symbol}_{timeframe}: {len(stored["open_uts"])} stored candles, {len(derived["open_uts"])} resampled, {len(common)} compared')
+    for column in ['open', 'high', 'low', 'close', 'volume', 'num_trades']:
+        mismatched = np.flatnonzero(~np.isclose(stored[column][stored_index], derived[column][derived_index], rtol=1e-6))
+        print(f'{column}: {len(mismatched)} mismatched' + (f', first at uts {common[mismatched[0]]}' if len(mismatched) else ''))
+
+
+if __name__ == "__main__":
+    # Example: <python3 candle_resampler.py verify INJ INJUSDT 3d>
+    if len(sys.argv) != 5 or sys.argv[1] != 'verify':
+        print('Usage: python3 candle_resampler.py verify COIN SYMBOL TIMEFRAME')
+        sys.exit(1)
+    verify(sys.argv[2].upper(), sys.argv[3].upper(), sys.argv[4])
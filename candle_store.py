@@ -0,0 +1,394 @@
+from glob import glob
+from time_index import TimeIndex
+import numpy as np
+import shutil
+import csv
+import sys
+import os
+
+'''
+Candle storage backends used by Coin.
+
+Both backends store the raw Binance klines of one symbol_timeframe and expose the same interface, where the final
+stored row is always the latest (possibly still forming) candle:
+    exists(), write(klines), append(klines), remove()
+    num_rows(), num_closed_rows(), latest_uts(), last_row()
+    read(columns, start, stop), to_dataframe(columns, names, start, stop)
+    scan(columns, start, stop, position), reads rows [start, stop) from a position returned by a previous scan
+    update_index(), called after every write or append so that rows can be seeked without reading the rows before them
+
+__csv = <SYMBOL>_<tf>.csv, a header row holding the number of closed candles followed by one row per kline.
+    Reads from a row seek to it through the sidecar time index <SYMBOL>_<tf>.csv.idx (see time_index.py).
+__columnar = <SYMBOL>_<tf>.cols/, one fixed width little endian binary file per kline column (e.g. close.bin).
+    Row count comes from the file size, so appends and the last row lookup are O(1) seeks, and reads are memory-mapped
+    numpy views which makes slicing zero-copy.
+
+Migrate existing csv trees with: <python3 candle_store.py migrate [COIN ...] [--remove-csv]>
+'''
+
+CANDLE_COLUMNS = {
+    'open_uts':'<i8',
+    'open':'<f8',
+    'high':'<f8',
+    'low':'<f8',
+    'close':'<f8',
+    'volume':'<f8',
+    'close_time':'<i8',
+    'asset_vol':'<f8',
+    'num_trades':'<i8',
+    'base_buyer_vol':'<f8',
+    'quote_buyer_vol':'<f8'
+} # Binance kline columns in order (final 'ignore' column is not stored)
+
+
+class CsvCandleStore():
+    '''
+    Original csv storage. The header's final column is a zero padded count of closed candles, and the final row
+    is zero padded so that it can be rewritten in-place when the forming candle updates.
+    '''
+
+    EXTENSION = '.csv'
+
+    def __init__(self, path):
+
+        self.path = path
+
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+
+    def write(self, klines):
+        '''
+        Creates the csv file from the given klines
+        '''
+
+        with open(self.path, 'w', newline='') as f:
+            csv_writer = csv.writer(f, delimiter=',')
+            num_new_closed_rows = len(klines[:-1]) # don't count latest kline since that hasn't yet closed
+            csv_writer.writerow(self.header(num_new_closed_rows))
+            [csv_writer.writerow(kline) for kline in klines]
+
+
+    def append(self, klines):
+        '''
+        Overwrites the stored forming candle with klines[0] and appends the remaining klines
+        '''
+
+        if not klines:
+            return
+        with open(self.path, 'r+', newline='') as f:
+            csv_writer = csv.writer(f, delimiter=',')
+            num_new_closed_rows = int(f.readline().split(',')[-1]) + len(klines[:-1])
+            f.seek(0)
+            csv_writer.writerow(self.header(num_new_closed_rows))
+            f.seek(0, os.SEEK_END)
+            self.modify_last_row(csv_writer, f, klines[0])
+            [csv_writer.writerow(kline) for kline in klines[1:]]
+
+
+    def modify_last_row(self, csv_writer, file_obj, kline):
+        '''
+        Modifies the final row of the csv file in-place
+        '''
+
+        latest_kline_string = ','.join([str(col) if type(col) == int else col for col in kline])
+        latest_kline_string_byte_size = len(latest_kline_string.encode('utf-8'))
+        file_obj.seek(0, os.SEEK_END)
+        eof = file_obj.tell()
+        file_obj.seek(max(eof - 500, 0)) # jump close to eof
+        final_stored_row = file_obj.readlines()[-1] # grab the final row
+        final_stored_row_byte_size = len(final_stored_row.encode('utf-8'))
+        alignment = 0 if '\r' in final_stored_row else 1 # windows may have \r in row string
+        file_obj.seek(eof - final_stored_row_byte_size - alignment) # seek to precisely start of last row
+        if latest_kline_string_byte_size >= final_stored_row_byte_size:
+            csv_writer.writerow(latest_kline_string.split(','))
+        else:
+            buffer_size = final_stored_row.split(',')[-1][1:].count('0')
+            overflow = final_stored_row_byte_size - latest_kline_string_byte_size
+            overflow -= 1 if alignment else 2 # \n or \r\n
+            if buffer_size < overflow:
+                addition = overflow
+            else:
+                addition = buffer_size
+            latest_kline_string += '0' * addition
+            csv_writer.writerow(latest_kline_string.split(','))
+
+
+    def remove(self):
+        if self.exists():
+            os.remove(self.path)
+        TimeIndex(self.path).remove()
+
+
+    def update_index(self):
+        TimeIndex(self.path).update()
+
+
+    def num_closed_rows(self):
+        with open(self.path, 'r') as f:
+            return int(f.readline().split(',')[-1])
+
+
+    def num_rows(self):
+        return self.num_closed_rows() + 1
+
+
+    def last_row(self):
+        '''
+        Returns the final stored row as a dict of column: value
+        '''
+
+        with open(self.path, 'r') as f:
+            f.seek(0, os.SEEK_END)
+            eof = f.tell()
+            f.seek(max(eof - 500, 0)) # get final row
+            final_row = f.readlines()[-1].strip().split(',')
+        return {column:np.array(value).astype(dtype)[()] for (column, dtype), value in zip(CANDLE_COLUMNS.items(), final_row)}
+
+
+    def latest_uts(self):
+        '''
+        returns the latest uts of the csv file
+        '''
+
+        with open(self.path, 'r') as f:
+            f.seek(0, os.SEEK_END)
+            eof = f.tell()
+            f.seek(max(eof - 500, 0)) # get final row
+            return int(f.readlines()[-1].split(',')[0])
+
+
+    def read(self, columns=None, start=0, stop=None):
+        '''
+        Returns a dict of column: numpy array for rows [start, stop)
+        '''
+
+        import pandas as pd # Imported on first read, so importing candle_store stays cheap (see notification_server)
+
+        columns = columns if columns else list(CANDLE_COLUMNS)
+        nrows = None if stop is None else max(stop - start, 0)
+        usecols = [list(CANDLE_COLUMNS).index(column) for column in columns]
+        if nrows == 0:
+            return {column:np.empty(0, dtype=CANDLE_COLUMNS[column]) for column in columns}
+        position = TimeIndex(self.path).seek_row(start) if start else None
+        if position is None:
+            candle_DF = pd.read_csv(self.path, usecols=usecols, header=None, skiprows=1 + start, nrows=nrows)
+        else:
+            with open(self.path, 'rb') as f:
+                f.seek(position[0]) # indexed row at or before start
+                candle_DF = pd.read_csv(f, usecols=usecols, header=None, skiprows=start - position[1], nrows=nrows)
+        return {column:candle_DF[list(CANDLE_COLUMNS).index(column)].to_numpy(dtype=CANDLE_COLUMNS[column]) for column in columns}
+
+
+    def scan(self, columns, start, stop, position=None):
+        '''
+        Reads rows [start, stop) from the byte position of row start (found by skipping lines when not given).
+        Returns dict of column: numpy array and the byte position of row stop. Closed rows are never rewritten,
+        so the position of a closed row stays valid.
+        '''
+
+        with open(self.path, 'rb') as f:
+            if position is None:
+                indexed_position = TimeIndex(self.path).seek_row(start)
+                if indexed_position is None:
+                    [f.readline() for _ in range(start + 1)] # skip header and rows
+                else:
+                    f.seek(indexed_position[0])
+                    [f.readline() for _ in range(start - indexed_position[1])] # skip rows after the indexed row
+            else:
+                f.seek(position)
+            rows = [f.readline().decode('utf-8').strip().split(',') for _ in range(max(stop - start, 0))]
+            position = f.tell()
+        return {column:np.array([row[list(CANDLE_COLUMNS).index(column)] for row in rows], dtype=CANDLE_COLUMNS[column])
+                for column in columns}, position
+
+
+    def to_dataframe(self, columns=None, names=None, start=0, stop=None):
+        import pandas as pd
+
+        columns = columns if columns else list(CANDLE_COLUMNS)
+        names = names if names else columns
+        data = self.read(columns, start, stop)
+        return pd.DataFrame({name:data[column] for name, column in zip(names, columns)})
+
+
+    @staticmethod
+    def header(num_closed_rows):
+        return [
+            'open_uts',
+            'open',
+            'high',
+            'low',
+            'close',
+            'volumne',
+            'close_time',
+            'asset_vol',
+            'num_trades',
+            'base_buyer_vol',
+            'quote_buyer_vol',
+            f'{num_closed_rows:030}'
+        ]
+
+
+class ColumnarCandleStore():
+    '''
+    Typed columnar storage, one <column>.bin file per kline column inside the <SYMBOL>_<tf>.cols directory.
+    open_uts.bin is always written last, hence its size is the committed row count.
+    '''
+
+    EXTENSION = '.cols'
+
+    def __init__(self, path):
+
+        self.path = path
+
+
+    def column_path(self, column):
+        return f'{self.path}/{column}.bin'
+
+
+    def exists(self):
+        return os.path.isdir(self.path)
+
+
+    def write(self, klines):
+        '''
+        Creates the column files from the given klines
+        '''
+
+        self.write_columns(self.klines_to_columns(klines))
+
+
+    def write_columns(self, column_data):
+        '''
+        Creates the column files from a dict of column: array
+        '''
+
+        os.makedirs(self.path, exist_ok=True)
+        for column in sorted(CANDLE_COLUMNS, key=lambda column : column == 'open_uts'): # open_uts last
+            np.asarray(column_data[column], dtype=CANDLE_COLUMNS[column]).tofile(self.column_path(column))
+
+
+    def append(self, klines):
+        '''
+        Overwrites the stored forming candle with klines[0] (if it is the same candle) and appends the remaining klines
+        '''
+
+        if not klines:
+            return
+        num_rows = self.num_rows()
+        position = num_rows - 1 if num_rows and int(klines[0][0]) == self.latest_uts() else num_rows
+        column_data = self.klines_to_columns(klines)
+        for column in sorted(CANDLE_COLUMNS, key=lambda column : column == 'open_uts'): # open_uts last
+            dtype = np.dtype(CANDLE_COLUMNS[column])
+            with open(self.column_path(column), 'r+b') as f:
+                f.seek(position * dtype.itemsize)
+                column_data[column].tofile(f)
+                f.truncate()
+
+
+    def remove(self):
+        if self.exists():
+            shutil.rmtree(self.path)
+
+
+    def update_index(self):
+        pass # open_uts.bin is the time index
+
+
+    def num_rows(self):
+        return os.path.getsize(self.column_path('open_uts')) // np.dtype(CANDLE_COLUMNS['open_uts']).itemsize
+
+
+    def num_closed_rows(self):
+        return max(self.num_rows() - 1, 0)
+
+
+    def last_row(self):
+        '''
+        Returns the final stored row as a dict of column: value
+        '''
+
+        position = self.num_rows() - 1
+        return {column:self.read_value(column, position) for column in CANDLE_COLUMNS}
+
+
+    def latest_uts(self):
+        return int(self.read_value('open_uts', self.num_rows() - 1))
+
+
+    def read_value(self, column, position):
+        dtype = np.dtype(CANDLE_COLUMNS[column])
+        return np.fromfile(self.column_path(column), dtype=dtype, count=1, offset=position * dtype.itemsize)[0]
+
+
+    def read(self, columns=None, start=0, stop=None):
+        '''
+        Returns a dict of column: read-only memory-mapped array for rows [start, stop)
+        '''
+
+        columns = columns if columns else list(CANDLE_COLUMNS)
+        num_rows = self.num_rows()
+        stop = num_rows if stop is None else min(stop, num_rows)
+        if start >= stop:
+            return {column:np.empty(0, dtype=CANDLE_COLUMNS[column]) for column in columns}
+        return {column:np.memmap(self.column_path(column), dtype=CANDLE_COLUMNS[column], mode='r', shape=(num_rows,))[start:stop]
+                for column in columns}
+
+
+    def scan(self, columns, start, stop, position=None):
+        '''
+        Reads rows [start, stop), the position is simply the row index for columnar storage
+        '''
+
+        return self.read(columns, start, stop), stop
+
+
+    def to_dataframe(self, columns=None, names=None, start=0, stop=None):
+        import pandas as pd
+
+        columns = columns if columns else list(CANDLE_COLUMNS)
+        names = names if names else columns
+        data = self.read(columns, start, stop)
+        return pd.DataFrame({name:np.asarray(data[column]) for name, column in zip(names, columns)})
+
+
+    @staticmethod
+    def klines_to_columns(klines):
+        return {column:np.array([kline[i] for kline in klines], dtype=dtype) for i, (column, dtype) in enumerate(CANDLE_COLUMNS.items())}
+
+
+CANDLE_STORES = {'csv':CsvCandleStore, 'columnar':ColumnarCandleStore}
+
+
+def migrate_csv_tree(coindata_path, coins=[], remove_csv=False):
+    '''
+    Converts every stored candlestick csv file into the columnar format. Returns list of converted symbol_timeframes.
+    '''
+
+    coin_paths = [f'{coindata_path}/{coin.upper()}' for coin in coins] if coins else glob(f'{coindata_path}/*')
+    converted = []
+    for coin_path in coin_paths:
+        for csv_path in glob(f'{coin_path}/candlestick_data/*/*_*{CsvCandleStore.EXTENSION}'):
+            csv_store = CsvCandleStore(csv_path)
+            columnar_store = ColumnarCandleStore(csv_path[:-len(CsvCandleStore.EXTENSION)] + ColumnarCandleStore.EXTENSION)
+            columnar_store.write_columns(csv_store.read())
+            if columnar_store.num_rows() != csv_store.num_rows():
+                print(f'Warning: {csv_path} header count does not match its rows, csv file kept.')
+            elif remove_csv:
+                csv_store.remove()
+            converted.append(os.path.basename(csv_path)[:-len(CsvCandleStore.EXTENSION)])
+    return converted
+
+
+if __name__ == "__main__":
+    # Example: <python3 candle_store.py migrate INJ BTC --remove-csv>
+    if len(sys.argv) < 2 or sys.argv[1] != 'migrate':
+        print('Usage: python3 candle_store.py migrate [COIN ...] [--remove-csv]')
+        sys.exit(1)
+    coindata_path = os.path.dirname(os.path.realpath(__file__)) + '/coindata'
+    coins = [arg for arg in sys.argv[2:] if not arg.startswith('--')]
+    converted = migrate_csv_tree(coindata_path, coins, remove_csv='--remove-csv' in sys.argv)
+    print(f'Migrated {len(converted)} candlestick files to columnar storage: {converted}')
+    print("Set CANDLE_STORAGE = 'columnar' in enums.py to have Coin use the migrated files.")
@@ -1,9 +1,62 @@
 import os
-from binance.client import Client # Third party 
+from threading import RLock
+from threshold_cache import ThresholdCache
+from candle_cache import CandleCache
+from live_score_cache import LiveScoreCache
+from cut_points import CutPointTables
+from enums import CANDLE_CACHE_BUDGET, LIVE_SCORE_CACHE_SIZE
 
 # Users must mannually add their Binance API key to your systems environment variables TODO make shell script to auto this
 API_KEY = os.environ.get('BINANCE_API_KEY')
 API_SECRET = os.environ.get('BINANCE_API_SECRET')
 
-#https://python-binance.readthedocs.io/en/latest/market_data.html#id7
-client = Client(API_KEY, API_SECRET)
+threshold_cache = ThresholdCache() # optimal signal thresholds, shared by every coin thread
+candle_cache = CandleCache(CANDLE_CACHE_BUDGET) # stored symbol timeframes and candle arrays, shared by every coin thread
+live_score_cache = LiveScoreCache(LIVE_SCORE_CACHE_SIZE) # current scores per forming candle tick, shared by every score consumer
+cut_point_tables = CutPointTables() # percentile cut points of the analysis jsons, shared by every coin thread
+
+
+class LazyClient():
+    '''
+    Binance Client built on first use, as importing the binance package takes most of a second and building the Client
+    pings Binance. Attributes are those of the Client.
+    '''
+
+    def __init__(self, api_key, api_secret):
+
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.client = None
+        self.lock = RLock()
+
+
+    def __getattr__(self, name):
+        if self.client is None:
+            with self.lock:
+                if self.client is None:
+                    #https://python-binance.readthedocs.io/en/latest/market_data.html#id7
+                    from binance.client import Client # Third party
+                    self.client = Client(self.api_key, self.api_secret)
+        return getattr(self.client, name)
+
+
+client = LazyClient(API_KEY, API_SECRET)
+
+# kline_fetcher and kline_stream are built on first import (e.g. `from config import kline_fetcher`), as their modules
+# import the binance package. Modules which only need the caches above, like notification_server, start without them.
+lazy_lock = RLock()
+
+
+def __getattr__(name):
+    with lazy_lock:
+        if name in globals():
+            return globals()[name]
+        if name == 'kline_fetcher':
+            from kline_fetcher import KlineFetcher
+            globals()[name] = KlineFetcher(client) # shared by all coins so the request weight limit is process wide
+        elif name == 'kline_stream':
+            from kline_stream import KlineStream, WebsocketTransport
+            globals()[name] = KlineStream(WebsocketTransport()) # live candles for current_score, connects on first subscription
+        else:
+            raise AttributeError(f"module 'config' has no attribute '{name}'")
+        return globals()[name]
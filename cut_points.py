@@ -0,0 +1,320 @@
+from threading import Lock
+from time import perf_counter
+from score_histogram import load_score_json
+import numpy as np
+import bisect
+import sys
+
+'''
+Percentile cut-point tables of the percent change distributions scored by Coin.score_performance and Coin.score_amplitude,
+and the array versions of those methods and Coin.percent_changes.
+
+Scoring only ever looks at sorted_list[int(size * quantile)] for a dozen quantiles, so a CutPoints table keeps just those
+values (plus the size and mean) of one (symbol, timeframe, metric) distribution. Scoring is then a bisect over the 6
+ascending cut points of a score band:
+    max_cuts, change_cuts = CutPoints(max_list, PERFORMANCE_QUANTILES), CutPoints(change_list, CHANGE_QUANTILES)
+    score, change_score = performance_score(max_cuts.cuts, change_cuts.cuts, abs(change), change)
+and arrays of prices are scored against one table with np.searchsorted (performance_scores, amplitude_scores). Given a
+table per row (2d arrays, e.g. the tables after each candle close of historical_scoring.expanding_thresholds) the bands
+are counted per row instead. Candles and prices are scored in batches with the array API:
+    changes = percent_change_arrays(opens, highs, lows, closes) # {metric: array}
+    score, change_score = score_performance_arrays(max_list, change_list, np.abs(changes['candle_change']), changes['candle_change'])
+    amp_score = score_amplitude_arrays(amp_list, changes['candle_amplitude'])
+where each distribution is a sorted list (ScoreHistogram, RankTree), a CutPoints, or a 2d array of cut points per price.
+
+CutPointTables holds the tables of every analysis json of the process for Coin.current_score, so the json is not reloaded
+per score. Coin.update_score_jsons replaces the tables of a symbol_timeframe from its updated histograms as candles close,
+and Coin.synchronize_score_jsons (timeframes added or removed) invalidates the json's tables.
+
+Compare bisect scoring against Coin.score_performance with: <python3 cut_points.py [PRICES] [SIZE]>
+and time the per element cost of the scalar methods and the array API with: <python3 cut_points.py batch [SIZE]>
+'''
+
+PERFORMANCE_QUANTILES = [0.75, 0.8, 0.85, 0.9, 0.95, 0.985] # max_list positions used by Coin.score_performance
+CHANGE_QUANTILES = [0.9, 0.925, 0.95, 0.97, 0.98, 0.99, 0.1, 0.075, 0.05, 0.03, 0.02, 0.01] # change_list positions, up then down
+AMPLITUDE_QUANTILES = [0.75, 0.8, 0.85, 0.9, 0.95, 0.975, 0.05] # amp_list positions used by Coin.score_amplitude
+METRIC_QUANTILES = {'candle_change':CHANGE_QUANTILES, 'candle_amplitude':AMPLITUDE_QUANTILES,
+                    'candle_max_up':PERFORMANCE_QUANTILES, 'candle_max_down':PERFORMANCE_QUANTILES}
+
+
+class CutPoints():
+    '''
+    Quantile values of one sorted distribution (a list, ScoreHistogram or RankTree), cuts is None when it is empty
+    '''
+
+    def __init__(self, sorted_values, quantiles):
+
+        self.size = len(sorted_values)
+        self.cuts = [sorted_values[int(self.size * quantile)] for quantile in quantiles] if self.size else None
+        self.mean = sorted_values.mean() if hasattr(sorted_values, 'mean') else (sum(sorted_values) / self.size if self.size else float('nan'))
+
+
+def percent_change_arrays(opens, highs, lows, closes):
+    '''
+    Array version of Coin.percent_changes, rounding is identical to rounding numpy floats with round()
+    '''
+
+    return {'candle_change':np.round((closes / opens)*100 - 100, 1),
+            'candle_amplitude':np.round((highs / lows)*100 - 100, 1),
+            'candle_max_up':np.round((highs / opens)*100 - 100, 1),
+            'candle_max_down':np.round(np.abs((lows / opens)*100 - 100), 1)}
+
+
+def cut_point_rows(tables, quantiles):
+    '''
+    Returns a 2d array of the cuts of each CutPoints in tables, rows of empty tables are nan (scoring 0)
+    '''
+
+    return np.array([table.cuts if table.cuts else [np.nan] * len(quantiles) for table in tables], dtype=float).reshape(-1, len(quantiles))
+
+
+def cut_point_array(distribution, quantiles):
+    '''
+    Returns the cut points of a sorted distribution (or CutPoints) as an array, 2d arrays of cut points are returned as is
+    '''
+
+    if isinstance(distribution, np.ndarray) and distribution.ndim == 2:
+        return distribution
+    table = distribution if isinstance(distribution, CutPoints) else CutPoints(distribution, quantiles)
+    return np.array(table.cuts if table.cuts else [np.nan] * len(quantiles), dtype=float)
+
+
+def performance_score(max_cuts, change_cuts, absolute_change, current_percent_change):
+    '''
+    Coin.score_performance over cut points of PERFORMANCE_QUANTILES and CHANGE_QUANTILES, returns score, change_score
+    '''
+
+    if not max_cuts or absolute_change < max_cuts[0]:
+        return 0, 0
+    score = bisect.bisect_left(max_cuts, absolute_change, 1, 6) # first band whose upper cut holds the change
+    change_score = 0
+    if not change_cuts:
+        pass
+    elif current_percent_change > 0 and current_percent_change >= change_cuts[0]:
+        change_score = bisect.bisect_left(change_cuts, current_percent_change, 1, 6)
+    elif current_percent_change < 0 and current_percent_change <= change_cuts[6]:
+        down_cuts = change_cuts[:5:-1] # 0.01 up to 0.1 quantile values, ascending
+        change_score = 6 - bisect.bisect_right(down_cuts, current_percent_change, 0, 5)
+    return score, change_score
+
+
+def amplitude_score(amp_cuts, amplitude_change):
+    '''
+    Coin.score_amplitude over cut points of AMPLITUDE_QUANTILES
+    '''
+
+    if not amp_cuts:
+        return 0
+    if amplitude_change >= amp_cuts[0]:
+        return bisect.bisect_left(amp_cuts, amplitude_change, 1, 6)
+    elif amplitude_change <= amp_cuts[6]:
+        return -1
+    return 0
+
+
+def band_scores(values, cuts, low, high, side='left'):
+    '''
+    Returns 1 + number of cuts[low:high] below values (at or below with side='right'), cuts is one table or a table per value
+    '''
+
+    if cuts.ndim == 1:
+        return np.searchsorted(cuts[low:high], values, side=side) + 1
+    below = values[:, None] > cuts[:, low:high] if side == 'left' else values[:, None] >= cuts[:, low:high]
+    return below.sum(axis=1) + 1
+
+
+def performance_scores(absolute_change, percent_change, max_cuts, change_cuts):
+    '''
+    Array version of performance_score. max_cuts and change_cuts are one table (1d) or a table per price (2d, nan when
+    empty), returns score and change_score arrays.
+    '''
+
+    absolute_change, percent_change = np.asarray(absolute_change, dtype=float), np.asarray(percent_change, dtype=float)
+    max_cuts, change_cuts = np.asarray(max_cuts, dtype=float), np.asarray(change_cuts, dtype=float)
+    score = np.where(absolute_change >= max_cuts[..., 0], band_scores(absolute_change, max_cuts, 1, 6), 0)
+    change_up = (score > 0) & (percent_change > 0) & (percent_change >= change_cuts[..., 0])
+    change_down = (score > 0) & (percent_change < 0) & (percent_change <= change_cuts[..., 6])
+    down_cuts = change_cuts[..., :5:-1] # ascending, so the down bands count cuts above the change
+    change_score = np.where(change_up, band_scores(percent_change, change_cuts, 1, 6),
+                            np.where(change_down, 7 - band_scores(percent_change, down_cuts, 0, 5, side='right'), 0))
+    return score, change_score
+
+
+def amplitude_scores(amplitude_change, amp_cuts):
+    '''
+    Array version of amplitude_score, amp_cuts is one table (1d) or a table per amplitude (2d)
+    '''
+
+    amplitude_change, amp_cuts = np.asarray(amplitude_change, dtype=float), np.asarray(amp_cuts, dtype=float)
+    return np.where(amplitude_change >= amp_cuts[..., 0], band_scores(amplitude_change, amp_cuts, 1, 6),
+                    np.where(amplitude_change <= amp_cuts[..., 6], -1, 0))
+
+
+def score_performance_arrays(max_list, change_list, absolute_change, current_percent_change):
+    '''
+    Array version of Coin.score_performance, scoring arrays of changes against a distribution. Returns score and change_score arrays.
+    '''
+
+    return performance_scores(absolute_change, current_percent_change, cut_point_array(max_list, PERFORMANCE_QUANTILES),
+                              cut_point_array(change_list, CHANGE_QUANTILES))
+
+
+def score_amplitude_arrays(amp_list, amplitude_change):
+    '''
+    Array version of Coin.score_amplitude
+    '''
+
+    return amplitude_scores(amplitude_change, cut_point_array(amp_list, AMPLITUDE_QUANTILES))
+
+
+class CutPointTables():
+    '''
+    Thread-safe cache of the CutPoints of every analysis json, {timeframe: {metric: CutPoints}} keyed by json path
+    '''
+
+    def __init__(self):
+
+        self.tables = {} # json path: {timeframe: {metric: CutPoints}}
+        self.loads, self.updates = 0, 0
+        self.generation = 0 # number of invalidations, loads started before one are not cached
+        self.lock = Lock()
+
+
+    def get(self, path):
+        '''
+        Returns the tables of an analysis json, built from the json (and its delta log) on first use
+        '''
+
+        with self.lock:
+            if path in self.tables:
+                return self.tables[path]
+            generation = self.generation
+        tables = {timeframe:{metric:CutPoints(histogram, METRIC_QUANTILES[metric]) for metric, histogram in metrics.items()}
+                  for timeframe, metrics in load_score_json(path).items()}
+        with self.lock:
+            self.loads += 1
+            if generation != self.generation:
+                return tables
+            return self.tables.setdefault(path, tables) # an update since the load already holds newer tables
+
+
+    def update(self, path, timeframe, histograms):
+        '''
+        Replaces the tables of a timeframe with those of its updated {metric: histogram}, when the json's tables are loaded
+        '''
+
+        tables = {metric:CutPoints(histogram, METRIC_QUANTILES[metric]) for metric, histogram in histograms.items()}
+        with self.lock:
+            if path in self.tables:
+                self.tables[path] = {**self.tables[path], timeframe:tables} # readers keep the dict they got
+                self.updates += 1
+
+
+    def invalidate(self, path):
+        with self.lock:
+            self.generation += 1
+            self.tables.pop(path, None)
+
+
+    def stats(self):
+        with self.lock:
+            return {'jsons':len(self.tables), 'loads':self.loads, 'updates':self.updates}
+
+
+def benchmark_cut_points(num_prices=200000, size=5000, seed=0):
+    '''
+    Scores num_prices random percent changes against random distributions of size candles with Coin.score_performance
+    and Coin.score_amplitude (indexing the sorted lists per call), with bisect over cut points and with the array versions.
+    '''
+
+    from get_candles import Coin
+
+    rng = np.random.default_rng(seed)
+    max_list = sorted(np.round(np.abs(rng.normal(0, 2, size)), 1).tolist())
+    change_list = sorted(np.round(rng.normal(0, 2, size), 1).tolist())
+    amp_list = sorted(np.round(np.abs(rng.normal(0, 3, size)), 1).tolist())
+    changes = np.round(rng.normal(0, 4, num_prices), 2)
+    amplitudes = np.abs(changes) * 1.5
+    change_values, amplitude_values = changes.tolist(), amplitudes.tolist()
+
+    start = perf_counter()
+    expected = [Coin.score_performance(max_list, change_list, size, abs(change), change) for change in change_values]
+    expected_amp = [Coin.score_amplitude(amp_list, size, amplitude) for amplitude in amplitude_values]
+    list_time = perf_counter() - start
+
+    start = perf_counter()
+    max_cuts, change_cuts = CutPoints(max_list, PERFORMANCE_QUANTILES).cuts, CutPoints(change_list, CHANGE_QUANTILES).cuts
+    amp_cuts = CutPoints(amp_list, AMPLITUDE_QUANTILES).cuts
+    scores = [performance_score(max_cuts, change_cuts, abs(change), change) for change in change_values]
+    amp_scores = [amplitude_score(amp_cuts, amplitude) for amplitude in amplitude_values]
+    bisect_time = perf_counter() - start
+
+    start = perf_counter()
+    score_array, change_array = performance_scores(np.abs(changes), changes, max_cuts, change_cuts)
+    amp_array = amplitude_scores(amplitudes, amp_cuts)
+    array_time = perf_counter() - start
+
+    identical = scores == expected and amp_scores == expected_amp
+    identical_arrays = list(zip(score_array.tolist(), change_array.tolist())) == expected and amp_array.tolist() == expected_amp
+    print(f'{num_prices} prices scored against {size} candles')
+    print(f'sorted lists: {list_time:.3f}s | bisect over cut points: {bisect_time:.3f}s | searchsorted: {array_time:.4f}s')
+    print(f'bisect scores identical: {identical} | array scores identical: {identical_arrays}')
+    return identical and identical_arrays
+
+
+def benchmark_batch(size=5000, batch_sizes=(1, 10, 100, 1000, 10000, 100000), seed=0):
+    '''
+    Times the per element cost of scoring random candles (percent changes, performance and amplitude scores against
+    distributions of size candles) with the scalar Coin methods and with the array API, for growing batch sizes.
+    '''
+
+    from get_candles import Coin
+
+    rng = np.random.default_rng(seed)
+    max_list = sorted(np.round(np.abs(rng.normal(0, 2, size)), 1).tolist())
+    change_list = sorted(np.round(rng.normal(0, 2, size), 1).tolist())
+    amp_list = sorted(np.round(np.abs(rng.normal(0, 3, size)), 1).tolist())
+    max_cuts, change_cuts = CutPoints(max_list, PERFORMANCE_QUANTILES), CutPoints(change_list, CHANGE_QUANTILES)
+    amp_cuts = CutPoints(amp_list, AMPLITUDE_QUANTILES)
+
+    def score_scalar(candles):
+        scores = []
+        for candle in zip(*candles):
+            changes = Coin.percent_changes(*candle)
+            scores.append((*Coin.score_performance(max_list, change_list, size, abs(changes['candle_change']), changes['candle_change']),
+                           Coin.score_amplitude(amp_list, size, changes['candle_amplitude'])))
+        return scores
+
+    def score_arrays(candles):
+        changes = percent_change_arrays(*candles)
+        score, change_score = score_performance_arrays(max_cuts, change_cuts, np.abs(changes['candle_change']), changes['candle_change'])
+        return score, change_score, score_amplitude_arrays(amp_cuts, changes['candle_amplitude'])
+
+    identical = True
+    print(f'ns per candle scored against {size} candles')
+    for batch_size in batch_sizes:
+        opens = 10 * np.exp(rng.normal(0, 0.01, batch_size))
+        closes = opens * np.exp(rng.normal(0, 0.03, batch_size))
+        highs = np.maximum(opens, closes) * (1 + rng.uniform(0, 0.02, batch_size))
+        lows = np.minimum(opens, closes) * (1 - rng.uniform(0, 0.02, batch_size))
+        candles = [opens, highs, lows, closes]
+        repeats = max(1, 100000 // batch_size)
+        timings = {}
+        for name, score in [('scalar', score_scalar), ('array', score_arrays)]:
+            start = perf_counter()
+            for _ in range(repeats):
+                result = score(candles)
+            timings[name] = (perf_counter() - start) / (repeats * batch_size) * 1e9
+            if name == 'scalar':
+                expected = result
+        identical &= [tuple(scores) for scores in zip(*[array.tolist() for array in result])] == expected
+        print(f"batch of {batch_size:>6}: scalar {timings['scalar']:>8.0f} | array {timings['array']:>8.0f} | speed up {timings['scalar'] / timings['array']:.1f}x")
+    print(f'array scores identical: {identical}')
+    return identical
+
+
+if __name__ == "__main__":
+    # Example: <python3 cut_points.py 200000 5000> or <python3 cut_points.py batch 5000>
+    if sys.argv[1:2] == ['batch']:
+        sys.exit(0 if benchmark_batch(*[int(arg) for arg in sys.argv[2:3]]) else 1)
+    sys.exit(0 if benchmark_cut_points(*[int(arg) for arg in sys.argv[1:3]]) else 1)
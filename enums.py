@@ -5,6 +5,28 @@ DEFAULT_TIMEFRAMES = ['1w', '3d', '1d', '12h', '4h', '1h']
 DEFAULT_SCORING_TIMEFRAMES = ['1h', '4h', '12h', '1d', '3d']
 STANDARD_TRADING_PAIRS = ['USDT', 'BUSD', 'USDC', 'BTC', 'ETH', 'BNB', 'XRP', 'DOGE', 'DOT', 'TRX', 'AUD']
 DEFAULT_THRESHOLD = 15
+HISTORICAL_SCORING_ENGINE = 'numpy' # Coin.compute_historical_score engine, either 'numpy' (see historical_scoring.py) or 'loop'
+TRADING_SIMULATION_ENGINE = 'numpy' # Coin.simulate_trading engine, either 'numpy' (see trading_simulation.py) or 'loop'
+LOOK_AHEAD_ENGINE = 'numpy' # Coin.generate_look_ahead_gains engine, either 'numpy' (see look_ahead.py) or 'loop'
+CANDLE_STORAGE = 'csv' # Candle storage backend used by Coin, either 'csv' or 'columnar' (see candle_store.py)
+CANDLE_CACHE_BUDGET = 512 * 1024**2 # Max bytes of candle arrays cached by the process (see candle_cache.py)
+LIVE_SCORE_CACHE_SIZE = 1000 # Max (symbol, timeframes, threshold) live scores cached by the process (see live_score_cache.py)
+RESAMPLED_TIMEFRAMES = [timeframe for timeframe in INTERVALS if timeframe != '5m'] # Built locally from 5m candles rather than downloaded (see candle_resampler.py)
+MONITOR_WORKERS = None # Worker threads running the coin jobs of the notification server, None is 4 per cpu up to 32 (see worker_pool.py)
+MESSAGE_BUS_QUEUE_SIZE = 1000 # Max queued messages of a notification server bus subscriber, publishers wait when full (see message_bus.py)
+MAIL_TRANSPORT = 'script' # Outbound mail transport of the notification server, either 'script', 'smtp' or 'file' (see mail_queue.py)
+MAIL_WORKERS = 2 # Concurrent mail sends of mail_queue.py
+MAIL_BATCH_WINDOW = 10 # Seconds a recipient's first queued mail waits for more mails to send as one digest
+MAIL_MIN_INTERVAL = 60 # Min seconds between two mails to a recipient
+MAIL_CHECK_INTERVAL = 10 # Seconds between checks for instructions mailed by server users
+MAIL_SMTP_HOST = 'localhost' # SMTP server of the 'smtp' mail transport
+MAIL_SMTP_PORT = 1025
+MAIL_SENDER = 'trading_bot@localhost'
+KLINE_FETCH_WORKERS = 8 # Concurrent kline requests of kline_fetcher.py
+KLINE_WEIGHT_PER_MINUTE = 2400 # Request weight budget of kline_fetcher.py, Binance allows 6000 per minute per IP
+KLINE_STREAM_URL = 'wss://stream.binance.com:9443/stream' # Combined kline streams used by kline_stream.py
+KLINE_STREAM_BUFFER_SIZE = 100 # Latest candles kept per streamed symbol_timeframe
+KLINE_STREAM_MAX_AGE = 60 # Seconds without a stream update before current_score falls back to the REST api
 SYMBOLS_URL1 = "https://api.binance.com/api/v3/exchangeInfo"
 SYMBOLS_URL2 = "https://fapi.binance.com/fapi/v1/exchangeInfo"
 SYMBOLS_URL3 = "https://dapi.binance.com/dapi/v1/exchangeInfo"
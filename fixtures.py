@@ -0,0 +1,80 @@
+from enums import DEFAULT_SCORING_TIMEFRAMES
+import numpy as np
+import pandas as pd
+import os
+
+'''
+Synthetic fixture coins shared by the benchmark scripts and the tests (see tests/), so the engines are compared on
+the same data whether they are timed or tested:
+    candle_coin(data_path, days) = coin holding deterministic 5m candles and the candles of every scoring timeframe
+    scored_coin(data_path, synthetic_scoring(days)) = coin holding a written historical scoring csv
+Fixture coins trade FIXUSDT and never reach Binance.
+'''
+
+INTERVAL_MS = {'5m':300000, '1h':3600000, '4h':14400000, '12h':43200000, '1d':86400000, '3d':259200000}
+START_UTS = 1609459200000 # 1 Jan 2021 UTC
+FILENAME_EXT = '-'.join(DEFAULT_SCORING_TIMEFRAMES)
+
+
+def candle_coin(data_path, days, seed=0):
+    '''
+    Returns a fixture coin holding given days of random walk 5m candles, and every scoring timeframe built from them
+    '''
+
+    from get_candles import Coin
+
+    rng = np.random.default_rng(seed)
+    uts_5m = START_UTS + np.arange(days * 288) * INTERVAL_MS['5m']
+    closes = 10 * np.exp(np.cumsum(rng.normal(0, 0.004, len(uts_5m))))
+    opens = np.concatenate([[10.0], closes[:-1]])
+    highs = np.maximum(opens, closes) * (1 + rng.uniform(0, 0.003, len(uts_5m)))
+    lows = np.minimum(opens, closes) * (1 - rng.uniform(0, 0.003, len(uts_5m)))
+
+    coin = Coin('FIX', data_path=data_path)
+    for timeframe in ['5m', *DEFAULT_SCORING_TIMEFRAMES]:
+        candle_uts = uts_5m - uts_5m % INTERVAL_MS[timeframe] # epoch aligned like Binance for these intervals
+        starts = np.flatnonzero(np.diff(candle_uts, prepend=-1))
+        klines = [[int(candle_uts[i]), f'{opens[i]:.6f}', f'{highs[i:j].max():.6f}', f'{lows[i:j].min():.6f}', f'{closes[j - 1]:.6f}',
+                   '0', int(candle_uts[i]) + INTERVAL_MS[timeframe] - 1, '0', 0, '0', '0', '0']
+                  for i, j in zip(starts, [*starts[1:], len(uts_5m)])]
+        coin.candlestick_data_file_marker(coin.get_candlestick_path('FIXUSDT', timeframe), 'w', klines)
+    return coin
+
+
+def synthetic_scoring(days, seed=0, gap_rate=0):
+    '''
+    Returns a historical scoring DataFrame of given days of 5m rows, with a gap_rate of missing rows (Binance
+    maintenance). The scores of every timeframe persist for a few rows, like the real scores of 5m rows.
+    '''
+
+    rng = np.random.default_rng(seed)
+    uts = START_UTS + np.arange(days * 288) * INTERVAL_MS['5m']
+    uts = uts[rng.random(len(uts)) >= gap_rate]
+    num_rows = len(uts)
+    tf_scores = {}
+    for timeframe in DEFAULT_SCORING_TIMEFRAMES:
+        for score in ['BEAR', 'BULL']:
+            redraw = rng.random(num_rows) < 0.2
+            redraw[0] = True
+            draws = rng.choice(7, num_rows, p=[0.5, 0.2, 0.1, 0.08, 0.06, 0.04, 0.02])
+            tf_scores[f'FIXUSDT_{timeframe}_{score}'] = draws[np.maximum.accumulate(np.where(redraw, np.arange(num_rows), 0))]
+    return pd.DataFrame({'UTS':uts, 'price':np.round(10 * np.exp(np.cumsum(rng.normal(0, 0.004, num_rows))), 6),
+                         'bull_scores':sum(scores for name, scores in tf_scores.items() if name.endswith('BULL')),
+                         'bear_scores':sum(scores for name, scores in tf_scores.items() if name.endswith('BEAR')),
+                         'change_scores':rng.integers(-6, 7, num_rows), **tf_scores})
+
+
+def scored_coin(data_path, historical_DF, end_row=None):
+    '''
+    Returns a fixture coin holding the rows of historical_DF up to end_row as its historical scoring csv.
+    Its historical scores are never recomputed, so the coin simulates and looks ahead on exactly these rows.
+    '''
+
+    from get_candles import Coin
+
+    coin = Coin('FIX', data_path=data_path)
+    coin.compute_historical_score = lambda symbol, custom_timeframes: None # scores are already written
+    for path in [coin.historical_scoring_path, coin.trading_simulation_path, coin.look_ahead_path]:
+        os.makedirs(f'{path}/FIXUSDT', exist_ok=True)
+    historical_DF.iloc[:end_row].to_csv(f'{coin.historical_scoring_path}/FIXUSDT/historical_scoring_FIXUSDT_{FILENAME_EXT}.csv', index=False)
+    return coin
@@ -1,17 +1,31 @@
 from binance.exceptions import BinanceAPIException # Third party 
-from config import client
-from enums import INTERVALS, EARLIEST_DATE, BEAR_MARKETS, BULL_MARKETS, STANDARD_TRADING_PAIRS, DEFAULT_SCORING_TIMEFRAMES
-from utility import filter_market_periods, get_filename_extension
+from config import client, kline_fetcher, kline_stream, threshold_cache, candle_cache, live_score_cache, cut_point_tables
+from enums import INTERVALS, EARLIEST_DATE, BEAR_MARKETS, BULL_MARKETS, STANDARD_TRADING_PAIRS, DEFAULT_SCORING_TIMEFRAMES, CANDLE_STORAGE
+from enums import HISTORICAL_SCORING_ENGINE, TRADING_SIMULATION_ENGINE, LOOK_AHEAD_ENGINE, RESAMPLED_TIMEFRAMES
+from utility import filter_market_periods, get_filename_extension, atomic_file
+from candle_store import CANDLE_STORES
+from candle_resampler import SOURCE_TIMEFRAME, resample_store
+from historical_scoring import score_timeframe
+from trading_simulation import trade_log_header, initial_state, record_trades, load_checkpoint, save_checkpoint, csv_bytes
+from trading_simulation import score_runs, event_rows, simulate_strategy
+from look_ahead import look_ahead_rows
+from cut_points import PERFORMANCE_QUANTILES, CHANGE_QUANTILES, AMPLITUDE_QUANTILES, percent_change_arrays, cut_point_rows
+from cut_points import performance_scores, amplitude_scores
+from analytics_pipeline import AnalyticsPipeline
+from score_reader import ScoreReader
+from time_index import TimeIndex
+from score_histogram import ScoreHistogram, SCORE_METRICS, DELTA_LOG_LIMIT, load_score_state, save_score_json
+from score_histogram import append_score_delta, compact_score_json
 from glob import glob
 from time import time
 from datetime import datetime
 from collections import defaultdict
 from statistics import stdev
 from numpy import nan, arange
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
+import numpy as np
 import pandas as pd
 import bisect
+import shutil
 import json 
 import csv
 import os
@@ -46,11 +60,15 @@ class Coin():
     Future plans will be for this class to send signals to a trading bot to perform the actions.
     '''
 
-    def __init__(self, coin):	
+    def __init__(self, coin, candle_storage=CANDLE_STORAGE, data_path=None):	
 
         self.coin = coin.upper()
         self.holdings = None
-        self.coin_path = os.path.dirname(os.path.realpath(__file__)) + f"/coindata/{self.coin}"
+        self.candle_storage = candle_storage
+        self.candle_store_type = CANDLE_STORES[candle_storage] # csv or columnar candlestick storage
+        data_path = data_path if data_path else os.path.dirname(os.path.realpath(__file__)) + "/coindata"
+        self.data_path = data_path
+        self.coin_path = f"{data_path}/{self.coin}"
         self.candlestick_path = f'{self.coin_path}/candlestick_data'
         self.historical_scoring_path = f'{self.coin_path}/historical_scorings'
         self.look_ahead_path = f'{self.coin_path}/look_aheads'
@@ -59,10 +77,16 @@ class Coin():
         self.graph_path = f'{self.coin_path}/graphs'
         self.json_file = f"{self.coin_path}/analysis_{self.coin}.json"
         self.previous_update_UTS = None
-        self.previous_updated_simulations = []
+        self.kline_fetcher = kline_fetcher # process wide concurrent fetcher (see kline_fetcher.py)
+        self.kline_stream = kline_stream # process wide live candles (see kline_stream.py)
+        self.threshold_cache = threshold_cache # process wide optimal thresholds (see threshold_cache.py)
+        self.candle_cache = candle_cache # process wide stored symbol timeframes and candle arrays (see candle_cache.py)
+        self.live_score_cache = live_score_cache # process wide current scores per forming candle tick (see live_score_cache.py)
+        self.cut_point_tables = cut_point_tables # process wide percentile cut points of the analysis jsons (see cut_points.py)
+        self.previous_updated_simulations = {} # symbol_filename_ext: time() historical scores were last computed by rescore_history
         self.deafult_scoring_timeframes = DEFAULT_SCORING_TIMEFRAMES # deafult set of timeframes used to compute score
         if not os.path.exists(self.coin_path):
-            os.mkdir(self.coin_path)
+            os.makedirs(self.coin_path)
             os.mkdir(self.candlestick_path)
             os.mkdir(self.historical_scoring_path)
             os.mkdir(self.look_ahead_path)
@@ -72,6 +96,7 @@ class Coin():
             os.mkdir(f'{self.graph_path}/look_aheads')
             os.mkdir(f'{self.graph_path}/trading_simulations')
             os.mkdir(f'{self.graph_path}/price_action_overlays')           
+            self.candle_cache.invalidate(self.coin_path)
 
 
     def get_candles(self, tradingpair, timeframes):
@@ -82,94 +107,88 @@ class Coin():
         '''
         print(f'get_candle COIN: {self.coin} got: {tradingpair} | {timeframes}')
         # return
-        symbol = self.coin.upper() + tradingpair.upper()
-        for timeframe in timeframes:
-            candlestick_path = self.get_candlestick_path(symbol, timeframe)
-            try:
-                if os.path.exists(candlestick_path):
-                    latest_candle = self.get_latest_stored_uts(candlestick_path)
-                    klines = client.get_historical_klines(symbol, timeframe, latest_candle) # Retreve only new candles from Binance API
-                    self.candlestick_data_file_marker(candlestick_path, 'r+', klines) # Append only new candles
+        return self.get_all_candles({tradingpair:timeframes})
+
+
+    def get_all_candles(self, tradingpair_timeframes):
+        '''
+        Retreves the candles of every given tradingpair: timeframes concurrently, see get_candles.
+        RESAMPLED_TIMEFRAMES are not downloaded but built from the 5m candles, which are downloaded instead.
+        Returns 1 if all tradingpairs were updated, 0 if Binance rejected a tradingpair.
+        '''
+
+        jobs = []
+        for tradingpair, timeframes in tradingpair_timeframes.items():
+            symbol = self.coin.upper() + tradingpair.upper()
+            downloaded_timeframes = [timeframe for timeframe in timeframes if timeframe not in RESAMPLED_TIMEFRAMES]
+            if len(downloaded_timeframes) < len(timeframes) and SOURCE_TIMEFRAME not in downloaded_timeframes:
+                downloaded_timeframes.append(SOURCE_TIMEFRAME)
+            for timeframe in downloaded_timeframes:
+                candle_store = self.get_candle_store(symbol, timeframe)
+                if candle_store.exists():
+                    jobs.append((symbol, timeframe, candle_store.latest_uts())) # Retreve only new candles from Binance API
                 else:
-                    klines = client.get_historical_klines(symbol, timeframe, EARLIEST_DATE) # Get all candlesticks from earliest possible date from binance.
-                    self.candlestick_data_file_marker(candlestick_path, 'w', klines)
+                    jobs.append((symbol, timeframe, EARLIEST_DATE)) # Get all candlesticks from earliest possible date from binance.
+
+        rejected_tradingpairs = []
+        for (symbol, timeframe, start), klines in zip(jobs, self.kline_fetcher.fetch(jobs)):
+            if isinstance(klines, BinanceAPIException):
+                tradingpair = symbol[len(self.coin):]
+                rejected_tradingpairs += [] if tradingpair in rejected_tradingpairs else [tradingpair]
+                continue
+            candle_store = self.get_candle_store(symbol, timeframe)
+            if start == EARLIEST_DATE:
+                self.candlestick_data_file_marker(candle_store.path, 'w', klines)
+            else:
+                self.candlestick_data_file_marker(candle_store.path, 'r+', klines) # Append only new candles
+
+        for tradingpair, timeframes in tradingpair_timeframes.items():
+            if tradingpair.upper() in rejected_tradingpairs:
+                continue
+            symbol = self.coin.upper() + tradingpair.upper()
+            for timeframe in timeframes:
+                if timeframe in RESAMPLED_TIMEFRAMES:
+                    self.resample_candles(symbol, timeframe)
                 if timeframe == '1h':
-                    self.previous_update_UTS = self.get_latest_stored_uts(candlestick_path) # Keeps track of the latest hour coin was updated.
+                    self.previous_update_UTS = self.get_candle_store(symbol, timeframe).latest_uts() # Keeps track of the latest hour coin was updated.
+
+        for tradingpair in rejected_tradingpairs:
+            try:
+                standard_symbol = self.coin + 'USDT'
+                self.kline_fetcher.fetch_klines(standard_symbol, '1w', "1 Jan, 2022", max_klines=1)
+                print(f"Binance API exception, the coin {self.coin} does not have a trading pair {tradingpair.upper()}.")
             except BinanceAPIException:
-                try:
-                    standard_symbol = self.coin + 'USDT'
-                    client.get_historical_klines(standard_symbol, timeframe, "1 Jan, 2022")
-                    print(f"Binance API exception, the coin {self.coin} does not have a trading pair {tradingpair.upper()}.")
-                except BinanceAPIException:
-                    print(f"Binance API exception, the coin {self.coin} is not listed on Binance.")
-                    self.remove_coin() # remove all trace of invalid coin from db
+                print(f"Binance API exception, the coin {self.coin} is not listed on Binance.")
+                self.remove_coin() # remove all trace of invalid coin from db
                 return 0
-        return 1
+        return 0 if rejected_tradingpairs else 1
+
+
+    def resample_candles(self, symbol, timeframe):
+        '''
+        Builds or updates the candles of symbol_timeframe from the stored 5m candles (see candle_resampler.py)
+        '''
+
+        target = self.get_candle_store(symbol, timeframe)
+        num_written = resample_store(self.get_candle_store(symbol, SOURCE_TIMEFRAME), target, timeframe)
+        self.candle_cache.invalidate(target.path)
+        return num_written
 
 
     def candlestick_data_file_marker(self, file_path, mode, klines): # TODO make private
         '''
         Creates or updates data storage for all historical candlestick data for coin.
+        Mode 'w' creates the store, any other mode overwrites the stored forming candle and appends the new candles.
         '''
 
-        with open(file_path, mode, newline='') as f:
-            csv_writer = csv.writer(f, delimiter=',')
-            columns = [
-                    'open_uts',
-                    'open',
-                    'high',
-                    'low',
-                    'close',
-                    'volumne',
-                    'close_time',
-                    'asset_vol',
-                    'num_trades',
-                    'base_buyer_vol',
-                    'quote_buyer_vol',
-                    f'{0:030}'
-                ]
-            if mode == 'w':
-                num_new_closed_rows = len(klines[:-1]) # don't count latest kline since that hasn't yet closed
-                columns[-1] = f'{num_new_closed_rows:030}'
-                csv_writer.writerow(columns)
-                [csv_writer.writerow(kline) for kline in klines]
-            else:
-                num_new_closed_rows = int(f.readline().split(',')[-1].lstrip('0')) + len(klines[:-1])
-                columns[-1] = f'{num_new_closed_rows:030}'
-                f.seek(0)
-                csv_writer.writerow(columns)
-                f.seek(0, os.SEEK_END)
-                self.modify_candlestick_data_file(csv_writer, f, klines[0])
-                [csv_writer.writerow(kline) for kline in klines[1:]]
-
-
-    def modify_candlestick_data_file(self, csv_writer, file_obj, kline):
-        '''
-        Modifies the final row of given candlestick csv file in-place
-        '''
-
-        latest_kline_string = ','.join([str(col) if type(col) == int else col for col in kline])
-        latest_kline_string_byte_size = len(latest_kline_string.encode('utf-8'))
-        file_obj.seek(0, os.SEEK_END)
-        eof = file_obj.tell()
-        file_obj.seek(eof - 500) # jump close to eof
-        final_stored_row = file_obj.readlines()[-1] # grab the final row
-        final_stored_row_byte_size = len(final_stored_row.encode('utf-8'))
-        alignment = 0 if '\r' in final_stored_row else 1 # windows may have \r in row string
-        file_obj.seek(eof - final_stored_row_byte_size - alignment) # seek to precisely start of last row
-        if latest_kline_string_byte_size >= final_stored_row_byte_size:
-            csv_writer.writerow(latest_kline_string.split(','))
+        candle_store = self.candle_store_type(file_path)
+        if mode == 'w':
+            candle_store.write(klines)
         else:
-            buffer_size = final_stored_row.split(',')[-1][1:].count('0')
-            overflow = final_stored_row_byte_size - latest_kline_string_byte_size
-            overflow -= 1 if alignment else 2 # \n or \r\n
-            if buffer_size < overflow:
-                addition = overflow
-            else:
-                addition = buffer_size
-            latest_kline_string += '0' * addition
-            csv_writer.writerow(latest_kline_string.split(','))
-                
+            candle_store.append(klines)
+        candle_store.update_index()
+        self.candle_cache.invalidate(file_path)
+
 
     def get_latest_stored_uts(self, candle_csv_path):
         '''
@@ -179,7 +198,7 @@ class Coin():
         with open(candle_csv_path, 'r') as f:
             f.seek(0, os.SEEK_END)
             eof = f.tell()
-            f.seek(eof - 500) # get final row
+            f.seek(max(eof - 500, 0)) # get final row
             return int(f.readlines()[-1].split(',')[0])
 
 
@@ -188,14 +207,8 @@ class Coin():
         Returns all symbol timeframes stored for given coin, as_list: [INJBTC_4h, INJUSDT_4h, ...], as_dict: {BTCUSDT:[1h, 4h,...],}
         '''
 
-        stored_symbols = [f.split('/')[-1] for f in glob(f'{self.candlestick_path}/*')]
-        symbol_timeframes_list = []
-        symbol_timeframes_dict = {}
-        for symbol in stored_symbols:
-            stored_timeframes = [f.split('/')[-1].split('_')[-1].split('.')[0] for f in glob(f'{self.candlestick_path}/{symbol}/[!a]*')]
-            stored_timeframes.sort(key=lambda tf : INTERVALS.index(tf))
-            symbol_timeframes_dict[symbol] = stored_timeframes
-            symbol_timeframes_list.extend([f'{symbol}_{tf}' for tf in stored_timeframes])
+        symbol_timeframes_dict = self.candle_cache.symbol_timeframes(self.candlestick_path, self.candle_store_type.EXTENSION)
+        symbol_timeframes_list = [f'{symbol}_{tf}' for symbol, timeframes in symbol_timeframes_dict.items() for tf in timeframes]
 
         return symbol_timeframes_list if as_list else symbol_timeframes_dict
 
@@ -206,9 +219,9 @@ class Coin():
         '''
 
         symbol, timeframe = symbol_timeframe.split('_')
-        datafile = self.get_candlestick_path(symbol, timeframe)
-        if os.path.exists(datafile):
-            os.remove(datafile)
+        candle_store = self.get_candle_store(symbol, timeframe)
+        candle_store.remove()
+        self.candle_cache.invalidate(candle_store.path)
 
 
     def remove_symbol(self, symbol):
@@ -222,7 +235,7 @@ class Coin():
        
         for base_path in glob(f'{self.coin_path}/*'):
             for symbol_path in glob(f'{base_path}/{symbol}/*'):
-                os.remove(symbol_path)
+                shutil.rmtree(symbol_path) if os.path.isdir(symbol_path) else os.remove(symbol_path) # columnar stores are folders
             if base_path == self.graph_path:
                 for graph_path in glob(f'{self.graph_path}/*'):
                     for symbol_path in glob(f'{graph_path}/{symbol}/*'):
@@ -230,6 +243,7 @@ class Coin():
                 os.rmdir(f'{self.graph_path}/{symbol}')
             else:
                 os.rmdir(f'{base_path}/{symbol}')
+        self.candle_cache.invalidate(f'{self.candlestick_path}/{symbol}')
         if not self.get_symbol_timeframes():
             self.remove_coin() # When no more symbols remaining, remove coin folder
         return 0
@@ -244,6 +258,7 @@ class Coin():
         for symbol in stored_symbol_timeframes:
             self.remove_symbol(symbol)
         os.rmdir(self.coin_path)
+        self.candle_cache.invalidate(self.coin_path)
 
 
     def create_tradingpair_folders(self, symbol):
@@ -252,7 +267,9 @@ class Coin():
         '''
 
         os.mkdir(f'{self.candlestick_path}/{symbol}')
+        self.candle_cache.invalidate(f'{self.candlestick_path}/{symbol}')
         open(f'{self.candlestick_path}/{symbol}/analysis_{symbol}.json', 'w').close()
+        self.cut_point_tables.invalidate(f'{self.candlestick_path}/{symbol}/analysis_{symbol}.json')
         os.mkdir(f'{self.historical_scoring_path}/{symbol}')
         os.mkdir(f'{self.look_ahead_path}/{symbol}')
         os.mkdir(f'{self.retain_scoring_path}/{symbol}')
@@ -264,12 +281,20 @@ class Coin():
 
     def get_candlestick_path(self, symbol, timeframe): # TODO make private
         '''
-        Returns absolute path of candlestick csv file for given symbol and timeframe
+        Returns absolute path of candlestick csv file (or columnar folder) for given symbol and timeframe
         '''
 
         if not os.path.exists(f'{self.candlestick_path}/{symbol}'):
             self.create_tradingpair_folders(symbol)
-        return f"{self.candlestick_path}/{symbol}/{symbol}_{timeframe}.csv" 
+        return f"{self.candlestick_path}/{symbol}/{symbol}_{timeframe}{self.candle_store_type.EXTENSION}" 
+
+
+    def get_candle_store(self, symbol, timeframe):
+        '''
+        Returns candle storage object (see candle_store.py) for given symbol and timeframe
+        '''
+
+        return self.candle_store_type(self.get_candlestick_path(symbol, timeframe))
 
 
     def synchronize_score_jsons(self): # TODO make private
@@ -279,66 +304,55 @@ class Coin():
         
         stored_symbol_timeframes = self.get_symbol_timeframes()
         for symbol in stored_symbol_timeframes:
-            with open(f'{self.candlestick_path}/{symbol}/analysis_{symbol}.json', 'r') as jf:
-                scoring_json = json.load(jf)
-                stored_json_timeframes = set(scoring_json.keys())
-                stored_csv_timeframes = set(stored_symbol_timeframes[symbol])
-                new_timeframes = stored_csv_timeframes.difference(stored_json_timeframes)
-                outdated_timeframes = stored_json_timeframes.difference(stored_csv_timeframes)
-
-                for new_timeframe in new_timeframes:
-                    scoring_json[new_timeframe] = {
-                        'candle_change':[],
-                        'candle_amplitude':[],
-                        'candle_max_up':[],
-                        'candle_max_down':[]
-                    }
-                for outdated_timeframe in outdated_timeframes:
-                    scoring_json.pop(outdated_timeframe)
+            scoring_json, positions, _ = load_score_state(f'{self.candlestick_path}/{symbol}/analysis_{symbol}.json')
+            stored_json_timeframes = set(scoring_json.keys())
+            stored_csv_timeframes = set(stored_symbol_timeframes[symbol])
+            new_timeframes = stored_csv_timeframes.difference(stored_json_timeframes)
+            outdated_timeframes = stored_json_timeframes.difference(stored_csv_timeframes)
+
+            for new_timeframe in new_timeframes:
+                scoring_json[new_timeframe] = {metric:ScoreHistogram() for metric in SCORE_METRICS}
+            for outdated_timeframe in outdated_timeframes:
+                scoring_json.pop(outdated_timeframe)
+                positions.pop(outdated_timeframe, None)
 
             if new_timeframes or outdated_timeframes:
-                with open(f'{self.candlestick_path}/{symbol}/analysis_{symbol}.json', 'w') as jf:
-                    json.dump(scoring_json, jf, indent=4)
+                save_score_json(f'{self.candlestick_path}/{symbol}/analysis_{symbol}.json', scoring_json, positions)
+                self.cut_point_tables.invalidate(f'{self.candlestick_path}/{symbol}/analysis_{symbol}.json')
                 return 1 # update performed
             return 0 # no update performed
 
 
     def update_score_jsons(self): # TODO make private
         '''
-        Retreves candle data starting from last updated date and then updates the json
+        Retreves candle data starting from last updated date and then updates the json.
+        New candles are appended to the json's delta log, which is compacted into the json every DELTA_LOG_LIMIT entries.
         '''
 
         stored_symbol_timeframes = self.get_symbol_timeframes()
         for symbol in stored_symbol_timeframes:
-            with open(f'{self.candlestick_path}/{symbol}/analysis_{symbol}.json', 'r') as jf:
-                scoring_json = json.load(jf)
+            json_path = f'{self.candlestick_path}/{symbol}/analysis_{symbol}.json'
+            scoring_json, positions, log_entries = load_score_state(json_path)
             for timeframe in stored_symbol_timeframes[symbol]:
-                with open(self.get_candlestick_path(symbol, timeframe)) as f:
-                    csv_reader = csv.reader(f)
-                    header = csv_reader.__next__()
-                    csv_data_len = int(header[-1].lstrip('0'))
-                    json_data_len = len(scoring_json[timeframe]['candle_change'])
-                    if csv_data_len < json_data_len:
-                        skip = json_data_len # Skip rows of csvfile until new data is reached. 
-                        change_dict_list = []
-                        for row in csv_reader:
-                            if skip > 0:
-                                skip -= 1
-                                continue
-                            change_dict_list.append(
-                                self.percent_changes(float(row[1]),
-                                float(row[2]),
-                                float(row[3]),
-                                float(row[4]))
-                            )
-                        change_dict_list.pop() # final row has not yet closed
-
-                    for new_data in change_dict_list:
-                        for metric in scoring_json[timeframe]:
-                            bisect.insort(scoring_json[timeframe][metric], new_data[metric]) # add to sorted list
-    
-            with open(f'{self.candlestick_path}/{symbol}/analysis_{symbol}.json', 'w') as jf:
-                json.dump(scoring_json, jf, indent=4)
+                candle_store = self.get_candle_store(symbol, timeframe)
+                json_data_len = len(scoring_json[timeframe]['candle_change'])
+                num_closed_rows = candle_store.num_closed_rows()
+                if num_closed_rows <= json_data_len:
+                    continue
+                # Read only the closed candles which are not yet in the json, starting from the stored position of the last update
+                position = positions[timeframe][1] if timeframe in positions else None
+                new_candles, position = candle_store.scan(['open', 'high', 'low', 'close'], json_data_len, num_closed_rows, position)
+                new_data = percent_change_arrays(*[np.asarray(new_candles[column], dtype=float) for column in ['open', 'high', 'low', 'close']])
+                value_counts = {metric:dict(zip(*[values.tolist() for values in np.unique(new_data[metric], return_counts=True)]))
+                                for metric in SCORE_METRICS}
+                append_score_delta(json_path, timeframe, json_data_len, num_closed_rows, position, value_counts)
+                log_entries += 1
+                # current_score cut points of the closed candles, so the json is not reloaded per score
+                self.cut_point_tables.update(json_path, timeframe, {metric:scoring_json[timeframe][metric].add_counts(value_counts[metric])
+                                                                    for metric in value_counts})
+
+            if log_entries >= DELTA_LOG_LIMIT:
+                compact_score_json(json_path)
 
 
     def update_database(self): # TODO make private
@@ -349,10 +363,8 @@ class Coin():
         # More expensive update, only perform at most every hour or when need update.
         if self.synchronize_score_jsons() or not self.previous_update_UTS or (time() - self.previous_update_UTS >= 3600):
             symbol_timeframes = self.get_symbol_timeframes()
-            for symbol in symbol_timeframes:
-                tradingpair = symbol.split(self.coin)[-1]
-                timeframes = symbol_timeframes[symbol]
-                self.get_candles(tradingpair, timeframes)
+            # fetch every symbol_timeframe of the coin at once rather than one tradingpair at a time
+            self.get_all_candles({symbol.split(self.coin)[-1]:timeframes for symbol, timeframes in symbol_timeframes.items()})
             self.update_score_jsons()
 
 
@@ -363,61 +375,75 @@ class Coin():
         change_score indicates how likely the current price will change_score based on all historical candle closes
         Amplitude score indicates how volitile the current price action is compared to all historical candle closes
         Optional parameter `server_monitored_timeframes` which takes a list of symbol_timeframes to specifically calculate score for.
+        Scores are computed once per forming candle tick and shared by every caller of the process (see live_score_cache.py),
+        so the returned score must not be mutated.
+        '''
+
+        timeframes = sorted(custom_timeframes, key=lambda timeframe : INTERVALS.index(timeframe))
+        latest_klines = {timeframe:self.kline_stream.latest_kline(symbol, timeframe) for timeframe in timeframes} # forming candles from the kline stream
+        tick = tuple(tuple(latest_klines[timeframe][:5]) for timeframe in timeframes) if all(latest_klines.values()) else None
+        return self.live_score_cache.get(symbol, timeframes, custom_threshold, tick,
+                                         lambda : self.score_latest_klines(symbol, timeframes, latest_klines, custom_threshold))
+
+
+    def score_latest_klines(self, symbol, custom_timeframes, latest_klines, custom_threshold=None):
+        '''
+        Computes the current score of current_score from the forming candle of each timeframe (None when not streamed).
         '''
 
         self.update_database()
         if not custom_threshold:
             custom_threshold = self.optimise_signal_threshold(symbol, custom_timeframes) # TODO optimise with threading
-        bear_threshold, bull_threshold = [threshold.split(':')[-1] for threshold in custom_threshold.split('|')]
+        bear_threshold, bull_threshold = [int(threshold.split(':')[-1]) for threshold in custom_threshold.split('|')]
         print(f'current_score: input {symbol} : {custom_timeframes}, bull_threshold: {bear_threshold}, bear_threshold: {bull_threshold}')
 
-        score_dict = {}
+        candles = []
         latest_price = 0
-        for timeframe in sorted(custom_timeframes, key=lambda timeframe : INTERVALS.index(timeframe)):
-            latest_candle = self.get_latest_stored_uts(self.get_candlestick_path(symbol, timeframe))
-            klines = client.get_historical_klines(symbol, timeframe, latest_candle)[0] # TODO add volumn data
-            score_dict[timeframe] = self.percent_changes(float(klines[1]), float(klines[2]), float(klines[3]), float(klines[4]))
+        for timeframe in custom_timeframes:
+            klines = latest_klines[timeframe]
+            if not klines: # not streamed yet (or stream stalled), subscribe for the next request and use the REST api
+                self.kline_stream.subscribe(symbol, timeframe)
+                latest_candle = self.get_candle_store(symbol, timeframe).latest_uts()
+                klines = client.get_historical_klines(symbol, timeframe, latest_candle)[0] # TODO add volumn data
+            candles.append([float(price) for price in klines[1:5]])
             latest_price = klines[4]
 
-        with open(f'{self.candlestick_path}/{symbol}/analysis_{symbol}.json', 'r') as jf:
-            scoring_json = json.load(jf)
-        for timeframe in score_dict:
-            bull_score, bear_score, change_score = 0, 0, 0
+        # score the forming candle of every timeframe in one batch, against the cut points of its timeframe (see cut_points.py)
+        changes = percent_change_arrays(*np.array(candles, dtype=float).reshape(-1, 4).T)
+        cut_points = self.cut_point_tables.get(f'{self.candlestick_path}/{symbol}/analysis_{symbol}.json')
+        metrics = ["candle_max_up" if change > 0 else "candle_max_down" for change in changes['candle_change']]
+        scores, change_scores = performance_scores(
+            absolute_change=np.abs(changes['candle_change']),
+            percent_change=changes['candle_change'],
+            max_cuts=cut_point_rows([cut_points[timeframe][metric] for timeframe, metric in zip(custom_timeframes, metrics)], PERFORMANCE_QUANTILES),
+            change_cuts=cut_point_rows([cut_points[timeframe]["candle_change"] for timeframe in custom_timeframes], CHANGE_QUANTILES)
+            )
+        amp_scores = amplitude_scores(changes['candle_amplitude'],
+                                      cut_point_rows([cut_points[timeframe]["candle_amplitude"] for timeframe in custom_timeframes], AMPLITUDE_QUANTILES))
+
+        score_dict = {timeframe:{metric:changes[metric][i].item() for metric in changes} for i, timeframe in enumerate(custom_timeframes)}
+        bull_score, bear_score, change_score = 0, 0, 0
+        for i, timeframe in enumerate(custom_timeframes):
             current_change = score_dict[timeframe]['candle_change']
             amplitude_change = score_dict[timeframe]['candle_amplitude']
-            if current_change > 0:
-                metric = "candle_max_up"
-                score_dict[symbol][timeframe]["candle_max_down"] = 'NA'
-            else:
-                metric = "candle_max_down"
-                score_dict[symbol][timeframe]["candle_max_up"] = 'NA'
-            amp_score = self.score_amplitude(
-                amp_list=scoring_json[timeframe]["candle_amplitude"],
-                size=len(scoring_json[timeframe]["candle_amplitude"]),
-                amplitude_change=amplitude_change
-                )
-            score, change_score_ = self.score_performance(
-                max_list=scoring_json[timeframe][metric],
-                change_list=scoring_json[timeframe]["candle_change"],
-                size=len(scoring_json[timeframe][metric]),
-                absolute_change=abs(current_change),
-                current_percent_change=current_change
-                )
+            metric = metrics[i]
+            score_dict[timeframe]["candle_max_down" if metric == "candle_max_up" else "candle_max_up"] = 'NA'
+            amp_score, score, change_score_ = int(amp_scores[i]), int(scores[i]), int(change_scores[i])
 
             # Construct current scoring summary dict to send to server
             if amp_score > 0:
-                historical_average = self.average(scoring_json[timeframe]["candle_amplitude"])
+                historical_average = round(cut_points[timeframe]["candle_amplitude"].mean, 1)
                 score_dict[timeframe]["candle_amplitude"] = \
                     f"Score: {amp_score} | Change: {amplitude_change}% | average: {historical_average}%"
             elif amp_score < 0:
-                historical_average = self.average(scoring_json[timeframe]["candle_amplitude"])
+                historical_average = round(cut_points[timeframe]["candle_amplitude"].mean, 1)
                 score_dict[timeframe]["candle_amplitude"] = \
                     f"Unusually small amplitude | Change: {amplitude_change}% | average: {historical_average}%"
             else:
                 score_dict[timeframe]["candle_amplitude"] = 'AVERAGE'
             
             if score:
-                historical_average = self.average(scoring_json[timeframe][metric])
+                historical_average = round(cut_points[timeframe][metric].mean, 1)
                 score_dict[timeframe][metric] = \
                     f"Score: {score} | Change score: {change_score} | Change: {current_change}% | average: {historical_average}%"
                 if metric == "candle_max_up":
@@ -439,19 +465,36 @@ class Coin():
         return [symbol, bull_score, bear_score, change_score, signal, latest_price, score_dict]
 
     
-    def compute_historical_score(self, symbol, custom_timeframes):
+    def compute_historical_score(self, symbol, custom_timeframes, engine=HISTORICAL_SCORING_ENGINE):
         '''
         Calculates bull/bear/change_scorement score for all 5 minute intervals of the coins history.
         Each 5 minutes simulates running the current score method back in time, with information known only back during the 5minute interval
         Bull/Bear score indicates how well the current price action performs compared to all histortical candle data
         Retain_score indicates how likely the current price will change_score based on historical data
         If prior historical analysis is present, only the latest data will be computed and appended.
+        engine is either 'numpy' (vectorised, see historical_scoring.py) or 'loop' (original row by row scoring).
         '''
 
         print(f'computing historical score for {symbol}...')
         self.update_database() # Get latest candles from Binance
         self.get_candles(symbol.split(self.coin)[-1], ["5m"]) # update latest 5min data - this may take time due to Binance
         print('Latest candle data aquired! Comencing score calculation...')
+        historical_score_path = f'{self.historical_scoring_path}/{symbol}/historical_scoring_{symbol}_{get_filename_extension(custom_timeframes)}.csv'
+        previous_scored_uts = self.get_latest_stored_uts(historical_score_path) if os.path.exists(historical_score_path) else None
+        if engine == 'numpy':
+            self.score_history_numpy(symbol, custom_timeframes)
+        else:
+            self.score_history_loop(symbol, custom_timeframes)
+        if os.path.exists(historical_score_path) and self.get_latest_stored_uts(historical_score_path) != previous_scored_uts: # new scores, thresholds have to be simulated again
+            self.threshold_cache.invalidate(self.get_threshold_cache_path(symbol), get_filename_extension(custom_timeframes))
+            self.live_score_cache.invalidate(symbol)
+
+
+    def score_history_loop(self, symbol, custom_timeframes):
+        '''
+        Row by row historical scoring engine, scores every 5 minute row with score_performance against growing sorted lists.
+        '''
+
         filename_ext = get_filename_extension(custom_timeframes)
         if custom_timeframes:
             symbol_timeframes = sorted([symbol + '_' + tf for tf in custom_timeframes], key= lambda i : INTERVALS.index(i.split("_")[-1]))
@@ -459,7 +502,7 @@ class Coin():
             symbol_timeframes = [symbol + '_' + tf for tf in self.deafult_scoring_timeframes]
     
         # make dataframe to hold all historical 5min intervals (i.e. real time price action from the past).
-        historical_rt_price_DF = pd.read_csv(f"{self.coin_path}/{symbol}_5m.csv", usecols=[0, 4], names=["UTS", "price"], header=None, skiprows=1)
+        historical_rt_price_DF = self.get_candle_store(symbol, '5m').to_dataframe(['open_uts', 'close'], names=["UTS", "price"])
         bull_scores, bear_scores, change_scores = [], [], []
         score_tracker = {}
         timeframe_cols = {}
@@ -472,7 +515,7 @@ class Coin():
         symbol_timeframes_DF = pd.DataFrame()
         historical_percent_changes = {} # used to act like a dynamically growing analysis_coin.json
         for symbol_tf in symbol_timeframes:
-            temp_DF = pd.read_csv(f"{self.coin_path}/{symbol_tf}.csv", usecols=[0, 1, 2, 3, 4], names=timeframe_cols[symbol_tf], header=None, skiprows=1)
+            temp_DF = self.get_candle_store(*symbol_tf.split('_')).to_dataframe(['open_uts', 'open', 'high', 'low', 'close'], names=timeframe_cols[symbol_tf])
             historical_percent_changes[symbol_tf] = {'candle_change':[], 'candle_max_up':[], 'candle_max_down':[]}
             symbol_timeframes_DF = symbol_timeframes_DF.merge(right=temp_DF, how="outer", left_index=True, right_index=True)
 
@@ -483,7 +526,7 @@ class Coin():
         if os.path.exists(historical_scoring_csv_path):
             with open(historical_analysis_json_path, 'r') as jf:
                 historical_percent_changes = json.load(jf) 
-            skip_UTS = pd.read_csv(historical_scoring_csv_path).iloc[-1][0] # skip to where the last historical analysis ends
+            skip_UTS = self.get_latest_stored_uts(historical_scoring_csv_path) # skip to where the last historical analysis ends
             for symbol_tf in symbol_timeframes:
                 end_index = symbol_timeframes_DF[symbol_timeframes_DF[symbol_tf + '-UTS'].notnull()].shape[0] # get 1 past final index position
                 if symbol_timeframes_DF.index[symbol_timeframes_DF[symbol_tf + '-UTS'] >= skip_UTS].any():
@@ -588,50 +631,138 @@ class Coin():
             historical_rt_price_DF.insert(4, "change_scores", change_scores)
             [historical_rt_price_DF.insert(5 + count, timeframe, score_tracker[timeframe]) for count, timeframe in enumerate(score_tracker)]
             historical_rt_price_DF.to_csv(historical_scoring_csv_path, index=False)
+        TimeIndex(historical_scoring_csv_path).update()
         
         with open(historical_analysis_json_path, 'w') as jf:
             json.dump(historical_percent_changes, jf, indent=4) 
 
 
-    def generate_look_ahead_gains(self, symbol, custom_timeframes, custom_threshold=None):
+    def read_scoring_candles(self, symbol, timeframes):
+        '''
+        Returns {timeframe: {column: array}} of the candle data used by score_history_numpy for the given scoring timeframes
+        '''
+
+        columns = defaultdict(set, {'1d':{'open_uts'}, '5m':{'open_uts', 'close'}})
+        for timeframe in timeframes:
+            columns[timeframe].update(['open_uts', 'open', 'high', 'low', 'close'])
+        return {timeframe:self.candle_cache.read(self.get_candle_store(symbol, timeframe), sorted(columns[timeframe])) for timeframe in columns}
+
+
+    def score_history_numpy(self, symbol, custom_timeframes, candle_data=None):
+        '''
+        Vectorised historical scoring engine, produces the same files as score_history_loop.
+        Each 5 minute row is mapped to its enclosing candle and percentile thresholds are computed once per candle.
+        When resuming, rows are positioned as if scored from the start, so lists are never double counted.
+        candle_data optionally provides the arrays of read_scoring_candles (e.g. shared memory, see scoring_batch.py).
+        '''
+
+        filename_ext = get_filename_extension(custom_timeframes)
+        if custom_timeframes:
+            symbol_timeframes = sorted([symbol + '_' + tf for tf in custom_timeframes], key= lambda i : INTERVALS.index(i.split("_")[-1]))
+        else:
+            symbol_timeframes = [symbol + '_' + tf for tf in self.deafult_scoring_timeframes]
+        historical_scoring_csv_path = f"{self.historical_scoring_path}/{symbol}/historical_scoring_{symbol}_{filename_ext}.csv"
+        historical_analysis_json_path = f"{self.historical_scoring_path}/{symbol}/historical_analysis_{symbol}_{filename_ext}.json"
+
+        if not candle_data:
+            candle_data = self.read_scoring_candles(symbol, [symbol_tf.split('_')[-1] for symbol_tf in symbol_timeframes])
+        day_uts = candle_data['1d']['open_uts']
+        first_3day_UTS = int(day_uts[3]) # Skip because unreliable due to volitility in general
+        skip_UTS = int(day_uts[21]) # UTS date for 21 days of price action
+        price_data = candle_data['5m']
+        price_start = np.searchsorted(price_data['open_uts'], skip_UTS, side='right')
+        price_uts, prices = price_data['open_uts'][price_start:], price_data['close'][price_start:]
+        first_row = 0
+        if os.path.exists(historical_scoring_csv_path):
+            first_row = np.searchsorted(price_uts, self.get_latest_stored_uts(historical_scoring_csv_path), side='right') # skip to latest
+
+        bull_scores, bear_scores, change_scores = 0, 0, 0
+        score_tracker = {}
+        historical_percent_changes = {}
+        for symbol_tf in symbol_timeframes:
+            candles = candle_data[symbol_tf.split('_')[-1]]
+            bull, bear, change, historical_percent_changes[symbol_tf] = score_timeframe(
+                candles, price_uts, prices, first_3day_UTS, skip_UTS, first_row)
+            score_tracker[symbol_tf + "_BEAR"] = bear
+            score_tracker[symbol_tf + "_BULL"] = bull
+            bull_scores, bear_scores, change_scores = bull_scores + bull, bear_scores + bear, change_scores + change
+
+        historical_rt_price_DF = pd.DataFrame({"UTS":price_uts[first_row:], "price":prices[first_row:]})
+        historical_rt_price_DF.insert(2, "bull_scores", bull_scores)
+        historical_rt_price_DF.insert(3, "bear_scores", bear_scores)
+        historical_rt_price_DF.insert(4, "change_scores", change_scores)
+        [historical_rt_price_DF.insert(5 + count, timeframe, score_tracker[timeframe]) for count, timeframe in enumerate(score_tracker)]
+        resume = os.path.exists(historical_scoring_csv_path)
+        with atomic_file(historical_scoring_csv_path, 'a' if resume else 'w') as f: # readers never see a partial csv
+            historical_rt_price_DF.to_csv(f, header=not resume, index=False)
+        TimeIndex(historical_scoring_csv_path).update()
+
+        with atomic_file(historical_analysis_json_path) as jf:
+            json.dump(historical_percent_changes, jf, indent=4) 
+
+
+    def compute_historical_scores(self, jobs, max_workers=None):
+        '''
+        Batch version of compute_historical_score for a list of (symbol, custom_timeframes) jobs, which are scored in
+        parallel processes (see scoring_batch.py). Returns list of (symbol, custom_timeframes, error or None).
+        '''
+
+        from scoring_batch import compute_historical_scores
+        results = compute_historical_scores([(self.coin, symbol, custom_timeframes) for symbol, custom_timeframes in jobs],
+                                            max_workers, self.candle_storage, self.data_path)
+        return [(symbol, custom_timeframes, error) for _, symbol, custom_timeframes, error in results]
+
+
+    def generate_look_ahead_gains(self, symbol, custom_timeframes, custom_threshold=None, engine=LOOK_AHEAD_ENGINE, historical_scoring_DF=None):
         '''
         Searches through specificed historical_scoring csv to find bull/bear score peaks over a certain thresold.
         Once found, it calculates the % difference of if you sold/bought after 30min, 1h, 4h, 1d, 3d, 1w, 2w.
         Saves the data in 'look_ahead_gains.csv'
+        engine is either 'numpy' (all peaks at once, see look_ahead.py) or 'loop' (original look ahead per peak).
+        historical_scoring_DF is the up to date historical scoring when already loaded (e.g. by an AnalyticsPipeline).
         '''
 
         print('computing look ahead gains...')
         threshold_strat = ''
         if custom_threshold:
             threshold_strat = custom_threshold
-            self.compute_historical_score(symbol, timeframes)
+            if historical_scoring_DF is None:
+                self.compute_historical_score(symbol, custom_timeframes)
         else:
-            threshold_strat = self.optimise_signal_threshold(symbol, timeframes)
+            threshold_strat = self.optimise_signal_threshold(symbol, custom_timeframes, historical_DF=historical_scoring_DF)
         bull_threshold, bear_threshold = [int(threshold.split(':')[-1]) for threshold in threshold_strat.split('|')]
 
         filename_ext = get_filename_extension(custom_timeframes)
         historical_score_path = f"{self.historical_scoring_path}/{symbol}/historical_scoring_{symbol}_{filename_ext}.csv"
         look_ahead_gains_csv = f"{self.look_ahead_path}/{symbol}/look_ahead_gains_{symbol}_{filename_ext}.csv"
-        historical_scoring_DF = pd.read_csv(historical_score_path, index_col= 0, header=None, skiprows=1)
 
         with open(look_ahead_gains_csv, 'a') as outfile, open(look_ahead_gains_csv, 'r') as infile:
             retain_csv_writer = csv.writer(outfile)
-            skip_UTS = historical_scoring_DF.index[0]
+            start_row = 0
+            skip_UTS = 'UTS'
             if (outfile.tell() == 0):
                 timeframes = custom_timeframes if custom_timeframes else self.deafult_scoring_timeframes
                 retain_csv_writer.writerow(["UTC", "price", "peak_start", "change_score", "goal",
                                             "%diff_30min", "%diff_1h", "%diff_4h", "%diff_12h", "%diff_1d",
                                             "%diff_3d", "%diff_1w", "%diff_2w", *timeframes, "UTS"])
             else:
-                infile.seek(outfile.tell() - 15) # skip to end of file, capture last UTS
-                skip_UTS = infile.readline()
+                infile.seek(max(outfile.tell() - 500, 0)) # skip to end of file, capture last UTS
+                skip_UTS = infile.readlines()[-1].strip().split(',')[-1]
+            if historical_scoring_DF is None: # peaks only look ahead, so only the scores from the last peak onwards are read
+                historical_scoring_DF = TimeIndex(historical_score_path).read_from(0 if skip_UTS == 'UTS' else int(skip_UTS))
+            if skip_UTS != 'UTS':
+                start_row = int(historical_scoring_DF.index.searchsorted(int(skip_UTS), side='right')) # resume after the last peak
+
+            if engine == 'numpy':
+                retain_csv_writer.writerows(look_ahead_rows(historical_scoring_DF, bull_threshold, bear_threshold, start_row))
+                return look_ahead_gains_csv
 
             peak_start = 0
             peak_row = []
             best_prices = {6:0, 12:0, 48:0, 144:0, 288:0, 864:0, 2016:0, 4032:0} # number of 5min look ahead intervals
             uts_5min = 300000
 
-            for row in historical_scoring_DF.loc[skip_UTS:].itertuples(name=None):
+            for row in historical_scoring_DF.iloc[start_row:].itertuples(name=None):
                 bull_score, bear_score = row[2:4]
                 if peak_start:
                     # Binance exchange updates causes missing rows, hence DF is sliced with safe buffer of 4500 5 min intervals rather than 4032
@@ -641,6 +772,7 @@ class Coin():
 
                     best_price = float(peak_row[1])
                     goal = "buy_back" if peak_row[2] > peak_row[3] else "sell_later"
+                    look_ahead = 0
                     for row_look_ahead in look_ahead_DF.itertuples(name=None):
                         look_ahead += 1
                         look_ahead_price = float(row_look_ahead[1])
@@ -664,7 +796,6 @@ class Coin():
                         utc_time, peak_row[1], peak_start, peak_row[4], goal,
                         *[diff for diff in best_prices.values()], *tf_scores, peak_row[0]
                     ])
-                    look_ahead = 12
                     peak_start = 0
 
                 if bull_score >= bull_threshold and bear_score >= bear_threshold:
@@ -676,38 +807,19 @@ class Coin():
         return look_ahead_gains_csv
 
 
-    def generate_retain_score(self, symbol, custom_timeframes):
+    def generate_retain_score(self, symbol, custom_timeframes, pipeline=None):
         '''
         Creates a score file summarising the data in look_ahead_gains.csv for given symbol
+        pipeline is an AnalyticsPipeline of the symbol_timeframes to draw the look ahead gains from (see analytics_pipeline.py)
         '''
 
         print('computing retain score...')
         filename_ext = get_filename_extension(custom_timeframes)
         retain_score_csv = f"{self.retain_scoring_path}/{symbol}/retain_scoring_{symbol}_{filename_ext}.csv"
-        look_ahead_gains_csv = f"{self.look_ahead_path}/{symbol}/look_ahead_gains_{symbol}_{filename_ext}.csv"
-        self.generate_look_ahead_gains(symbol, custom_timeframes)
-
-        bullscore_bestgain = defaultdict(list) # key = score, value = list of best %gains
-        bearscore_bestgain = defaultdict(list)
-        average_bestgain = {"buy_back":{"30m":[], "1h":[], "4h":[], "12h":[], "1d":[], "3d":[], "1w":[], "2w":[]},
-                            "sell_later":{"30m":[], "1h":[], "4h":[], "12h":[], "1d":[], "3d":[], "1w":[], "2w":[]}}
-
-        with open(look_ahead_gains_csv, 'r') as infile, open(retain_score_csv, 'w') as outfile:
-            lookahead_csv_reader = csv.reader(infile)
-            next(lookahead_csv_reader)
-            for row in lookahead_csv_reader:
-                index = 5
-                if row[4] == "buy_back":
-                    bullscore_bestgain[int(row[2])].append(min([int(i) for i in row[5:13]]))
-                    for look_ahead in average_bestgain["buy_back"]:
-                        average_bestgain["buy_back"][look_ahead].append(int(row[index]))
-                        index += 1
-                else:
-                    bearscore_bestgain[int(row[2])].append(max([int(i) for i in row[5:13]]))
-                    for look_ahead in average_bestgain["sell_later"]:
-                        average_bestgain["sell_later"][look_ahead].append(int(row[index]))
-                        index += 1
+        pipeline = pipeline if pipeline else AnalyticsPipeline(self, symbol, custom_timeframes)
+        bullscore_bestgain, bearscore_bestgain, average_bestgain = pipeline.retain_aggregates()
 
+        with open(retain_score_csv, 'w') as outfile:
             outfile.write("Bull scores:\n" + "="*130 + "\n%reduction of coin price if you were to have sold at this score peak (hence you want to buy back)\n")
             for score in sorted(bullscore_bestgain.keys()):
                 outfile.write(f"{score}: Average = {self.average(bullscore_bestgain[score], 2):.2f}%, {bullscore_bestgain[score]}\n")
@@ -725,21 +837,28 @@ class Coin():
             outfile.write("="*130)
 
 
-    def simulate_trading(self, symbol, custom_timeframes, single_threshold='', single_metric='overall'):
+    def simulate_trading(self, symbol, custom_timeframes, single_threshold='', single_metric='overall', engine=TRADING_SIMULATION_ENGINE,
+                         historical_DF=None, rescore=True):
+        '''
+        Simulates trading on the historical scores for every bull/bear threshold strategy (or only single_threshold).
+        engine is either 'numpy' (batched threshold grid, see trading_simulation.py) or 'loop' (original row by row simulation).
+        Every strategy resumes from the checkpoint of the previous run, so only new 5 minute rows are simulated.
+        historical_DF is the up to date historical scoring when already loaded (e.g. by an AnalyticsPipeline).
+        With rescore the historical scores are computed first, and nothing is simulated when they were within the hour.
+        '''
+
         # TODO investigate why peak top strat didn't work, perhaps use PA graph to help
         # if you work it out, then implment peak_top options for the other methods - but for now, it's pointless
 
         filename_ext = get_filename_extension(custom_timeframes)
         historical_score_path = f'{self.historical_scoring_path}/{symbol}/historical_scoring_{symbol}_{filename_ext}.csv'
-        if os.path.exists(historical_score_path):
-            # run this function once every hour at most per parameters
-            if time() - self.get_latest_stored_uts(historical_score_path) < 3600:
-                if filename_ext in self.previous_updated_simulations:
-                    return
-                else:
-                    self.previous_updated_simulations.append(filename_ext)
-        self.compute_historical_score(symbol, custom_timeframes)
-        historical_DF = pd.read_csv(historical_score_path, index_col= 0, usecols=[0, 1, 2, 3, 4], header=None, skiprows=1)
+        if historical_DF is not None:
+            historical_DF = historical_DF[[1, 2, 3, 4]]
+            first_row_DF = historical_DF.iloc[:1]
+        else:
+            if rescore and not self.rescore_history(symbol, custom_timeframes):
+                return
+            first_row_DF = pd.read_csv(historical_score_path, index_col= 0, usecols=[0, 1, 2, 3, 4], header=None, skiprows=1, nrows=1)
 
         max_threshold = int(len(historical_score_path.split('_')[-1].split('-'))*6)
         bull_start_threshold = 2 if not single_threshold else int(single_threshold.split('|')[0].split(':')[-1])
@@ -747,125 +866,92 @@ class Coin():
         bear_start_threshold = 2 if not single_threshold else int(single_threshold.split(':')[-1])
         bear_end_threshold = max_threshold if not single_threshold else bear_start_threshold + 1
         trading_pair = symbol.split(self.coin)[-1]
-        inital_coin_price = historical_DF.iloc[0, 0]
+        inital_coin_price = first_row_DF.iloc[0, 0]
         inital_pair_holdings = 10000 if trading_pair in STANDARD_TRADING_PAIRS else 5
         inital_coin_holdings = round(10000 / inital_coin_price, 3)
-        start_uts = historical_DF.iloc[0].name
-        final_uts = historical_DF.iloc[-1].name
+        start_uts = first_row_DF.iloc[0].name
         summary = {'overall':{}, 'max':{}}
         analysis_cols = {}
 
         trade_simulation_path = f'{self.trading_simulation_path}/{symbol}/trade_simulation_{symbol}_{filename_ext}.csv'
-        if os.path.exists(trade_simulation_path) and not single_threshold:
-            with open(trade_simulation_path, 'r') as f:
-                f.readline()
-                for strat_gain in f.readline().split(',')[1:]:
-                    analysis_cols[f'{strat_gain.split("=")[0]}_holdings_log'] = [float(strat_gain.split('=')[-1])]
-                csv_reader = csv.reader(f)
-                for row in csv_reader:
-                    if 'UTS' in row[0]:
-                        strat = row[0].split('_')[-1]
-                        analysis_cols[strat] = [[
-                            f'UTS_{strat}',
-                            'prev_price',
-                            'price',
-                            'action',
-                            'coin_holdings',
-                            'pair_holdings',
-                            'action_coin_profit',
-                            'action_pair_profit',
-                            'action_coin_gain',
-                            'action_pair_gain'
-                        ]]
-                    else:
-                        analysis_cols[strat].append([
-                            int(row[0]),
-                            float(row[1]),
-                            float(row[2]),
-                            row[3],
-                            float(row[4]),
-                            float(row[5]),
-                            float(row[6]),
-                            float(row[7]),
-                            float(row[8]),
-                            float(row[9])
-                        ])
+        states = {} if single_threshold else load_checkpoint(trade_simulation_path, start_uts) # resume every strategy
+        resumed_strats = set(states)
+        if historical_DF is None:
+            # when every strategy resumes, only the scores from the earliest checkpointed uts onwards are read
+            num_strats = (bull_end_threshold - bull_start_threshold) * (bear_end_threshold - bear_start_threshold)
+            resume_uts = min(state['last_uts'] for state in states.values()) if len(states) == num_strats else start_uts
+            historical_DF = TimeIndex(historical_score_path).read_from(resume_uts, usecols=[0, 1, 2, 3, 4])
+        final_uts = historical_DF.iloc[-1].name
+
+        uts = historical_DF.index.to_numpy()
+        if engine == 'numpy':
+            # shared by every strategy, lists keep the python float rounding of itertuples
+            prices = historical_DF[1].tolist()
+            bull_scores, bear_scores = historical_DF[2].to_numpy(), historical_DF[3].to_numpy()
+            run_starts = score_runs(bull_scores, bear_scores)
+            uts_list, bull_list, bear_list = uts.tolist(), bull_scores.tolist(), bear_scores.tolist()
 
         for bull_threshold in range(bull_start_threshold, bull_end_threshold):
             for bear_threshold in range(bear_start_threshold, bear_end_threshold):
                 strat = f'BULL:{bull_threshold}|BEAR:{bear_threshold}'
-                if strat in analysis_cols:
-                    latest_row = analysis_cols[strat][-1]
-                    skip_uts = int(latest_row[0])
-                    prev_price = float(latest_row[2])
-                    prev_signal = 'SELL' if latest_row[3] == 'BUY' else 'BUY'
-                    holdings = float(latest_row[4]) if float(latest_row[4]) else float(latest_row[5])
-                    move_made = True
-                    signal = ''
+                if strat not in states:
+                    states[strat] = initial_state(10000 if trading_pair in STANDARD_TRADING_PAIRS else 5) # holdings alternate between coin and pair.
+                state = states[strat]
+                start_row = int(np.searchsorted(uts, state['last_uts'], side='right')) # first row not yet simulated
+                trades = []
+                if engine == 'numpy':
+                    rows = event_rows(bull_scores, bear_scores, run_starts, bull_threshold, bear_threshold, start_row)
+                    simulate_strategy(rows.tolist(), uts_list, prices, bull_list, bear_list, bull_threshold, bear_threshold, state, trades)
                 else:
-                    analysis_cols[strat] = [[
-                        f'UTS_{strat}',
-                        'prev_price',
-                        'price',
-                        'action',
-                        'coin_holdings',
-                        'pair_holdings',
-                        'action_coin_profit',
-                        'action_pair_profit',
-                        'action_coin_gain',
-                        'action_pair_gain'
-                    ]]
-                    analysis_cols[f'{strat}_holdings_log'] = []
-                    skip_uts = start_uts
-                    prev_price = 0
-                    prev_signal = 'SELL'
-                    holdings = 10000 if trading_pair in STANDARD_TRADING_PAIRS else 5 # Alternates between coin and pair.
-                    move_made = False
-                    signal = ''
-                for row in historical_DF.loc[skip_uts:].itertuples(name=None):
-                    bull_score = row[2] # i.e. massive surge up, hence you want to SELL
-                    bear_score = row[3] # i.e. massive surge down, hence you want to BUY
-                    if bull_score >= bull_threshold and bear_score >= bear_threshold:
-                        continue # indecision
-                    if bull_score >= bull_threshold and bull_score > bear_score:
-                        signal = 'SELL'
-                    elif bear_score >= bear_threshold and bear_score > bull_score:
-                        signal = 'BUY'
-                    if prev_signal != signal:
-                        if bull_score >= bull_threshold or bear_score >= bear_threshold:
-                            if not move_made:
-                                move_made = True
-                                coin_holdings, coin_profit, coin_gain, pair_holdings, pair_profit, pair_gain = 0, 0, 0, 0, 0, 0
-                                if prev_price == 0:
+                    prev_price, prev_signal, holdings, move_made, signal = [state[key] for key in ['prev_price', 'prev_signal', 'holdings', 'move_made', 'signal']]
+                    for row in historical_DF.iloc[start_row:].itertuples(name=None):
+                        bull_score = row[2] # i.e. massive surge up, hence you want to SELL
+                        bear_score = row[3] # i.e. massive surge down, hence you want to BUY
+                        if bull_score >= bull_threshold and bear_score >= bear_threshold:
+                            continue # indecision
+                        if bull_score >= bull_threshold and bull_score > bear_score:
+                            signal = 'SELL'
+                        elif bear_score >= bear_threshold and bear_score > bull_score:
+                            signal = 'BUY'
+                        if prev_signal != signal:
+                            if bull_score >= bull_threshold or bear_score >= bear_threshold:
+                                if not move_made:
+                                    move_made = True
+                                    coin_holdings, coin_profit, coin_gain, pair_holdings, pair_profit, pair_gain = 0, 0, 0, 0, 0, 0
+                                    if prev_price == 0:
+                                        prev_price = row[1]
+                                    if signal == 'BUY':
+                                        coin_holdings = round(holdings / row[1], 5)
+                                        coin_profit = round(coin_holdings - (holdings / prev_price), 5)
+                                        coin_gain = round((prev_price / row[1])*100 - 100, 3)
+                                    else:
+                                        pair_holdings = round(holdings * row[1], 5)
+                                        pair_profit = round(pair_holdings - (holdings * prev_price), 5)
+                                        pair_gain = round((row[1] / prev_price)*100 - 100, 3)
+                                    trades.append([
+                                        row[0],
+                                        prev_price,
+                                        row[1],
+                                        signal,
+                                        coin_holdings,
+                                        pair_holdings,
+                                        coin_profit,
+                                        pair_profit,
+                                        coin_gain,
+                                        pair_gain
+                                    ])
+                                    holdings = coin_holdings if coin_holdings else pair_holdings
                                     prev_price = row[1]
-                                if signal == 'BUY':
-                                    coin_holdings = round(holdings / row[1], 5)
-                                    coin_profit = round(coin_holdings - (holdings / prev_price), 5)
-                                    coin_gain = round((prev_price / row[1])*100 - 100, 3)
-                                else:
-                                    pair_holdings = round(holdings * row[1], 5)
-                                    pair_profit = round(pair_holdings - (holdings * prev_price), 5)
-                                    pair_gain = round((row[1] / prev_price)*100 - 100, 3)
-                                analysis_cols[strat].append([
-                                    row[0],
-                                    prev_price,
-                                    row[1],
-                                    signal,
-                                    coin_holdings,
-                                    pair_holdings,
-                                    coin_profit,
-                                    pair_profit,
-                                    coin_gain,
-                                    pair_gain
-                                ])
-                                analysis_cols[f'{strat}_holdings_log'].append(coin_holdings)
-                                holdings = coin_holdings if coin_holdings else pair_holdings
-                                prev_price = row[1]
-                        elif move_made:
-                            prev_signal = signal
-                            move_made = False        
-                summary['overall'][strat] = analysis_cols[strat][-1][4] if analysis_cols[strat][-1][4] else analysis_cols[strat][-2][4]
-                summary['max'][strat] = max(analysis_cols[f'{strat}_holdings_log'])
+                            elif move_made:
+                                prev_signal = signal
+                                move_made = False        
+                    state.update(prev_price=prev_price, prev_signal=prev_signal, holdings=holdings, move_made=move_made, signal=signal)
+                state['last_uts'] = int(final_uts)
+                record_trades(state, trades)
+                # resumed trade logs are copied from the previous csv, so only their new trades are held here
+                analysis_cols[strat] = trades if strat in resumed_strats else [trade_log_header(strat), *trades]
+                summary['overall'][strat] = state['overall']
+                summary['max'][strat] = state['max_holdings'] if state['max_holdings'] else 0
 
         sorted_summary = {'overall':{}, 'max':{}}
         sorted_summary['overall'] = {k: v for k, v in sorted(summary['overall'].items(), key=lambda kv: kv[1], reverse=True)}
@@ -876,74 +962,98 @@ class Coin():
             return analysis_cols[sorted_summary[single_metric].popitem()[0]]
         else:
             ranked_best_max_strats = [f'{strat}={gain}' for strat, gain in sorted_summary['max'].items()]
-            with open(trade_simulation_path, 'w') as f:
-                csv_writer = csv.writer(f, delimiter=',')
-                csv_writer.writerow([
-                    'inital_coin',
-                    inital_coin_holdings,
-                    'inital_pair',
-                    inital_pair_holdings,
-                    'start_uts',
-                    start_uts,
-                    'final_uts',
-                    final_uts
-                ])
-                csv_writer.writerow(['ranked_max_performing_strats', *ranked_best_max_strats])
-                for strat in sorted_summary['overall']:
-                    for row in analysis_cols[strat]:
-                        csv_writer.writerow(row)
-
-
-    def optimise_signal_threshold(self, symbol, custom_timeframes, metric='overall'):
+            previous_csv = open(trade_simulation_path, 'rb') if resumed_strats else None # stored trade logs are copied block by block
+            try:
+                with atomic_file(trade_simulation_path, 'wb') as f: # positions of the trade logs are needed for the checkpoint
+                    f.write(csv_bytes([[
+                        'inital_coin',
+                        inital_coin_holdings,
+                        'inital_pair',
+                        inital_pair_holdings,
+                        'start_uts',
+                        start_uts,
+                        'final_uts',
+                        final_uts
+                    ], ['ranked_max_performing_strats', *ranked_best_max_strats]]))
+                    for strat in sorted_summary['overall']:
+                        state = states[strat]
+                        block_start = f.tell()
+                        if strat in resumed_strats:
+                            previous_csv.seek(state['block_start'])
+                            f.write(previous_csv.read(state['block_end'] - state['block_start']))
+                        f.write(csv_bytes(analysis_cols[strat]))
+                        state['block_start'], state['block_end'] = block_start, f.tell()
+            finally:
+                if previous_csv:
+                    previous_csv.close()
+            save_checkpoint(trade_simulation_path, states, start_uts)
+            self.threshold_cache.put(self.get_threshold_cache_path(symbol), filename_ext, int(final_uts),
+                                     next(iter(sorted_summary['overall'])), next(iter(sorted_summary['max'])))
+
+
+    def optimise_signal_threshold(self, symbol, custom_timeframes, metric='overall', historical_DF=None):
         '''
         By default this will return the rank 1 best overall threshold setting used for the given symbol/parameters
         If the metric function parameter is set to 'max' then the rank 1 best max threshold will be returned
+        Thresholds are cached until new historical scores are computed (see threshold_cache.py), only then trading is simulated again.
+        historical_DF is the up to date historical scoring when already loaded (e.g. by an AnalyticsPipeline).
         '''
 
-        # TODO definetly use threading
         filename_ext = get_filename_extension(custom_timeframes)
-        self.simulate_trading(symbol, custom_timeframes)
-        with open(f'{self.trading_simulation_path}/{symbol}/trade_simulation_{symbol}_{filename_ext}.csv', 'r') as f:
-            csv_reader = csv.reader(f)
-            csv_reader.__next__()
-            best_max_gains_strat = csv_reader.__next__()[1].split('=')[0]
-            best_overall_strat = csv_reader.__next__()[0].split('_')[-1]
-            if metric == 'overall':
-                return best_overall_strat # best overall strat
-            else:
-                return best_max_gains_strat # Best max gain strat
+        historical_score_path = f'{self.historical_scoring_path}/{symbol}/historical_scoring_{symbol}_{filename_ext}.csv'
+        cache_path = self.get_threshold_cache_path(symbol)
+        scored_uts = lambda : int(historical_DF.index[-1]) if historical_DF is not None else self.get_latest_stored_uts(historical_score_path)
+        if historical_DF is None:
+            self.rescore_history(symbol, custom_timeframes) # new scores invalidate the cached thresholds
+        thresholds = None
+        if os.path.exists(historical_score_path):
+            thresholds = self.threshold_cache.get(cache_path, filename_ext, scored_uts())
+        if not thresholds:
+            self.simulate_trading(symbol, custom_timeframes, historical_DF=historical_DF, rescore=False)
+            thresholds = self.threshold_cache.get(cache_path, filename_ext, scored_uts())
+        if not thresholds: # not cached by simulate_trading, rankings are in its csv
+            with open(f'{self.trading_simulation_path}/{symbol}/trade_simulation_{symbol}_{filename_ext}.csv', 'r') as f:
+                csv_reader = csv.reader(f)
+                csv_reader.__next__()
+                best_max_gains_strat = csv_reader.__next__()[1].split('=')[0]
+                best_overall_strat = csv_reader.__next__()[0].split('_')[-1]
+            thresholds = {'overall':best_overall_strat, 'max':best_max_gains_strat}
+        return thresholds['overall'] if metric == 'overall' else thresholds['max']
+
+
+    def rescore_history(self, symbol, custom_timeframes):
+        '''
+        Runs compute_historical_score at most once an hour per symbol and timeframes, returns False when skipped
+        '''
+
+        key = f'{symbol}_{get_filename_extension(custom_timeframes)}'
+        if time() - self.previous_updated_simulations.get(key, 0) < 3600:
+            return False
+        self.previous_updated_simulations[key] = time()
+        self.compute_historical_score(symbol, custom_timeframes)
+        return True
 
 
-    def graph_look_ahead_data(self, symbol, custom_timeframes, graph_type="bar"):
+    def get_threshold_cache_path(self, symbol):
+        return f'{self.trading_simulation_path}/{symbol}/optimal_thresholds_{symbol}.json'
+
+
+    def graph_look_ahead_data(self, symbol, custom_timeframes, graph_type="bar", pipeline=None):
         '''
         Generates either a bar graph or line graph summarising the potential gains from buying/selling at the given score peaks.
         using from looking ahead data
+        pipeline is an AnalyticsPipeline of the symbol_timeframes to draw the look ahead gains from (see analytics_pipeline.py)
         '''
 
         #TODO remove line graph option
 
+        import matplotlib.pyplot as plt # Deferred until a graph is requested, see notification_server --profile-startup
+
         print('computing graph...')
         filename_ext = get_filename_extension(custom_timeframes)
-        look_ahead_gains_csv = f"{self.look_ahead_path}/{symbol}/look_ahead_gains_{symbol}_{filename_ext}.csv"
         filename_ext += '' if graph_type == 'bar' else '_line'
-        self.generate_look_ahead_gains(symbol, custom_timeframes)
-
-        make_dict = lambda : {"30m":[], "1h":[], "4h":[], "1d":[], "3d":[], "1w":[], "2w":[]}
-        best_gains = {"buy_back":defaultdict(make_dict), "sell_later":defaultdict(make_dict)}
-
-        with open(look_ahead_gains_csv, 'r') as infile:
-            lookahead_csv_reader = csv.reader(infile)		
-            next(lookahead_csv_reader)
-            for row in lookahead_csv_reader:
-                index = 5
-                if row[4] == "buy_back":
-                    for look_ahead in best_gains["buy_back"][int(row[2])]:
-                        best_gains["buy_back"][int(row[2])][look_ahead].append(int(row[index]))
-                        index += 1
-                else:
-                    for look_ahead in best_gains["sell_later"][int(row[2])]:
-                        best_gains["sell_later"][int(row[2])][look_ahead].append(int(row[index]))
-                        index += 1
+        pipeline = pipeline if pipeline else AnalyticsPipeline(self, symbol, custom_timeframes)
+        best_gains = pipeline.look_ahead_gains_by_score()
 
         fig, (ax_bull, ax_bear) = plt.subplots(nrows= 2, ncols= 1, figsize=(20, 16))
         plt.subplots_adjust(left=0.05, bottom=0.05, right=0.9, top=0.95, wspace=0.4, hspace=0.35)
@@ -985,44 +1095,56 @@ class Coin():
         plt.savefig(f"{self.graph_path}/look_aheads/{symbol}/look_ahead_graph_{symbol}_{filename_ext}.png")
 
     
-    def graph_trading_simulation(self, symbol, custom_timeframes, top_x=20):
+    def graph_trading_simulation(self, symbol, custom_timeframes, top_x=20, pipeline=None):
         '''
         Graphs out the percentage gain compared to inital holding from blindly trading the signals generated by thresholds
         Specifically, this graphs the gains of the coin of interest, as well as its tradingpair. The first graph is the best overall
         performing thresholds, the second graph is this same graph however showing the tradingpair gains, and the final graph is
         the thresholds which resulted in the highest historical gains.
+        pipeline is an AnalyticsPipeline of the symbol_timeframes to draw the simulation from (see analytics_pipeline.py)
         '''
 
+        import matplotlib.pyplot as plt # Deferred until a graph is requested, see notification_server --profile-startup
+        import matplotlib.dates as mdates
+
         filename_ext = get_filename_extension(custom_timeframes)
-        self.simulate_trading(symbol, custom_timeframes)
+        pipeline = pipeline if pipeline else AnalyticsPipeline(self, symbol, custom_timeframes)
+        header, ranked_max_strats, simulation_rows = pipeline.simulation()
         fig, (ax_overall, ax_pair, ax_max) = plt.subplots(nrows= 3, ncols= 1, figsize=(25, 21))
-        with open(f'{self.trading_simulation_path}/{symbol}/trade_simulation_{symbol}_{filename_ext}.csv', 'r') as f:
-            header = f.readline().split(',')
-            inital_coin_holding = float(header[1])
-            inital_pair_holding = float(header[3])
-            start_uts = datetime.fromtimestamp(int(header[5][:-3]))
-            final_uts = datetime.fromtimestamp(int(header[-1].strip()[:-3]))
-            bear_markets = filter_market_periods(BEAR_MARKETS, start_uts, final_uts)
-            bull_markets = filter_market_periods(BULL_MARKETS, start_uts, final_uts)
-            max_gains_thresholds_topx = [strat_gain.split('=')[0] for strat_gain in f.readline().split(',')[1:]][:top_x]
-            csv_reader = csv.reader(f)
-            ranked_overall = {}
-            ranked_max = {}
-            overall_done = False
-            for row in csv_reader:
-                uts = row[0]
-                coin_holding = row[4]
-                pair_holding = row[5]
-                if coin_holding == '0' or coin_holding == '0.0':
-                    if not overall_done:
-                        ranked_overall[strat]['pair_uts'].append(datetime.fromtimestamp(int(uts[:-3])))
-                        ranked_overall[strat]['pair_holding_gains'].append(round((float(pair_holding) / inital_pair_holding)*100 - 100, 2))
-                        ranked_overall[strat]['pair_successful_trades'] += 1 if '-' != row[-1][0] else 0
-                elif 'UTS' in uts:
-                    strat = uts.split('_')[-1]
-                    overall_done = True if len(ranked_overall) == top_x else False
-                    if len(ranked_overall) < top_x:
-                        ranked_overall[strat] = {
+        inital_coin_holding = float(header[1])
+        inital_pair_holding = float(header[3])
+        start_uts = datetime.fromtimestamp(int(header[5][:-3]))
+        final_uts = datetime.fromtimestamp(int(header[-1].strip()[:-3]))
+        bear_markets = filter_market_periods(BEAR_MARKETS, start_uts, final_uts)
+        bull_markets = filter_market_periods(BULL_MARKETS, start_uts, final_uts)
+        max_gains_thresholds_topx = [strat_gain.split('=')[0] for strat_gain in ranked_max_strats[1:]][:top_x]
+        ranked_overall = {}
+        ranked_max = {}
+        overall_done = False
+        for row in simulation_rows:
+            uts = row[0]
+            coin_holding = row[4]
+            pair_holding = row[5]
+            if coin_holding == '0' or coin_holding == '0.0':
+                if not overall_done:
+                    ranked_overall[strat]['pair_uts'].append(datetime.fromtimestamp(int(uts[:-3])))
+                    ranked_overall[strat]['pair_holding_gains'].append(round((float(pair_holding) / inital_pair_holding)*100 - 100, 2))
+                    ranked_overall[strat]['pair_successful_trades'] += 1 if '-' != row[-1][0] else 0
+            elif 'UTS' in uts:
+                strat = uts.split('_')[-1]
+                overall_done = True if len(ranked_overall) == top_x else False
+                if len(ranked_overall) < top_x:
+                    ranked_overall[strat] = {
+                        'coin_uts':[],
+                        'coin_holding_gains':[],
+                        'coin_successful_trades':0,
+                        'pair_uts':[],
+                        'pair_holding_gains':[],
+                        'pair_successful_trades':0
+                    }
+                if strat in max_gains_thresholds_topx:
+                    if len(ranked_max) < top_x:
+                        ranked_max[strat] = {
                             'coin_uts':[],
                             'coin_holding_gains':[],
                             'coin_successful_trades':0,
@@ -1030,99 +1152,89 @@ class Coin():
                             'pair_holding_gains':[],
                             'pair_successful_trades':0
                         }
-                    if strat in max_gains_thresholds_topx:
-                        if len(ranked_max) < top_x:
-                            ranked_max[strat] = {
-                                'coin_uts':[],
-                                'coin_holding_gains':[],
-                                'coin_successful_trades':0,
-                                'pair_uts':[],
-                                'pair_holding_gains':[],
-                                'pair_successful_trades':0
-                            }
-                        else: break
-                else:
-                    if not overall_done:
-                        ranked_overall[strat]['coin_uts'].append(datetime.fromtimestamp(int(uts[:-3])))
-                        ranked_overall[strat]['coin_holding_gains'].append(round((float(coin_holding) / inital_coin_holding)*100 - 100, 2))
-                        ranked_overall[strat]['coin_successful_trades'] += 1 if '-' != row[-2][0] else 0
-                    if strat in max_gains_thresholds_topx:
-                        ranked_max[strat]['coin_uts'].append(datetime.fromtimestamp(int(uts[:-3])))
-                        ranked_max[strat]['coin_holding_gains'].append(round((float(coin_holding) / inital_coin_holding)*100 - 100, 2))
-                        ranked_max[strat]['coin_successful_trades'] += 1 if '-' != row[-2][0] else 0
-
-            # plotting for overall best performing thresholds for coin
-            for strat, data in ranked_overall.items():
-                success_ratio = round(data["coin_successful_trades"]/len(data["coin_uts"]), 2)
-                data['coin_uts'].append(final_uts)
-                data['coin_holding_gains'].append(data['coin_holding_gains'][-1])
-                ax_overall.plot(
-                    data['coin_uts'],
-                    data['coin_holding_gains'],
-                    label=f'{strat:<16} {len(data["coin_uts"]):<5} {success_ratio:<5} {int(data["coin_holding_gains"][-1])}'
-                )
-            for bear_market in bear_markets:
-                ax_overall.axvspan(*bear_market, ymax=1, color ='firebrick', alpha=0.1)
-            for bull_market in bull_markets:
-                ax_overall.axvspan(*bull_market, ymax=1, color ='limegreen', alpha=0.1)
-            for label in ax_overall.get_xticklabels(which='major'):
-                label.set(rotation=30, horizontalalignment='right')
-            ax_overall.plot([start_uts, final_uts], [0, 0], linestyle="--", color='yellowgreen')
-            ax_overall.plot([start_uts, final_uts], [100, 100], linestyle="--", color='mediumspringgreen')
-            ax_overall.plot([start_uts, final_uts], [-100, -100], linestyle="--", color='red')
-            ax_overall.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%b'))
-            ax_overall.xaxis.set_major_locator(mdates.MonthLocator(interval=2))
-            ax_overall.xaxis.set_minor_locator(mdates.MonthLocator(interval=1))
-            ax_overall.margins(x=0.01)
-
-            # plotting for overall best performing thresholds for pair
-            for strat, data in ranked_overall.items():
-                success_ratio = round(data["pair_successful_trades"]/len(data["pair_uts"]), 2)
-                data['pair_uts'].append(final_uts)
-                data['pair_holding_gains'].append(data['pair_holding_gains'][-1])
-                ax_pair.plot(
-                    data['pair_uts'],
-                    data['pair_holding_gains'],
-                    label=f'{strat:<16} {len(data["pair_uts"]):<5} {success_ratio:<5} {int(data["pair_holding_gains"][-1])}'
-                )
-            for bear_market in bear_markets:
-                ax_pair.axvspan(*bear_market, ymax=1, color ='firebrick', alpha=0.1)
-            for bull_market in bull_markets:
-                ax_pair.axvspan(*bull_market, ymax=1, color ='limegreen', alpha=0.1)
-            for label in ax_pair.get_xticklabels(which='major'):
-                label.set(rotation=30, horizontalalignment='right')
-            ax_pair.plot([start_uts, final_uts], [0, 0], linestyle="--", color='yellowgreen')
-            ax_pair.plot([start_uts, final_uts], [100, 100], linestyle="--", color='mediumspringgreen')
-            ax_pair.plot([start_uts, final_uts], [-100, -100], linestyle="--", color='red')
-            ax_pair.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%b'))
-            ax_pair.xaxis.set_major_locator(mdates.MonthLocator(interval=2))
-            ax_pair.xaxis.set_minor_locator(mdates.MonthLocator(interval=1))
-            ax_pair.margins(x=0.01)
-
-            # plotting for highest max gains achieved thresholds
-            for strat in max_gains_thresholds_topx:
-                data = ranked_max[strat]
-                success_ratio = round(data["coin_successful_trades"]/len(data["coin_uts"]), 2)
-                data['coin_uts'].append(final_uts)
-                data['coin_holding_gains'].append(data['coin_holding_gains'][-1])
-                ax_max.plot(
-                    data['coin_uts'],
-                    data['coin_holding_gains'],
-                    label=f'{strat:<16} {len(data["coin_uts"]):<5} {success_ratio:<5} {int(max(data["coin_holding_gains"]))}'
-                )
-            for bear_market in bear_markets:
-                ax_max.axvspan(*bear_market, ymax=1, color ='firebrick', alpha=0.1)
-            for bull_market in bull_markets:
-                ax_max.axvspan(*bull_market, ymax=1, color ='limegreen', alpha=0.1)
-            for label in ax_max.get_xticklabels(which='major'):
-                label.set(rotation=30, horizontalalignment='right')
-            ax_max.plot([start_uts, final_uts], [0, 0], linestyle="--", color='yellowgreen')
-            ax_max.plot([start_uts, final_uts], [100, 100], linestyle="--", color='mediumspringgreen')
-            ax_max.plot([start_uts, final_uts], [-100, -100], linestyle="--", color='red')
-            ax_max.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%b'))
-            ax_max.xaxis.set_major_locator(mdates.MonthLocator(interval=2))
-            ax_max.xaxis.set_minor_locator(mdates.MonthLocator(interval=1))
-            ax_max.margins(x=0.01)
+                    else: break
+            else:
+                if not overall_done:
+                    ranked_overall[strat]['coin_uts'].append(datetime.fromtimestamp(int(uts[:-3])))
+                    ranked_overall[strat]['coin_holding_gains'].append(round((float(coin_holding) / inital_coin_holding)*100 - 100, 2))
+                    ranked_overall[strat]['coin_successful_trades'] += 1 if '-' != row[-2][0] else 0
+                if strat in max_gains_thresholds_topx:
+                    ranked_max[strat]['coin_uts'].append(datetime.fromtimestamp(int(uts[:-3])))
+                    ranked_max[strat]['coin_holding_gains'].append(round((float(coin_holding) / inital_coin_holding)*100 - 100, 2))
+                    ranked_max[strat]['coin_successful_trades'] += 1 if '-' != row[-2][0] else 0
+
+        # plotting for overall best performing thresholds for coin
+        for strat, data in ranked_overall.items():
+            success_ratio = round(data["coin_successful_trades"]/len(data["coin_uts"]), 2)
+            data['coin_uts'].append(final_uts)
+            data['coin_holding_gains'].append(data['coin_holding_gains'][-1])
+            ax_overall.plot(
+                data['coin_uts'],
+                data['coin_holding_gains'],
+                label=f'{strat:<16} {len(data["coin_uts"]):<5} {success_ratio:<5} {int(data["coin_holding_gains"][-1])}'
+            )
+        for bear_market in bear_markets:
+            ax_overall.axvspan(*bear_market, ymax=1, color ='firebrick', alpha=0.1)
+        for bull_market in bull_markets:
+            ax_overall.axvspan(*bull_market, ymax=1, color ='limegreen', alpha=0.1)
+        for label in ax_overall.get_xticklabels(which='major'):
+            label.set(rotation=30, horizontalalignment='right')
+        ax_overall.plot([start_uts, final_uts], [0, 0], linestyle="--", color='yellowgreen')
+        ax_overall.plot([start_uts, final_uts], [100, 100], linestyle="--", color='mediumspringgreen')
+        ax_overall.plot([start_uts, final_uts], [-100, -100], linestyle="--", color='red')
+        ax_overall.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%b'))
+        ax_overall.xaxis.set_major_locator(mdates.MonthLocator(interval=2))
+        ax_overall.xaxis.set_minor_locator(mdates.MonthLocator(interval=1))
+        ax_overall.margins(x=0.01)
+
+        # plotting for overall best performing thresholds for pair
+        for strat, data in ranked_overall.items():
+            success_ratio = round(data["pair_successful_trades"]/len(data["pair_uts"]), 2)
+            data['pair_uts'].append(final_uts)
+            data['pair_holding_gains'].append(data['pair_holding_gains'][-1])
+            ax_pair.plot(
+                data['pair_uts'],
+                data['pair_holding_gains'],
+                label=f'{strat:<16} {len(data["pair_uts"]):<5} {success_ratio:<5} {int(data["pair_holding_gains"][-1])}'
+            )
+        for bear_market in bear_markets:
+            ax_pair.axvspan(*bear_market, ymax=1, color ='firebrick', alpha=0.1)
+        for bull_market in bull_markets:
+            ax_pair.axvspan(*bull_market, ymax=1, color ='limegreen', alpha=0.1)
+        for label in ax_pair.get_xticklabels(which='major'):
+            label.set(rotation=30, horizontalalignment='right')
+        ax_pair.plot([start_uts, final_uts], [0, 0], linestyle="--", color='yellowgreen')
+        ax_pair.plot([start_uts, final_uts], [100, 100], linestyle="--", color='mediumspringgreen')
+        ax_pair.plot([start_uts, final_uts], [-100, -100], linestyle="--", color='red')
+        ax_pair.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%b'))
+        ax_pair.xaxis.set_major_locator(mdates.MonthLocator(interval=2))
+        ax_pair.xaxis.set_minor_locator(mdates.MonthLocator(interval=1))
+        ax_pair.margins(x=0.01)
+
+        # plotting for highest max gains achieved thresholds
+        for strat in max_gains_thresholds_topx:
+            data = ranked_max[strat]
+            success_ratio = round(data["coin_successful_trades"]/len(data["coin_uts"]), 2)
+            data['coin_uts'].append(final_uts)
+            data['coin_holding_gains'].append(data['coin_holding_gains'][-1])
+            ax_max.plot(
+                data['coin_uts'],
+                data['coin_holding_gains'],
+                label=f'{strat:<16} {len(data["coin_uts"]):<5} {success_ratio:<5} {int(max(data["coin_holding_gains"]))}'
+            )
+        for bear_market in bear_markets:
+            ax_max.axvspan(*bear_market, ymax=1, color ='firebrick', alpha=0.1)
+        for bull_market in bull_markets:
+            ax_max.axvspan(*bull_market, ymax=1, color ='limegreen', alpha=0.1)
+        for label in ax_max.get_xticklabels(which='major'):
+            label.set(rotation=30, horizontalalignment='right')
+        ax_max.plot([start_uts, final_uts], [0, 0], linestyle="--", color='yellowgreen')
+        ax_max.plot([start_uts, final_uts], [100, 100], linestyle="--", color='mediumspringgreen')
+        ax_max.plot([start_uts, final_uts], [-100, -100], linestyle="--", color='red')
+        ax_max.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%b'))
+        ax_max.xaxis.set_major_locator(mdates.MonthLocator(interval=2))
+        ax_max.xaxis.set_minor_locator(mdates.MonthLocator(interval=1))
+        ax_max.margins(x=0.01)
 
         ax_overall.set_title(f"{symbol}: {self.coin} trading graph overall best {self.coin} gain thresholds",fontweight="demi", size="xx-large", y=1.025)
         ax_overall.set_ylabel(f"% {self.coin} gain from inital", fontweight="demi", size="xx-large")
@@ -1179,38 +1291,22 @@ class Coin():
 
         interval_5min_mapping = {'5m':1, '15m':3, '30m':6, '1h':12, '2h':24, '3h':36, '4h':48,
                                  '6h':72, '8h':96, '12h':144, '1d':288, '3d':864, '1w':2016, '1M':8640}
-        blocksize = (num_scores * interval_5min_mapping[interval])*46 + 230 # no of bytes to extract from csv
+        with ScoreReader(f'{self.historical_scoring_path}/{symbol}/historical_scoring_{symbol}_{filename_ext}.csv') as reader:
+            rows = reader.last_rows(num_scores, interval_5min_mapping[interval] * 300000) # latest row, then one row per interval before it
+        if len(rows) < num_scores:
+            print('Error: Not enough historical data.')
+            return
+        print(f'The last {num_scores} many {interval} scores for {self.coin} are >>>')
         trend_stdout = []
-        with open(f'{self.historical_scoring_path}/{symbol}/historical_scoring_{symbol}_{filename_ext}.csv') as f:
-            f.seek(0, os.SEEK_END) # move to eof
-            eof = f.tell()
-            try:
-                f.seek(eof - blocksize)
-            except ValueError:
-                print('Error: Not enough historical data.')
-                return
-            data = f.read(blocksize) # load the end of the csv
-            print(f'The last {num_scores} many {interval} scores for {coin} are >>>')
-            to_skip = -1
-            rows_printed = 0
-            rows_count = 0
-            for row in csv.reader(data.split('\n')[1:]):
-                rows_count += 1
-                if to_skip > 1 or not row:
-                    to_skip -= 1
-                    continue
-                to_skip = interval_5min_mapping[interval]
-                rows_printed += 1
-                signal = '___'
-                bull_score = int(row[2])
-                bear_score = int(row[3])
-                if bull_score > bull_threshold and bull_score > bear_score:
-                    signal = 'SELL'
-                elif bear_score > bear_threshold and bear_score > bull_score:
-                    signal = 'BUY'
-                trend_stdout.append(f'Price: {row[1]:6}  | Bull: {bull_score} 1h_Bull: {row[6]}  | Bear: {bear_score} 1h_Bear: {row[5]}   | signal: {signal}')
-                if rows_printed == num_scores:
-                    break
+        for row in rows:
+            signal = '___'
+            bull_score = int(row[2])
+            bear_score = int(row[3])
+            if bull_score > bull_threshold and bull_score > bear_score:
+                signal = 'SELL'
+            elif bear_score > bear_threshold and bear_score > bull_score:
+                signal = 'BUY'
+            trend_stdout.append(f'Price: {row[1]:6}  | Bull: {bull_score} 1h_Bull: {row[6]}  | Bear: {bear_score} 1h_Bear: {row[5]}   | signal: {signal}')
         return trend_stdout
 
     
@@ -1225,51 +1321,44 @@ class Coin():
             threshold_strat = self.optimise_signal_threshold(symbol, timeframes)
         bull_threshold, bear_threshold = [int(threshold.split(':')[-1]) for threshold in threshold_strat.split('|')]
 
-        with open(f'{self.historical_scoring_path}/{symbol}/historical_scoring_{symbol}_{filename_ext}.csv') as f:
-            f.seek(0, os.SEEK_END) # move to eof
-            eof = f.tell()
-            blocksize = 25000
-            next_block = eof - blocksize
-            max_score = int((len(timeframes))*6)
-            peak_price = 0
-            best_price = [float('inf'), 0] # min, max
-            signal = ''
-            while next_block > 0:
-                f.seek(next_block)
-                data = f.read(blocksize).split('\n')[:-1] # load the end of the csv
-                data.reverse()
-                if next_block == eof - blocksize:
-                    latest_row = data[0].split(',')
-                next_block -= blocksize
-                for row in csv.reader(data):
-                    bull_score = float(row[2]) # i.e. massive surge up, hence you want to SELL
-                    bear_score = float(row[3]) # i.e. massive surge down, hence you want to BUY
-                    best_price[0] = min(best_price[0], float(row[1]))
-                    best_price[1] = max(best_price[1], float(row[1]))
-                    if bull_score >= bull_threshold and bull_score > bear_score:
-                        signal = 'SELL'
-                    elif bear_score >= bear_threshold and bear_score > bull_score:
-                        signal = 'BUY'
-                    if signal:
-                        peak_price = float(row[1])
-                        alt_action = 'BUY' if signal == 'SELL' else 'SELL'
-                        mood = 'BULL' if signal == 'SELL' else 'BEAR'
-                        score = bull_score if signal == 'SELL' else bear_score
-                        desired_assest = self.coin if signal == 'SELL' else symbol.split(self.coin)[-1]
-                        max_gain = (peak_price / best_price[0])*100 - 100 if signal == 'SELL' else (best_price[1] / peak_price)*100 - 100
-                        best_gain_price = best_price[0] if signal == 'SELL' else best_price[1]
-                        current_gain = (peak_price / float(latest_row[1]))*100 - 100 if signal == 'SELL' else (float(latest_row[1]) / peak_price)*100 - 100                            
-                        tf_indexs = list(range(5, len(row) - 1 ,2)) if signal == 'BUY' else list(range(6, len(row) - 1 ,2))
-                        tf_scores = [f'{timeframes[i]}: {score}' for i, score in enumerate([row[i] for i in tf_indexs])]
-                        uts = int(row[0][:-3])
-                        delta_time = int((datetime.now() - datetime.fromtimestamp(uts)).total_seconds() // 3600)
-                        date = datetime.fromtimestamp(uts).strftime('%d/%m/%y %a %I:%M %p')
-                        change_score = row[5]
-                        signal_price = row[1]
-                        current_price = latest_row[1]
-
-                        return [symbol, signal, mood, score, change_score, max_score, signal_price, tf_scores, alt_action, 
-                            max_gain, desired_assest, best_gain_price, current_gain, current_price, delta_time, date]
+        def row_signal(row):
+            bull_score = float(row[2]) # i.e. massive surge up, hence you want to SELL
+            bear_score = float(row[3]) # i.e. massive surge down, hence you want to BUY
+            if bull_score >= bull_threshold and bull_score > bear_score:
+                return 'SELL'
+            elif bear_score >= bear_threshold and bear_score > bull_score:
+                return 'BUY'
+            return ''
+
+        with ScoreReader(f'{self.historical_scoring_path}/{symbol}/historical_scoring_{symbol}_{filename_ext}.csv') as reader:
+            rows = reader.scan_backwards(row_signal) # latest row back to the latest signal
+        if not rows:
+            return
+        latest_row, row = rows[0], rows[-1]
+        max_score = int((len(timeframes))*6)
+        prices = [float(scanned_row[1]) for scanned_row in rows]
+        best_price = [min(prices), max(prices)] # min, max
+        signal = row_signal(row)
+        bull_score, bear_score = float(row[2]), float(row[3])
+        peak_price = float(row[1])
+        alt_action = 'BUY' if signal == 'SELL' else 'SELL'
+        mood = 'BULL' if signal == 'SELL' else 'BEAR'
+        score = bull_score if signal == 'SELL' else bear_score
+        desired_assest = self.coin if signal == 'SELL' else symbol.split(self.coin)[-1]
+        max_gain = (peak_price / best_price[0])*100 - 100 if signal == 'SELL' else (best_price[1] / peak_price)*100 - 100
+        best_gain_price = best_price[0] if signal == 'SELL' else best_price[1]
+        current_gain = (peak_price / float(latest_row[1]))*100 - 100 if signal == 'SELL' else (float(latest_row[1]) / peak_price)*100 - 100
+        tf_indexs = list(range(5, len(row) - 1 ,2)) if signal == 'BUY' else list(range(6, len(row) - 1 ,2))
+        tf_scores = [f'{timeframes[i]}: {score}' for i, score in enumerate([row[i] for i in tf_indexs])]
+        uts = int(row[0][:-3])
+        delta_time = int((datetime.now() - datetime.fromtimestamp(uts)).total_seconds() // 3600)
+        date = datetime.fromtimestamp(uts).strftime('%d/%m/%y %a %I:%M %p')
+        change_score = row[5]
+        signal_price = row[1]
+        current_price = latest_row[1]
+
+        return [symbol, signal, mood, score, change_score, max_score, signal_price, tf_scores, alt_action,
+            max_gain, desired_assest, best_gain_price, current_gain, current_price, delta_time, date]
 
     
     @staticmethod
@@ -1280,6 +1369,7 @@ class Coin():
         Once the price action is strong enough to generate a score, it then can also generate a change_score.
         To even have a change_score of 1, the price action has to be within the top 90% of %change in history.
         Hence, any change score is impressive, and indication that price is very unlikely to maintain this current candle.
+        Arrays of changes are scored with cut_points.score_performance_arrays.
         '''
 
         score, change_score = 0, 0
@@ -1329,7 +1419,7 @@ class Coin():
     @staticmethod
     def score_amplitude(amp_list, size, amplitude_change):
         '''
-        Returns current amplitude score
+        Returns current amplitude score, see cut_points.score_amplitude_arrays for arrays
         '''
 
         if amplitude_change >= amp_list[int(size * 0.75)]: 
@@ -1353,7 +1443,7 @@ class Coin():
     @staticmethod
     def percent_changes(candle_open, candle_high, candle_low, candle_close):
         '''
-        Returns % change, % amplitude, max % up, max % down of a given candle
+        Returns % change, % amplitude, max % up, max % down of a given candle, see cut_points.percent_change_arrays for arrays
         '''
 
         return {'candle_change':round((candle_close / candle_open)*100 - 100, 1),
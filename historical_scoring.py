@@ -0,0 +1,118 @@
+from tempfile import TemporaryDirectory
+from filecmp import cmp
+from time import perf_counter
+from rank_tree import RankTree
+from cut_points import PERFORMANCE_QUANTILES, CHANGE_QUANTILES, percent_change_arrays, performance_scores
+import numpy as np
+import json
+import sys
+
+'''
+NumPy kernels for Coin.score_history_numpy, the vectorised alternative to the per 5 minute row loop in
+Coin.score_history_loop. Both engines write identical historical_scoring csv and historical_analysis json files.
+
+Rather than walking every 5m row, each timeframe is handled in three batched steps:
+    1. every 5m row is mapped to the candle the loop engine would be positioned at (searchsorted + cummin).
+    2. the percentile thresholds used by Coin.score_performance are computed once per candle, as each candle only
+       changes the growing percent change lists once, giving a cut-point table per candle (see cut_points.py).
+    3. the tables are gathered per 5m row and all rows are scored with cut_points.performance_scores.
+
+Benchmark against the loop engine on a synthetic fixture with: <python3 historical_scoring.py [DAYS]>
+'''
+
+
+def enclosing_candle_index(candle_uts, price_uts, init_index):
+    '''
+    Returns the candle index of each price row. Like the loop engine, the position starts at init_index and
+    can only move forward one candle per row, so gaps in 5m data are caught up one row at a time.
+    '''
+
+    if not len(price_uts):
+        return np.empty(0, dtype=np.int64)
+    target = np.maximum(np.searchsorted(candle_uts, price_uts, side='right') - 1, init_index)
+    rows = np.arange(len(price_uts))
+    return rows + np.minimum(init_index + 1, np.minimum.accumulate(target - rows))
+
+
+def expanding_thresholds(initial_values, new_values, quantiles):
+    '''
+    Returns array where row i holds sorted_list[int(size * quantile)] for each quantile, after the first i
+    new_values have been inserted into the sorted list of initial_values, along with the final RankTree.
+    '''
+
+    rank_tree = RankTree(initial_values)
+    thresholds = np.full((len(new_values) + 1, len(quantiles)), np.nan)
+    if len(rank_tree):
+        thresholds[0] = rank_tree.thresholds(quantiles)
+    for i, value in enumerate(new_values.tolist(), 1):
+        rank_tree.insert(value)
+        thresholds[i] = rank_tree.thresholds(quantiles)
+    return thresholds, rank_tree
+
+
+def score_timeframe(candles, price_uts, prices, first_3day_UTS, skip_UTS, first_row=0):
+    '''
+    Scores price rows [first_row:] against one timeframe. candles is a dict of open_uts, open, high, low, close arrays,
+    price_uts and prices must hold every row after skip_UTS so that candle positions match the loop engine.
+    Returns bull score array, bear score array, change score array and the final percent change lists.
+    '''
+
+    candle_uts = candles['open_uts']
+    changes = percent_change_arrays(candles['open'], candles['high'], candles['low'], candles['close'])
+    first_3day_skip = np.searchsorted(candle_uts, first_3day_UTS, side='left')
+    initial_start = np.searchsorted(candle_uts, first_3day_UTS, side='right')
+    initial_stop = np.searchsorted(candle_uts, skip_UTS, side='right')
+    init_index = (initial_stop - initial_start) + first_3day_skip # matches the loop engine's initial position
+
+    candle_index = enclosing_candle_index(candle_uts, price_uts, init_index)
+    last_index = int(candle_index[-1]) if len(candle_index) else init_index
+    candle_index, prices = candle_index[first_row:], prices[first_row:]
+    inserted = candle_index - init_index # number of candles added to the growing lists for each row
+    thresholds = {}
+    final_lists = {}
+    for metric, quantiles in [('candle_change', CHANGE_QUANTILES), ('candle_max_up', PERFORMANCE_QUANTILES), ('candle_max_down', PERFORMANCE_QUANTILES)]:
+        initial_values = changes[metric][initial_start:initial_stop]
+        new_values = changes[metric][init_index + 1:last_index + 1]
+        metric_thresholds, rank_tree = expanding_thresholds(initial_values, new_values, quantiles)
+        thresholds[metric] = metric_thresholds[inserted]
+        final_lists[metric] = rank_tree.to_list()
+
+    current_percent_change = (prices / candles['open'][candle_index])*100 - 100 # %change for given candle
+    bull = current_percent_change > 0
+    max_thresholds = np.where(bull[:, None], thresholds['candle_max_up'], thresholds['candle_max_down'])
+    score, change_score = performance_scores(np.abs(current_percent_change), current_percent_change, max_thresholds, thresholds['candle_change'])
+    return np.where(bull, score, 0), np.where(bull, 0, score), change_score, final_lists
+
+
+def benchmark_engines(days=120, seed=0):
+    '''
+    Builds a synthetic fixture coin of given days of 5m candles, then times and compares both scoring engines.
+    '''
+
+    from fixtures import candle_coin, FILENAME_EXT
+
+    num_rows = days * 288
+    with TemporaryDirectory() as data_path:
+        coins = {engine:candle_coin(f'{data_path}/{engine}', days, seed) for engine in ['loop', 'numpy']}
+
+        timings = {}
+        for engine, coin in coins.items():
+            start = perf_counter()
+            coin.score_history_loop('FIXUSDT', []) if engine == 'loop' else coin.score_history_numpy('FIXUSDT', [])
+            timings[engine] = perf_counter() - start
+
+        paths = [f'{coin.historical_scoring_path}/FIXUSDT/historical_scoring_FIXUSDT_{FILENAME_EXT}' for coin in coins.values()]
+        identical_csv = cmp(f'{paths[0]}.csv', f'{paths[1]}.csv', shallow=False)
+        json_paths = [path.replace('historical_scoring_FIXUSDT', 'historical_analysis_FIXUSDT') + '.json' for path in paths]
+        with open(json_paths[0]) as loop_jf, open(json_paths[1]) as numpy_jf:
+            identical_json = json.load(loop_jf) == json.load(numpy_jf)
+
+    print(f'{days} days of 5m rows ({num_rows} rows), timeframes {FILENAME_EXT}')
+    print(f"loop engine: {timings['loop']:.2f}s | numpy engine: {timings['numpy']:.2f}s | speed up: {timings['loop'] / timings['numpy']:.1f}x")
+    print(f'historical_scoring csv identical: {identical_csv} | historical_analysis json identical: {identical_json}')
+    return identical_csv and identical_json
+
+
+if __name__ == "__main__":
+    # Example: <python3 historical_scoring.py 365>
+    sys.exit(0 if benchmark_engines(int(sys.argv[1]) if len(sys.argv) > 1 else 120) else 1)
@@ -0,0 +1,266 @@
+from binance.exceptions import BinanceAPIException # Third party
+from binance.helpers import date_to_milliseconds # Third party
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from threading import Lock, Thread
+from time import monotonic, sleep, perf_counter
+from enums import KLINE_FETCH_WORKERS, KLINE_WEIGHT_PER_MINUTE
+import random
+import json
+import sys
+
+'''
+Concurrent Binance kline fetcher used by Coin.get_candles and Coin.update_database.
+
+Every (symbol, timeframe, start) job pages through /api/v3/klines with client.get_klines, 1000 klines per request,
+which returns the same klines as client.get_historical_klines. Jobs run concurrently on a thread pool while a shared
+token bucket keeps the request weight under KLINE_WEIGHT_PER_MINUTE. Transient BinanceAPIExceptions (rate limits,
+server errors) are retried with exponential backoff, a Retry-After header pauses the whole bucket.
+
+Compare against serial fetching on a local fake kline server with: <python3 kline_fetcher.py [SYMBOLS]>
+'''
+
+KLINE_PAGE_LIMIT = 1000 # max klines per request
+KLINE_REQUEST_WEIGHT = 2 # Binance request weight of /api/v3/klines
+RETRY_STATUS_CODES = [418, 429, 500, 502, 503, 504]
+RETRY_ERROR_CODES = [-1003] # too many requests
+
+
+class TokenBucket():
+    '''
+    Thread-safe token bucket, acquire() blocks until enough tokens are available
+    '''
+
+    def __init__(self, capacity, refill_rate):
+
+        self.capacity = capacity
+        self.refill_rate = refill_rate # tokens per second
+        self.tokens = capacity
+        self.updated = monotonic()
+        self.resume_at = 0 # monotonic time until which acquire() blocks, see pause()
+        self.lock = Lock()
+
+
+    def refill(self):
+        now = monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.refill_rate)
+        self.updated = now
+
+
+    def acquire(self, tokens=1):
+        while True:
+            with self.lock:
+                self.refill()
+                if self.updated < self.resume_at:
+                    wait = self.resume_at - self.updated
+                elif self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                else:
+                    wait = (tokens - self.tokens) / self.refill_rate
+            sleep(wait)
+
+
+    def pause(self, seconds):
+        '''
+        Blocks every acquire() for the given seconds, e.g. after a 429 Retry-After
+        '''
+
+        with self.lock:
+            self.resume_at = max(self.resume_at, monotonic() + seconds)
+
+
+class KlineFetcher():
+    '''
+    Fetches klines of many symbol_timeframes concurrently within the Binance request weight limit
+    '''
+
+    def __init__(self, client, max_workers=KLINE_FETCH_WORKERS, weight_per_minute=KLINE_WEIGHT_PER_MINUTE,
+                 max_retries=5, backoff=1, max_backoff=60):
+
+        self.client = client
+        self.max_workers = max_workers
+        self.bucket = TokenBucket(weight_per_minute, weight_per_minute / 60)
+        self.max_retries = max_retries
+        self.backoff = backoff # seconds before the first retry, doubled every retry
+        self.max_backoff = max_backoff
+        self.retries = 0 # number of retried requests, for monitoring
+
+
+    def request(self, **params):
+        '''
+        Single /api/v3/klines request, retried with backoff on transient BinanceAPIExceptions
+        '''
+
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire(KLINE_REQUEST_WEIGHT)
+            try:
+                return self.client.get_klines(**params)
+            except BinanceAPIException as e:
+                if attempt == self.max_retries or not (e.status_code in RETRY_STATUS_CODES or e.code in RETRY_ERROR_CODES):
+                    raise # e.g. invalid symbol
+                delay = min(self.backoff * 2 ** attempt, self.max_backoff) * random.uniform(1, 1.5)
+                headers = getattr(e.response, 'headers', None) or {}
+                if headers.get('Retry-After'):
+                    delay = max(delay, float(headers['Retry-After']))
+                    self.bucket.pause(delay) # every worker has to wait out a rate limit
+                self.retries += 1
+                sleep(delay)
+
+
+    def fetch_klines(self, symbol, timeframe, start, max_klines=None):
+        '''
+        Returns all klines from start (uts or date string) up to now, same as client.get_historical_klines
+        '''
+
+        start_ts = start if isinstance(start, int) else date_to_milliseconds(start)
+        klines = []
+        while True:
+            page = self.request(symbol=symbol, interval=timeframe, startTime=start_ts, limit=KLINE_PAGE_LIMIT)
+            klines += page
+            if len(page) < KLINE_PAGE_LIMIT or (max_klines and len(klines) >= max_klines):
+                break
+            start_ts = page[-1][0] + 1 # next page starts after the final open time
+        return klines[:max_klines] if max_klines else klines
+
+
+    def fetch(self, jobs):
+        '''
+        Fetches list of (symbol, timeframe, start) jobs concurrently.
+        Returns list of klines in job order, where a job rejected by Binance holds its BinanceAPIException instead.
+        '''
+
+        def fetch_job(job):
+            try:
+                return self.fetch_klines(*job)
+            except BinanceAPIException as e:
+                return e
+
+        if len(jobs) <= 1:
+            return [fetch_job(job) for job in jobs]
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(jobs))) as executor:
+            return list(executor.map(fetch_job, jobs))
+
+
+class FakeKlineServer():
+    '''
+    Local stand-in for the Binance kline endpoint, serves deterministic klines of the given symbols up to end_uts.
+    Responds after latency seconds and rate limits every rate_limit_every-th request with rate_limit_status (429, or
+    418 once Binance bans the IP), both with a Retry-After header of retry_after seconds.
+    Point a client at it with: client.API_URL = f'{server.url}/api'
+    '''
+
+    INTERVAL_MS = {'5m':300000, '15m':900000, '30m':1800000, '1h':3600000, '2h':7200000, '4h':14400000,
+                   '6h':21600000, '8h':28800000, '12h':43200000, '1d':86400000, '3d':259200000, '1w':604800000}
+
+    def __init__(self, symbols, start_uts=1609459200000, end_uts=1640995200000, latency=0.05, rate_limit_every=0,
+                 rate_limit_status=429, retry_after=0.1):
+
+        self.symbols = symbols
+        self.start_uts = start_uts
+        self.end_uts = end_uts
+        self.latency = latency
+        self.rate_limit_every = rate_limit_every
+        self.rate_limit_status = rate_limit_status
+        self.retry_after = retry_after
+        self.requests = 0
+        self.lock = Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.handle(self)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.httpd.server_address[1]}'
+
+
+    def __enter__(self):
+        Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+
+    def __exit__(self, *args):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+    def klines(self, symbol, timeframe, start_ts, limit):
+        interval = self.INTERVAL_MS[timeframe]
+        open_uts = max(start_ts + (-start_ts) % interval, self.start_uts)
+        klines = []
+        while open_uts < self.end_uts and len(klines) < limit:
+            price = 10 + (open_uts // interval * 7919 + sum(map(ord, symbol))) % 1000 / 100
+            klines.append([open_uts, f'{price:.8f}', f'{price * 1.01:.8f}', f'{price * 0.99:.8f}', f'{price:.8f}', '0',
+                           open_uts + interval - 1, '0', 0, '0', '0', '0'])
+            open_uts += interval
+        return klines
+
+
+    def handle(self, request):
+        sleep(self.latency)
+        with self.lock:
+            self.requests += 1
+            rate_limited = self.rate_limit_every and self.requests % self.rate_limit_every == 0
+        url = urlparse(request.path)
+        params = {key:values[0] for key, values in parse_qs(url.query).items()}
+        headers = {}
+        if url.path == '/api/v3/ping':
+            status, body = 200, {}
+        elif url.path != '/api/v3/klines':
+            status, body = 404, {'code':-1000, 'msg':'Unknown endpoint.'}
+        elif rate_limited:
+            status, body, headers = self.rate_limit_status, {'code':-1003, 'msg':'Too many requests.'}, {'Retry-After':str(self.retry_after)}
+        elif params.get('symbol') not in self.symbols:
+            status, body = 400, {'code':-1121, 'msg':'Invalid symbol.'}
+        else:
+            status, body = 200, self.klines(params['symbol'], params['interval'], int(params.get('startTime', 0)),
+                                            int(params.get('limit', 500)))
+        content = json.dumps(body).encode()
+        request.send_response(status)
+        request.send_header('Content-Type', 'application/json')
+        request.send_header('Content-Length', str(len(content)))
+        for key, value in headers.items():
+            request.send_header(key, value)
+        request.end_headers()
+        request.wfile.write(content)
+
+
+def compare_fetchers(num_symbols=10):
+    '''
+    Fetches a year of klines for num_symbols symbols and 6 timeframes from a fake kline server, serially with
+    client.get_historical_klines and concurrently with KlineFetcher (with injected rate limits), and compares them.
+    '''
+
+    from binance.client import Client
+
+    symbols = [f'FAKE{i}USDT' for i in range(num_symbols)]
+    jobs = [(symbol, timeframe, '1 Jan, 2021') for symbol in symbols for timeframe in ['1w', '3d', '1d', '12h', '4h', '1h']]
+    with FakeKlineServer(symbols) as server:
+        client = Client(ping=False)
+        client.API_URL = f'{server.url}/api'
+        start = perf_counter()
+        serial = [client.get_historical_klines(*job) for job in jobs]
+        serial_time = perf_counter() - start
+
+        server.rate_limit_every = 25 # get_historical_klines does not retry
+        fetcher = KlineFetcher(client, backoff=0.05)
+        start = perf_counter()
+        concurrent = fetcher.fetch(jobs)
+        concurrent_time = perf_counter() - start
+        invalid = fetcher.fetch([('NOTLISTED', '1h', '1 Jan, 2021')])[0]
+
+    identical = serial == concurrent and isinstance(invalid, BinanceAPIException) and invalid.code == -1121
+    print(f'{len(jobs)} symbol_timeframes, {server.requests} requests to the fake server ({fetcher.retries} rate limited and retried)')
+    print(f'serial: {serial_time:.2f}s | concurrent: {concurrent_time:.2f}s | speed up: {serial_time / concurrent_time:.1f}x')
+    print(f'klines identical: {identical}')
+    return identical
+
+
+if __name__ == "__main__":
+    # Example: <python3 kline_fetcher.py 20>
+    sys.exit(0 if compare_fetchers(int(sys.argv[1]) if len(sys.argv) > 1 else 10) else 1)
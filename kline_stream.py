@@ -0,0 +1,322 @@
+from collections import deque
+from threading import Lock, Thread, Event
+from time import time, sleep
+from enums import KLINE_STREAM_URL, KLINE_STREAM_BUFFER_SIZE, KLINE_STREAM_MAX_AGE
+import logging
+import json
+import sys
+
+'''
+Live kline ingestion from Binance's combined kline streams (<symbol>@kline_<interval>), used by Coin.current_score.
+
+KlineStream consumes stream messages on a background thread into a KlineRingBuffer per symbol_timeframe, which holds
+the latest KLINE_STREAM_BUFFER_SIZE candles (the final one is the forming candle, updated in place every ~2 seconds).
+Streams are subscribed on first use, and the connection is re-established (with all subscriptions) when it drops.
+
+Transports are pluggable, any object with connect(), send(message), recv(timeout) and close() works:
+    WebsocketTransport = Binance (or any websocket url, e.g. a ReplayServer)
+    ReplayServer = local websocket server which feeds recorded stream messages to its clients
+
+Connection errors are logged (logger 'kline_stream'), the notification server prints them with its other messages.
+
+Record messages with: <python3 kline_stream.py record SECONDS PATH SYMBOL_TIMEFRAME ...>  e.g. BTCUSDT_1h
+Replay a recording with: <python3 kline_stream.py replay PATH>
+'''
+
+
+logger = logging.getLogger('kline_stream')
+
+
+def stream_name(symbol, timeframe):
+    return f'{symbol.lower()}@kline_{timeframe}'
+
+
+class KlineRingBuffer():
+    '''
+    Fixed size buffer of the latest candles of one symbol_timeframe, as Binance REST kline lists
+    '''
+
+    def __init__(self, size=KLINE_STREAM_BUFFER_SIZE):
+
+        self.klines = deque(maxlen=size)
+        self.updated = 0 # time of the latest update
+
+
+    def update(self, kline):
+        '''
+        Replaces the forming candle, or appends the kline when a new candle has opened
+        '''
+
+        if self.klines and self.klines[-1][0] == kline[0]:
+            self.klines[-1] = kline
+        elif not self.klines or self.klines[-1][0] < kline[0]:
+            self.klines.append(kline)
+        self.updated = time()
+
+
+    def latest(self):
+        return self.klines[-1] if self.klines else None
+
+
+class WebsocketTransport():
+    '''
+    Websocket connection to a combined stream url
+    '''
+
+    def __init__(self, url=KLINE_STREAM_URL):
+
+        self.url = url
+        self.websocket = None
+
+
+    def connect(self):
+        from websockets.sync.client import connect # Third party, installed with python-binance
+        self.websocket = connect(self.url)
+
+
+    def send(self, message):
+        self.websocket.send(message)
+
+
+    def recv(self, timeout):
+        '''
+        Returns the next message, raises TimeoutError if none arrived within timeout
+        '''
+
+        return self.websocket.recv(timeout=timeout)
+
+
+    def close(self):
+        if self.websocket:
+            self.websocket.close()
+            self.websocket = None
+
+
+class KlineStream():
+    '''
+    Background consumer of kline stream messages into per symbol_timeframe ring buffers
+    '''
+
+    def __init__(self, transport, buffer_size=KLINE_STREAM_BUFFER_SIZE, record_path=None):
+
+        self.transport = transport
+        self.buffer_size = buffer_size
+        self.record_path = record_path # every received message is appended here when given
+        self.buffers = {} # stream name: KlineRingBuffer
+        self.streams = set() # subscribed stream names
+        self.pending_streams = set() # subscribed but not yet sent to the connection
+        self.lock = Lock()
+        self.stopped = Event()
+        self.connected = Event()
+        self.thread = None
+        self.message_id = 0
+
+
+    def subscribe(self, symbol, timeframe):
+        '''
+        Adds the stream of symbol_timeframe, starting the consumer thread when needed
+        '''
+
+        name = stream_name(symbol, timeframe)
+        with self.lock:
+            if name not in self.streams:
+                self.streams.add(name)
+                self.pending_streams.add(name)
+                self.buffers[name] = KlineRingBuffer(self.buffer_size)
+            if not self.thread or not self.thread.is_alive():
+                self.stopped.clear()
+                self.thread = Thread(target=self.run, daemon=True)
+                self.thread.start()
+
+
+    def latest_kline(self, symbol, timeframe, max_age=KLINE_STREAM_MAX_AGE):
+        '''
+        Returns the forming candle of symbol_timeframe as a REST kline list, or None when not streamed within max_age seconds
+        '''
+
+        with self.lock:
+            buffer = self.buffers.get(stream_name(symbol, timeframe))
+            if not buffer or time() - buffer.updated > max_age:
+                return None
+            return buffer.latest()
+
+
+    def klines(self, symbol, timeframe):
+        '''
+        Returns every buffered candle of symbol_timeframe
+        '''
+
+        with self.lock:
+            buffer = self.buffers.get(stream_name(symbol, timeframe))
+            return list(buffer.klines) if buffer else []
+
+
+    def handle(self, message):
+        '''
+        Stores a combined stream kline message, other messages (e.g. subscription results) are ignored
+        '''
+
+        payload = json.loads(message)
+        data = payload.get('data', payload)
+        if data.get('e') != 'kline':
+            return
+        k = data['k']
+        kline = [k['t'], k['o'], k['h'], k['l'], k['c'], k['v'], k['T'], k['q'], k['n'], k['V'], k['Q'], '0']
+        with self.lock:
+            buffer = self.buffers.get(stream_name(k['s'], k['i']))
+            if buffer:
+                buffer.update(kline)
+
+
+    def send_subscriptions(self):
+        with self.lock:
+            streams, self.pending_streams = sorted(self.pending_streams), set()
+        if streams:
+            self.message_id += 1
+            self.transport.send(json.dumps({'method':'SUBSCRIBE', 'params':streams, 'id':self.message_id}))
+
+
+    def run(self):
+        '''
+        Consumer loop, reconnects with exponential backoff
+        '''
+
+        delay = 1
+        while not self.stopped.is_set():
+            try:
+                self.transport.connect()
+                with self.lock:
+                    self.pending_streams = set(self.streams) # (re)subscribe everything on a new connection
+                self.connected.set()
+                delay = 1
+                while not self.stopped.is_set():
+                    self.send_subscriptions()
+                    try:
+                        message = self.transport.recv(timeout=1)
+                    except TimeoutError:
+                        continue
+                    if self.record_path:
+                        with open(self.record_path, 'a') as f:
+                            f.write(message.strip() + '\n')
+                    self.handle(message)
+            except Exception as e:
+                if not self.stopped.is_set():
+                    logger.warning(f'kline stream: connection lost ({e}), reconnecting in {delay}s')
+                    self.stopped.wait(delay)
+                    delay = min(delay * 2, 60)
+            finally:
+                self.connected.clear()
+                self.transport.close()
+
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread:
+            self.thread.join()
+
+
+class ReplayServer():
+    '''
+    Local websocket server which sends the recorded stream messages (one json per line) of a stream to a client
+    once it subscribes to that stream, with interval seconds between messages. drop() closes every client connection.
+    '''
+
+    def __init__(self, messages, interval=0):
+
+        self.messages = messages
+        self.interval = interval
+        self.sent = 0
+        self.connections = set() # open client connections
+        self.num_connections = 0
+
+
+    @classmethod
+    def from_file(cls, path, interval=0):
+        with open(path, 'r') as f:
+            return cls([line.strip() for line in f if line.strip()], interval)
+
+
+    def handler(self, websocket):
+        streams = set()
+        self.connections.add(websocket)
+        self.num_connections += 1
+        try:
+            while True:
+                request = json.loads(websocket.recv())
+                new_streams = set(request['params']).difference(streams)
+                streams.update(new_streams)
+                websocket.send(json.dumps({'result':None, 'id':request['id']}))
+                for message in self.messages:
+                    if json.loads(message).get('stream') in new_streams:
+                        websocket.send(message)
+                        self.sent += 1
+                        sleep(self.interval)
+        except Exception:
+            pass # client disconnected
+        finally:
+            self.connections.discard(websocket)
+
+
+    def drop(self):
+        '''
+        Closes every client connection, like Binance does every 24 hours
+        '''
+
+        for websocket in list(self.connections):
+            websocket.close()
+
+
+    def __enter__(self):
+        from websockets.sync.server import serve # Third party, installed with python-binance
+        self.server = serve(self.handler, '127.0.0.1', 0)
+        self.url = f'ws://127.0.0.1:{self.server.socket.getsockname()[1]}'
+        Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+
+
+def record(seconds, path, symbol_timeframes):
+    '''
+    Records Binance kline stream messages of the given symbol_timeframes (e.g. BTCUSDT_1h) for given seconds
+    '''
+
+    kline_stream = KlineStream(WebsocketTransport(), record_path=path)
+    for symbol_timeframe in symbol_timeframes:
+        kline_stream.subscribe(*symbol_timeframe.split('_'))
+    sleep(seconds)
+    kline_stream.stop()
+
+
+def replay(path):
+    '''
+    Feeds a recording through a ReplayServer into a KlineStream and prints the latest candle of every stream
+    '''
+
+    with open(path, 'r') as f:
+        streams = sorted({json.loads(line)['stream'] for line in f if line.strip()})
+    with ReplayServer.from_file(path) as server:
+        kline_stream = KlineStream(WebsocketTransport(server.url))
+        for name in streams:
+            symbol, timeframe = name.split('@kline_')
+            kline_stream.subscribe(symbol.upper(), timeframe)
+        while server.sent < len(server.messages) or not kline_stream.connected.is_set():
+            sleep(0.1)
+        sleep(0.5)
+        for name in streams:
+            symbol, timeframe = name.split('@kline_')
+            print(f'{symbol.upper()}_{timeframe}: {len(kline_stream.klines(symbol.upper(), timeframe))} candles, latest {kline_stream.latest_kline(symbol.upper(), timeframe)}')
+        kline_stream.stop()
+
+
+if __name__ == "__main__":
+    # Example: <python3 kline_stream.py record 60 btc.jsonl BTCUSDT_1h BTCUSDT_4h> then <python3 kline_stream.py replay btc.jsonl>
+    if len(sys.argv) >= 5 and sys.argv[1] == 'record':
+        record(float(sys.argv[2]), sys.argv[3], sys.argv[4:])
+    elif len(sys.argv) == 3 and sys.argv[1] == 'replay':
+        replay(sys.argv[2])
+    else:
+        print('Usage: python3 kline_stream.py record SECONDS PATH SYMBOL_TIMEFRAME ... | replay PATH')
+        sys.exit(1)
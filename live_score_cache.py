@@ -0,0 +1,147 @@
+from collections import OrderedDict
+from threading import Thread, Lock, Event
+from time import perf_counter, sleep
+from enums import LIVE_SCORE_CACHE_SIZE
+import sys
+
+'''
+Cache of Coin.current_score, shared by every consumer of the process (server stdout, mode 1/mode 2 mails and any
+future REST endpoint), so a score is computed once per price update however many users ask for it.
+
+Entries are keyed by (symbol, timeframes, threshold) and hold the score of one tick: the forming candle (open uts,
+open, high, low, close) of each scored timeframe. A request with the same tick is served from the cache, a new tick
+recomputes the score (update_database, thresholds, score json and ranks) and replaces the entry:
+    score = live_score_cache.get(symbol, timeframes, threshold, tick, compute)
+Concurrent requests of a key wait on the one computation in flight instead of repeating it. Requests without a tick
+(candles not streamed yet) are computed and not cached.
+
+Cached scores are shared by every reader, so they must not be mutated. Coin.compute_historical_score invalidates the
+symbol once new scores change its thresholds. At most max_entries keys are kept, least recently used are evicted.
+
+Compare serving users with and without the cache with: <python3 live_score_cache.py [USERS] [TICKS]>
+'''
+
+
+class LiveScoreCache():
+    '''
+    Thread-safe LRU cache of live scores, keyed by (symbol, timeframes, threshold) and valid for one tick
+    '''
+
+    def __init__(self, max_entries=LIVE_SCORE_CACHE_SIZE):
+
+        self.max_entries = max_entries
+        self.entries = OrderedDict() # (symbol, timeframes, threshold): (tick, score), least recently used first
+        self.computing = {} # key: Event set once its computation finishes
+        self.hits, self.misses, self.uncached, self.evictions = 0, 0, 0, 0
+        self.waits = 0 # requests which waited on the computation of another
+        self.generation = 0 # number of invalidations, computations started before one are not cached
+        self.lock = Lock()
+
+
+    def get(self, symbol, timeframes, threshold, tick, compute):
+        '''
+        Returns the score of tick, calls compute() once per new tick (or every time when tick is None)
+        '''
+
+        if tick is None:
+            with self.lock:
+                self.uncached += 1
+            return compute()
+        key = (symbol, tuple(timeframes), threshold)
+        while True:
+            with self.lock:
+                entry = self.entries.get(key)
+                if entry and entry[0] == tick:
+                    self.hits += 1
+                    self.entries.move_to_end(key)
+                    return entry[1]
+                event = self.computing.get(key)
+                if event is None:
+                    self.misses += 1
+                    event = self.computing[key] = Event()
+                    generation = self.generation
+                    break
+                self.waits += 1
+            event.wait() # then served from the cache, or computed again if the tick moved on or the computation failed
+
+        computed = False
+        try:
+            score = compute()
+            computed = True
+        finally:
+            with self.lock:
+                if computed and generation == self.generation:
+                    self.entries[key] = (tick, score)
+                    self.entries.move_to_end(key)
+                    while len(self.entries) > self.max_entries:
+                        self.entries.popitem(last=False)
+                        self.evictions += 1
+                self.computing.pop(key)
+                event.set()
+        return score
+
+
+    def invalidate(self, symbol=None):
+        '''
+        Drops the scores of symbol (or of every symbol), e.g. once its thresholds are simulated again
+        '''
+
+        with self.lock:
+            self.generation += 1
+            for key in [key for key in self.entries if symbol is None or key[0] == symbol]:
+                self.entries.pop(key)
+
+
+    def stats(self):
+        with self.lock:
+            requests = self.hits + self.misses # a waiting request ends as a hit (or a miss once the tick moved on)
+            return {'hits':self.hits, 'misses':self.misses, 'waits':self.waits, 'uncached':self.uncached,
+                    'evictions':self.evictions, 'entries':len(self.entries),
+                    'hit_rate':round(self.hits / requests, 3) if requests else 0}
+
+
+def benchmark_cache(num_users=50, num_ticks=20, compute_time=0.01):
+    '''
+    Every tick, num_users threads ask for the score of one symbol (a compute sleeping compute_time, like the
+    update_database and json reload of current_score), without and with the cache. Checks every user got the
+    score of the tick it asked for.
+    '''
+
+    computes = [0]
+    def compute(tick):
+        sleep(compute_time)
+        computes[0] += 1
+        return ['BTCUSDT', tick]
+
+    def serve(cache):
+        served = []
+        for tick in range(num_ticks):
+            if cache:
+                users = [Thread(target=lambda : served.append((tick, cache.get('BTCUSDT', ['1h', '4h'], None, tick, lambda : compute(tick)))))
+                         for _ in range(num_users)]
+            else:
+                users = [Thread(target=lambda : served.append((tick, compute(tick)))) for _ in range(num_users)]
+            [user.start() for user in users]
+            [user.join() for user in users]
+        return served
+
+    start = perf_counter()
+    served = serve(None)
+    direct_time, direct_computes = perf_counter() - start, computes[0]
+    cache = LiveScoreCache()
+    computes[0] = 0
+    start = perf_counter()
+    served += serve(cache)
+    cached_time, cached_computes = perf_counter() - start, computes[0]
+    correct = all(score[1] == tick for tick, score in served) and len(served) == 2 * num_users * num_ticks
+
+    print(f'{num_users} users, {num_ticks} ticks, {compute_time * 1000:.0f}ms per score')
+    print(f'no cache: {direct_time:.3f}s, {direct_computes} scores computed | cache: {cached_time:.3f}s, {cached_computes} scores computed')
+    print(f'cache stats: {cache.stats()}')
+    print(f'every user got the score of its tick: {correct}')
+    return correct and cached_computes == num_ticks
+
+
+if __name__ == "__main__":
+    # Example: <python3 live_score_cache.py 50 20>
+    sys.exit(0 if benchmark_cache(*[int(arg) for arg in sys.argv[1:3]]) else 1)
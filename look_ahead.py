@@ -0,0 +1,131 @@
+from tempfile import TemporaryDirectory
+from filecmp import cmp
+from time import perf_counter
+from datetime import datetime
+import numpy as np
+import csv
+import sys
+
+'''
+NumPy kernels for Coin.generate_look_ahead_gains, the vectorised alternative to slicing and iterating up to 4032 look
+ahead rows per signal peak. Both engines write identical look_ahead_gains csv files.
+
+Every row with a signal (a bull or bear score over its threshold, not both) is a peak. The look ahead of a peak is split
+into consecutive segments ending at LOOK_AHEAD_HORIZONS rows (peak row = 1), where each segment starts at the final row
+of the previous segment (the first starts at the peak). A segment's gain is the best price within it relative to the peak
+price: the lowest for bull peaks (buy_back, as you ideally sold) and highest for bear peaks (sell_later).
+The best price of every window of a segment length is computed once for the whole price array (van Herk/Gil-Werman
+running min/max), so every peak's gains are gathered with a few array lookups.
+
+Benchmark against the loop engine on synthetic multi-year 5m scores with: <python3 look_ahead.py [YEARS]>
+'''
+
+LOOK_AHEAD_HORIZONS = [6, 12, 48, 144, 288, 864, 2016, 4032] # 30min, 1h, 4h, 12h, 1d, 3d, 1w, 2w of 5min rows
+LOOK_AHEAD_BUFFER_MS = 4500 * 300000 # rows within this of a peak must hold the full look ahead (missing 5m rows)
+SEGMENT_STARTS = [0, *[horizon - 1 for horizon in LOOK_AHEAD_HORIZONS[:-1]]] # row offsets from the peak
+SEGMENT_LENGTHS = [horizon - start for horizon, start in zip(LOOK_AHEAD_HORIZONS, SEGMENT_STARTS)]
+
+
+def running_best(values, window, best):
+    '''
+    Returns array where i holds best (np.minimum or np.maximum) of values[i:i + window], for every full window
+    '''
+
+    num_windows = len(values) - window + 1
+    if num_windows <= 0:
+        return np.empty(0, dtype=values.dtype)
+    fill = np.inf if best is np.minimum else -np.inf
+    blocks = np.concatenate([values, np.full(-len(values) % window, fill)]).reshape(-1, window)
+    prefix = best.accumulate(blocks, axis=1).ravel() # best from the block start up to i
+    suffix = best.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].ravel() # best from i up to the block end
+    return best(suffix[:num_windows], prefix[window - 1:window - 1 + num_windows])
+
+
+def signal_peaks(bull, bear, bull_threshold, bear_threshold):
+    '''
+    Returns the row index of every peak, i.e. rows with a bull or bear signal
+    '''
+
+    bull_met = bull >= bull_threshold
+    bear_met = bear >= bear_threshold
+    signal = (bull_met & (bull > bear)) | (bear_met & (bear > bull))
+    return np.flatnonzero(signal & ~(bull_met & bear_met))
+
+
+def peak_gains(uts, prices, bull, bear, peaks):
+    '''
+    Returns the peaks with a full look ahead (the scan stops at the first peak without one), their goals (True for
+    buy_back) and the int64 array of gains (% of the peak price) per peak and horizon.
+    '''
+
+    available = np.searchsorted(uts, uts[peaks] + LOOK_AHEAD_BUFFER_MS, side='right') - peaks
+    incomplete = np.flatnonzero(available < LOOK_AHEAD_HORIZONS[-1])
+    peaks = peaks[:incomplete[0]] if len(incomplete) else peaks
+    buy_back = bull[peaks] > bear[peaks]
+    gains = np.empty((len(peaks), len(LOOK_AHEAD_HORIZONS)), dtype=np.int64)
+    for column, (start, length) in enumerate(zip(SEGMENT_STARTS, SEGMENT_LENGTHS)):
+        lowest = running_best(prices, length, np.minimum)[peaks + start]
+        highest = running_best(prices, length, np.maximum)[peaks + start]
+        gains[:, column] = (np.where(buy_back, lowest, highest) / prices[peaks]) * 100 # truncated like int()
+    return peaks, buy_back, gains
+
+
+def look_ahead_rows(historical_scoring_DF, bull_threshold, bear_threshold, start_row=0):
+    '''
+    Returns the look_ahead_gains csv rows of the peaks from start_row onwards
+    '''
+
+    uts = historical_scoring_DF.index.to_numpy()
+    prices = historical_scoring_DF[1].to_numpy(dtype=np.float64)
+    bull, bear = historical_scoring_DF[2].to_numpy(), historical_scoring_DF[3].to_numpy()
+    peaks = signal_peaks(bull[start_row:], bear[start_row:], bull_threshold, bear_threshold) + start_row
+    peaks = peaks[peaks < len(uts) - 1] # a peak is only handled once the next row is scored
+    peaks, buy_back, gains = peak_gains(uts, prices, bull, bear, peaks)
+
+    rows = []
+    scores = historical_scoring_DF.iloc[peaks].itertuples(name=None)
+    for peak_row, goal_buy_back, peak_gains_row in zip(scores, buy_back.tolist(), gains.tolist()):
+        goal = "buy_back" if goal_buy_back else "sell_later"
+        tf_start = 6 if goal == 'buy_back' else 5
+        tf_scores = [peak_row[i] for i in range(tf_start, len(peak_row) - 1, 2)]
+        utc_time = datetime.utcfromtimestamp(int(str(peak_row[0])[:-3])).strftime('|%d-%m-%Y %H:%M:%S|')
+        peak_start = peak_row[2] if goal_buy_back else peak_row[3]
+        rows.append([utc_time, peak_row[1], peak_start, peak_row[4], goal, *peak_gains_row, *tf_scores, peak_row[0]])
+    return rows
+
+
+def benchmark_engines(years=3, bull_threshold=16, bear_threshold=16, seed=0):
+    '''
+    Writes a synthetic historical_scoring csv of given years of 5m rows (with missing rows) for a fixture coin, then
+    times and compares both generate_look_ahead_gains engines, fresh and resumed after new rows.
+    '''
+
+    from fixtures import scored_coin, synthetic_scoring
+
+    historical_DF = synthetic_scoring(years * 365, seed, gap_rate=0.001) # Binance maintenance leaves gaps
+    num_rows = len(historical_DF)
+    threshold = f'BULL:{bull_threshold}|BEAR:{bear_threshold}'
+    timings = {'loop':[], 'numpy':[]}
+    with TemporaryDirectory() as data_path:
+        paths = []
+        for engine in timings:
+            for end_row in [num_rows - 2 * 4500, num_rows]: # fresh, then resumed after two weeks of new rows
+                coin = scored_coin(f'{data_path}/{engine}', historical_DF, end_row)
+                start = perf_counter()
+                paths.append(coin.generate_look_ahead_gains('FIXUSDT', [], threshold, engine=engine))
+                timings[engine].append(perf_counter() - start)
+        identical = cmp(paths[1], paths[3], shallow=False)
+        with open(paths[3], 'r') as f:
+            num_peaks = sum(1 for _ in csv.reader(f)) - 1
+
+    print(f'{years} years of 5m rows ({num_rows} rows), {threshold}: {num_peaks} peaks')
+    for run, label in enumerate(['fresh', 'resumed']):
+        print(f"{label}: loop engine: {timings['loop'][run]:.2f}s | numpy engine: {timings['numpy'][run]:.2f}s | "
+              f"speed up: {timings['loop'][run] / timings['numpy'][run]:.1f}x")
+    print(f'look_ahead_gains csv identical: {identical}')
+    return identical
+
+
+if __name__ == "__main__":
+    # Example: <python3 look_ahead.py 3>
+    sys.exit(0 if benchmark_engines(int(sys.argv[1]) if len(sys.argv) > 1 else 3) else 1)
@@ -0,0 +1,315 @@
+from email.message import EmailMessage
+from tempfile import TemporaryDirectory
+from threading import Thread, Condition
+from time import monotonic, perf_counter, sleep, time_ns
+from collections import deque
+from glob import glob
+from utility import atomic_file
+from message_bus import Mail
+from enums import MAIL_WORKERS, MAIL_BATCH_WINDOW, MAIL_MIN_INTERVAL, MAIL_SMTP_HOST, MAIL_SMTP_PORT, MAIL_SENDER
+import mimetypes
+import subprocess
+import smtplib
+import json
+import sys
+import os
+
+'''
+Outbound mail queue of the notification server, which sends the Mail published by server users on a pool of workers.
+
+Every queued Mail is spooled to a json file until it has been sent, so mail queued before a server restart is sent
+once a MailQueue starts on the same spool folder. Mails to a recipient are batched: a recipient is sent at most one
+mail per MAIL_MIN_INTERVAL seconds, and waits MAIL_BATCH_WINDOW seconds after its first queued mail, so a burst of
+signals becomes one digest (titles and details of every mail, all attachments) instead of a mail per signal.
+A failed send is retried with exponential backoff, later mails to the recipient join the retried digest.
+
+The transport is pluggable, with send(mail) raising on failure:
+    ScriptTransport(script_path), notification_scripts/send_mail.sh (mail via the postfix relay of notification_init)
+    SmtpTransport(host, port), direct SMTP, e.g. to a local debug server: <python3 -m smtpd -n -c DebuggingServer localhost:1025>
+    FileTransport(path), writes every mail as a .eml file
+See create_transport.
+
+Measure throughput and latency under a burst of signals with: <python3 mail_queue.py [SIGNALS] [USERS] [WORKERS]>
+'''
+
+
+class ScriptTransport():
+    '''
+    Sends mail with send_mail.sh (arguments user, title, details, files)
+    '''
+
+    def __init__(self, script_path):
+
+        self.script_path = script_path
+
+
+    def send(self, mail):
+        sendmail_process = subprocess.run([self.script_path, *mail])
+        if sendmail_process.returncode != 0:
+            raise OSError(f'{self.script_path} returned exit {sendmail_process.returncode}')
+
+
+def mail_message(mail, sender=MAIL_SENDER):
+    '''
+    Returns mail as an EmailMessage, details lines are separated by '#' like send_mail.sh
+    '''
+
+    message = EmailMessage()
+    message['From'] = sender
+    message['To'] = mail.user
+    message['Subject'] = mail.title
+    message.set_content(mail.details.replace('#', '\n'))
+    for path in [path for path in mail.files.split(',') if path]:
+        maintype, subtype = (mimetypes.guess_type(path)[0] or 'application/octet-stream').split('/')
+        with open(path, 'rb') as attachment:
+            message.add_attachment(attachment.read(), maintype=maintype, subtype=subtype, filename=os.path.basename(path))
+    return message
+
+
+class SmtpTransport():
+    '''
+    Sends mail directly to an SMTP server
+    '''
+
+    def __init__(self, host=MAIL_SMTP_HOST, port=MAIL_SMTP_PORT, sender=MAIL_SENDER, timeout=30):
+
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.timeout = timeout
+
+
+    def send(self, mail):
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            smtp.send_message(mail_message(mail, self.sender))
+
+
+class FileTransport():
+    '''
+    Writes every mail as a .eml file into path
+    '''
+
+    def __init__(self, path, sender=MAIL_SENDER):
+
+        self.path = path
+        self.sender = sender
+        os.makedirs(path, exist_ok=True)
+
+
+    def send(self, mail):
+        with atomic_file(f'{self.path}/{time_ns()}_{mail.user}.eml', 'wb') as f:
+            f.write(bytes(mail_message(mail, self.sender)))
+
+
+def create_transport(name, script_path, sink_path):
+    '''
+    Returns the transport called name: 'script' (send_mail.sh in script_path), 'smtp' or 'file' (into sink_path)
+    '''
+
+    if name == 'script':
+        return ScriptTransport(f'{script_path}/send_mail.sh')
+    elif name == 'smtp':
+        return SmtpTransport()
+    elif name == 'file':
+        return FileTransport(sink_path)
+    raise ValueError(f'Unknown mail transport {name}, either script, smtp or file')
+
+
+def digest(mails):
+    '''
+    Returns one Mail holding every mail of a recipient
+    '''
+
+    if len(mails) == 1:
+        return mails[0]
+    title = f'{len(mails)} notifications: ' + ', '.join(dict.fromkeys(mail.title for mail in mails))
+    details = '##'.join(f'{mail.title}#{mail.details}' for mail in mails)
+    files = ','.join(dict.fromkeys(path for mail in mails for path in mail.files.split(',') if path))
+    return Mail(mails[0].user, title, details, files)
+
+
+class MailQueue():
+    '''
+    Durable outbound mail queue, batching mails per recipient within a send rate limit
+    '''
+
+    def __init__(self, transport, spool_path, num_workers=MAIL_WORKERS, batch_window=MAIL_BATCH_WINDOW,
+                 min_interval=MAIL_MIN_INTERVAL, max_retries=5, backoff=2, max_backoff=300):
+
+        self.transport = transport
+        self.spool_path = spool_path
+        self.batch_window = batch_window # seconds a recipient's first queued mail waits for more
+        self.min_interval = min_interval # min seconds between two mails to a recipient
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.pending = {} # user: [(queued time, spool file, mail)]
+        self.due = {} # user: monotonic time its pending mails are sent
+        self.sending = set() # users of which a worker is sending a digest
+        self.next_allowed = {} # user: monotonic time of its next allowed send
+        self.attempts = {} # user: failed sends of its current digest
+        self.num_spooled = 0
+        self.sent, self.digests, self.retries, self.failed = 0, 0, 0, 0
+        self.latencies = deque(maxlen=1000) # seconds from queued to sent of recent sent mails
+        self.condition = Condition()
+        os.makedirs(spool_path, exist_ok=True)
+        for spool_file in sorted(glob(f'{spool_path}/*.json')): # mail queued before a restart
+            with open(spool_file) as f:
+                self.add(Mail(*json.load(f)), spool_file)
+        for number in range(num_workers):
+            Thread(target=self.run, name=f'mail_worker_{number}', daemon=True).start()
+
+
+    def put(self, mail):
+        '''
+        Spools and queues mail, returns without waiting for it to be sent
+        '''
+
+        with self.condition:
+            self.num_spooled += 1
+            spool_file = f'{self.spool_path}/{time_ns()}_{self.num_spooled:06d}.json'
+        with atomic_file(spool_file) as f:
+            json.dump(list(mail), f)
+        self.add(mail, spool_file)
+
+
+    def add(self, mail, spool_file):
+        with self.condition:
+            self.pending.setdefault(mail.user, []).append((monotonic(), spool_file, mail))
+            self.schedule(mail.user, self.batch_window)
+
+
+    def schedule(self, user, delay):
+        '''
+        Sets when the pending mails of user are sent, unless already set or being sent (call with the condition held)
+        '''
+
+        if user in self.pending and user not in self.due and user not in self.sending:
+            self.due[user] = max(monotonic() + delay, self.next_allowed.get(user, 0))
+            self.condition.notify()
+
+
+    def run(self):
+        while True:
+            with self.condition:
+                while True:
+                    user = min(self.due, key=self.due.get, default=None)
+                    if user is not None and self.due[user] <= monotonic():
+                        break
+                    self.condition.wait(None if user is None else self.due[user] - monotonic())
+                self.due.pop(user)
+                batch = self.pending.pop(user)
+                self.sending.add(user)
+            try:
+                self.transport.send(digest([mail for _, _, mail in batch]))
+                error = None
+            except Exception as e:
+                error = e
+            with self.condition:
+                self.sending.discard(user)
+                if error is None:
+                    for _, spool_file, _ in batch:
+                        if os.path.exists(spool_file):
+                            os.remove(spool_file)
+                    self.attempts.pop(user, None)
+                    self.next_allowed[user] = monotonic() + self.min_interval
+                    self.sent += len(batch)
+                    self.digests += 1
+                    self.latencies.extend(monotonic() - queued for queued, _, _ in batch)
+                    self.schedule(user, self.batch_window)
+                elif self.attempts.get(user, 0) < self.max_retries:
+                    self.attempts[user] = self.attempts.get(user, 0) + 1
+                    self.retries += 1
+                    self.pending[user] = batch + self.pending.get(user, []) # later mails join the retried digest
+                    self.schedule(user, min(self.backoff * 2**(self.attempts[user] - 1), self.max_backoff))
+                else:
+                    print(f'Error: {len(batch)} messages for {user} did not send after {self.max_retries} retries: {error!r}')
+                    for _, spool_file, _ in batch:
+                        if os.path.exists(spool_file):
+                            os.replace(spool_file, f'{spool_file}.failed') # kept for inspection, not resent
+                    self.attempts.pop(user, None)
+                    self.failed += len(batch)
+                    self.schedule(user, self.batch_window)
+                self.condition.notify_all()
+
+
+    def join(self, timeout=None):
+        '''
+        Waits until every queued mail was sent or failed, returns whether it did within timeout seconds
+        '''
+
+        end = None if timeout is None else monotonic() + timeout
+        with self.condition:
+            while self.pending or self.sending:
+                if end is not None and end <= monotonic():
+                    return False
+                self.condition.wait(None if end is None else end - monotonic())
+        return True
+
+
+    def stats(self):
+        with self.condition:
+            return {'queued':sum(len(batch) for batch in self.pending.values()), 'sending':len(self.sending), 'sent':self.sent,
+                    'digests':self.digests, 'retries':self.retries, 'failed':self.failed,
+                    'mean_latency':round(sum(self.latencies) / len(self.latencies), 3) if self.latencies else 0,
+                    'max_latency':round(max(self.latencies, default=0), 3)}
+
+
+class BenchmarkTransport(FileTransport):
+    '''
+    FileTransport taking send_time seconds per mail (like a relay round trip) and failing every fail_every'th send
+    '''
+
+    def __init__(self, path, send_time, fail_every):
+
+        super().__init__(path)
+        self.send_time = send_time
+        self.fail_every = fail_every
+        self.sends = 0
+        self.send_times = {} # user: monotonic times of successful sends
+        self.delivered = [] # signal numbers of the sent mails
+
+
+    def send(self, mail):
+        sleep(self.send_time)
+        self.sends += 1
+        if self.fail_every and self.sends % self.fail_every == 0:
+            raise OSError('relay unavailable')
+        super().send(mail)
+        self.send_times.setdefault(mail.user, []).append(monotonic())
+        self.delivered.extend(int(detail.split()[1]) for detail in mail.details.split('#') if detail.startswith('signal '))
+
+
+def benchmark_mail(num_signals=2000, num_users=50, num_workers=4, send_time=0.02, batch_window=0.05, min_interval=0.2):
+    '''
+    Queues a burst of num_signals signal mails over num_users users, sent to a file sink taking send_time per mail which
+    fails every 10th send, and reports throughput and latency. Every signal has to be delivered in exactly one mail,
+    within the per recipient rate limit.
+    '''
+
+    with TemporaryDirectory() as data_path:
+        transport = BenchmarkTransport(f'{data_path}/sent', send_time, fail_every=10)
+        mail_queue = MailQueue(transport, f'{data_path}/spool', num_workers, batch_window, min_interval, backoff=0.01)
+        start = perf_counter()
+        for signal in range(num_signals):
+            mail_queue.put(Mail(f'user{signal % num_users}@gmail.com', f'SIGNAL ALERT: S{signal}', f'signal {signal}#score {signal % 30}', ''))
+        queue_time = perf_counter() - start
+        mail_queue.join()
+        total_time = perf_counter() - start
+        stats = mail_queue.stats()
+        spooled = glob(f'{data_path}/spool/*')
+        num_files = len(glob(f'{data_path}/sent/*.eml'))
+    min_gap = min([later - earlier for times in transport.send_times.values() for earlier, later in zip(times, times[1:])], default=min_interval)
+    correct = sorted(transport.delivered) == list(range(num_signals)) and num_files == stats['digests'] and not spooled and min_gap >= min_interval and not stats['failed']
+
+    print(f'{num_signals} signals for {num_users} users, {num_workers} workers, {send_time * 1000:.0f}ms per send, every 10th send fails')
+    print(f'queued in {queue_time:.3f}s, all sent in {total_time:.3f}s ({num_signals / total_time:.0f} signals/s) '
+          f'as {stats["digests"]} mails, a mail per signal would take {num_signals * send_time / num_workers:.1f}s')
+    print(f'stats: {stats}')
+    print(f'every signal sent once, spool emptied and min {min_gap:.3f}s between mails to a user: {correct}')
+    return correct
+
+
+if __name__ == "__main__":
+    # Example: <python3 mail_queue.py 2000 50 4>
+    sys.exit(0 if benchmark_mail(*[int(arg) for arg in sys.argv[1:4]]) else 1)
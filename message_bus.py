@@ -0,0 +1,161 @@
+from collections import namedtuple
+from queue import Queue, Empty
+from threading import Lock
+import logging
+from enums import MESSAGE_BUS_QUEUE_SIZE
+
+'''
+In-process publish/subscribe bus of the notification server, which replaced the server_messages, mode_1_messages,
+mode_2_messages and outgoing_messages dicts that every thread mutated (and copied) without locks.
+
+Every topic has one message type (a namedtuple, see TOPICS) and publish() rejects any other, so producers and
+consumers agree on the fields. A subscription is a bounded queue of (topic, message) for one or more topics:
+    stdout_messages = bus.subscribe(['current_score', 'signal'], name='server_stdout')
+    bus.publish('signal', Signal(coin, symbol, signal, timestamp, summary))
+    topic, message = stdout_messages.get() # blocks until a message is published
+    messages = stdout_messages.drain() # the rest, without blocking
+Each subscriber gets every message of its topics in publish order. A full subscription blocks publish() until the
+subscriber catches up, so no update is lost or overwritten (unlike setting a dict key twice before it was read),
+and nothing polls: consumers sleep in get().
+
+BusLogHandler publishes log records on the 'log' topic, so modules running threads outside the server (e.g. the kline
+stream) report through the server stdout rather than printing over a user's input prompt.
+'''
+
+MonitoringsAdded = namedtuple('MonitoringsAdded', ['added', 'invalid_syntax', 'invalid_timeframe', 'binance_exceptions'])
+ItemsRemoved = namedtuple('ItemsRemoved', ['dropped', 'initial_queries'])
+StdoutRequest = namedtuple('StdoutRequest', ['kind']) # 'score', 'monitoring', 'clear_signals' or 'resume'
+ScoreUpdate = namedtuple('ScoreUpdate', ['coin', 'symbol', 'summary'])
+Signal = namedtuple('Signal', ['coin', 'symbol', 'signal', 'timestamp', 'summary'])
+LatestSignals = namedtuple('LatestSignals', ['signal_stats']) # {symbol: Coin.get_latest_signal_stats}
+ResultFile = namedtuple('ResultFile', ['kind', 'symbol', 'path']) # kind of Notification_server.RESULT_FILE_TITLES
+UpdateMessage = namedtuple('UpdateMessage', ['gmail', 'message']) # mode 2 message of a user
+Mail = namedtuple('Mail', ['user', 'title', 'details', 'files']) # arguments of send_mail.sh
+LogMessage = namedtuple('LogMessage', ['level', 'name', 'text']) # a formatted logging record
+
+TOPICS = {
+    'new_monitorings': MonitoringsAdded,
+    'removed_items': ItemsRemoved,
+    'stdout_request': StdoutRequest,
+    'current_score': ScoreUpdate,
+    'signal': Signal,
+    'latest_signals': LatestSignals,
+    'result_file': ResultFile,
+    'mode_2': UpdateMessage,
+    'outgoing_mail': Mail,
+    'log': LogMessage
+}
+
+
+class Subscription():
+    '''
+    Bounded queue of the (topic, message) published on given topics
+    '''
+
+    def __init__(self, topics, maxsize, name=''):
+
+        self.topics = list(topics)
+        self.name = name
+        self.queue = Queue(maxsize)
+
+
+    def get(self, timeout=None):
+        '''
+        Returns the next (topic, message), blocks until one is published (raises queue.Empty after timeout seconds)
+        '''
+
+        return self.queue.get(timeout=timeout)
+
+
+    def drain(self):
+        '''
+        Returns every queued (topic, message) without blocking
+        '''
+
+        messages = []
+        while True:
+            try:
+                messages.append(self.queue.get_nowait())
+            except Empty:
+                return messages
+
+
+class MessageBus():
+    '''
+    Thread-safe publish/subscribe of typed topics
+    '''
+
+    def __init__(self, topics=TOPICS, maxsize=MESSAGE_BUS_QUEUE_SIZE):
+
+        self.topics = topics # topic: message type
+        self.maxsize = maxsize # default bound of a subscription
+        self.subscriptions = {topic:[] for topic in topics}
+        self.published = {topic:0 for topic in topics}
+        self.lock = Lock()
+
+
+    def subscribe(self, topics, maxsize=None, name=''):
+        '''
+        Returns a Subscription receiving every message published on topics from now on
+        '''
+
+        unknown = [topic for topic in topics if topic not in self.topics]
+        if unknown:
+            raise ValueError(f'Unknown message bus topics {unknown}')
+        subscription = Subscription(topics, maxsize or self.maxsize, name)
+        with self.lock:
+            for topic in subscription.topics:
+                self.subscriptions[topic].append(subscription)
+        return subscription
+
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            for topic in subscription.topics:
+                if subscription in self.subscriptions[topic]:
+                    self.subscriptions[topic].remove(subscription)
+
+
+    def publish(self, topic, message):
+        '''
+        Queues message for every subscriber of topic, blocking while a subscriber's queue is full
+        '''
+
+        if topic not in self.topics:
+            raise ValueError(f'Unknown message bus topic {topic}')
+        if not isinstance(message, self.topics[topic]):
+            raise ValueError(f'{topic} messages are {self.topics[topic].__name__}, not {type(message).__name__}')
+        with self.lock:
+            subscriptions = list(self.subscriptions[topic])
+            self.published[topic] += 1
+        for subscription in subscriptions:
+            subscription.queue.put((topic, message)) # outside the lock, a full queue only blocks this publisher
+
+
+    def stats(self):
+        '''
+        Returns the number of messages published per topic and the queue depth of each subscription
+        '''
+
+        with self.lock:
+            subscriptions = {subscription for topic in self.subscriptions for subscription in self.subscriptions[topic]}
+            return {'published':dict(self.published),
+                    'queued':{subscription.name or str(id(subscription)):subscription.queue.qsize() for subscription in subscriptions}}
+
+
+class BusLogHandler(logging.Handler):
+    '''
+    Logging handler publishing every record on the 'log' topic of a bus
+    '''
+
+    def __init__(self, bus, level=logging.INFO):
+
+        super().__init__(level)
+        self.bus = bus
+
+
+    def emit(self, record):
+        try:
+            self.bus.publish('log', LogMessage(record.levelname, record.name, self.format(record)))
+        except Exception:
+            self.handleError(record)
@@ -1,10 +1,17 @@
-from threading import Thread, Event, enumerate as list_threads
-from get_candles import Coin
+from threading import Thread, Event, Lock, enumerate as list_threads
+from scheduler import Scheduler
+from worker_pool import WorkerPool
+from mail_queue import MailQueue, create_transport
+from message_bus import (MessageBus, MonitoringsAdded, ItemsRemoved, StdoutRequest, ScoreUpdate, Signal, LatestSignals,
+                         ResultFile, UpdateMessage, Mail, BusLogHandler)
+from config import candle_cache, live_score_cache, cut_point_tables
+from candle_store import CANDLE_STORES
 from utility import get_filename_extension
-from enums import INTERVALS, DEFAULT_TIMEFRAMES, STANDARD_TRADING_PAIRS
+from enums import INTERVALS, DEFAULT_TIMEFRAMES, STANDARD_TRADING_PAIRS, CANDLE_STORAGE, MONITOR_WORKERS, MAIL_TRANSPORT, MAIL_CHECK_INTERVAL
 from datetime import datetime
 from glob import glob
 import subprocess
+import logging
 import time
 import json
 import sys
@@ -31,7 +38,14 @@ class Notification_server():
     '''
 
     # Server enums
-    SERVER_SPEED = 2 # Deafult server tick speed 2 seconds.
+    STDOUT_TOPICS = ['new_monitorings', 'removed_items', 'stdout_request', 'current_score', 'signal', 'latest_signals', 'result_file', 'log']
+    RESULT_FILE_TITLES = {
+        'retain_score': 'Retain scoring summary',
+        'graph_trend': 'Trend graph',
+        'graph_lookahead': 'Look ahead graph',
+        'graph_PA': 'PA and signal graph',
+        'graph_trade_simulation': 'Trade simulation'
+    }
     REQUEST_INTERVAL = 60 # Deafult server Binance candle request interval.
     BULL_THRESHOLD = 25 # Deafult thresholds before notification sent. Each user can set their own threshold under their attributes. (eventually implement ML)
     BEAR_THRESHOLD = 25 # Eventually will make both of these dicts with keys as coins, value as threshold.
@@ -47,9 +61,20 @@ class Notification_server():
         # TODO make all methods have types and return types
         # TODO make all methods be either private or public, I think make the static methods part of utilities
 
-        self.tickspeed_handler = Event() # Event object to handle server tick speed. 
         self.server_shutdown = Event() # Event object to handle server shutdown if command 'quit' is entered.
-        self.tickspeed_handler.set()
+        self.scheduler = Scheduler() # Timers of periodic server work (see scheduler.py).
+        self.coin_pool = WorkerPool(MONITOR_WORKERS) # Runs the refresh and drop jobs of every coin (see worker_pool.py).
+        self.coin_registry = {} # Coins with jobs on coin_pool, e.g. {'BTC': {'added': datetime, 'refresh_queued': False, 'refreshes': 3, 'last_refresh': datetime}}
+        self.registry_lock = Lock() # Guards coin_registry and counters updated by concurrent coin jobs.
+        self.bus = MessageBus() # Messages between the server threads (see message_bus.py).
+        logging.getLogger().addHandler(BusLogHandler(self.bus)) # Logs of background modules (e.g. kline stream) print via server_stdout.
+        self.stdout_messages = self.bus.subscribe(self.STDOUT_TOPICS, name='server_stdout') # Read by server_stdout thread.
+        self.outgoing_mail = None # Read by notification_send_gmail thread once notifications commence.
+        self.mail_queue = None # Sends outgoing mail once notifications commence.
+        self.mail_check_timer = None # Scheduler timer checking for mailed user instructions once notifications commence.
+        self.stdout_resumed = Event() # Cleared while stdout is paused for user interaction.
+        self.stdout_resumed.set()
+        self.mode_2_ready = Event() # Set once every coin has refreshed since the latest mode 2 request.
         self.root_path = os.path.dirname(os.path.realpath(__file__))
         self.data_path = self.root_path + '/coindata'
         self.script_path = self.root_path + '/notification_scripts'
@@ -57,33 +82,12 @@ class Notification_server():
         self.monitored_coins = {} # Coins server is currently monitoring {coin: symbol: [timeframe, timeframe...], coin2: symbol1: [...]}
         self.coin_objs = {} # E.g. {'btc': btc_obj, 'rvn': rvn_obj}
         self.server_instruction = {
-            'to_drop': {'item':''},
             "stdout": 0,
             'stdout_detail': 0,
-            'request_interval': [],
             'pause_stdout': 0,
-            'boost': 0,
-            'score': 0,
             'new_user': ''
         }      
-        self.server_messages = {
-            'current_monitoring':0,
-            'removed_items':{},
-            'new_monitorings':{},
-            'current_score':{},
-            'signals':{},
-            'lastest_signals':{},
-            'retain_score':[],
-            'graph_trend':[],
-            'graph_lookahead':[],
-            'graph_PA':[],
-            'graph_trade_simulation':[],
-            'graph_binance_scan':''
-        }
         self.server_users = {} # Keeps track of server users and their attributes (coins, update_intervals, thresholds, previlages). 
-        self.mode_1_messages = {} # Stores mode 1 (signal) like messages for server_user thread to read/send.
-        self.mode_2_messages = {} # Stores mode 2 (update) like messages for server_user thread to read/send.
-        self.outgoing_messages = {} # Stores messages from all users which get seqentially delivered to each respective user email
         self.postfix_init = False
         self.server_owner_gmail = ''
 
@@ -91,8 +95,7 @@ class Notification_server():
             os.mkdir(self.data_path) # This acts like a database to store all users coins and anaylsis.
         self.server_welcome()
         self.monitor_all_coins(to_monitor=to_monitor) # if nothing entered, all coins in db are monitored
-        Thread(target=self.server_tick_speed, name='server_tick', daemon=True).start() # Global server tick speed.
-        Thread(target=self.request_interval_handler, name='server_intervals', daemon=True).start() # Global server timer for sending candle requests.
+        self.request_timer = self.scheduler.call_every(self.REQUEST_INTERVAL, self.request_interval_handler, first_delay=0) # Global server timer for sending candle requests.
         Thread(target=self.server_stdout, name='server_stdout', daemon=True).start() # Handles smooth server stdout. 
         Thread(target=self.server_user_stdinput, name='server_input', daemon=True).start() # Ready server to intake user inputs
 
@@ -120,7 +123,6 @@ class Notification_server():
         print(f"<trend COIN X INTERVAL>: Enter which coin and X many past score reads at a given INTERVAL you want to see.")
         print(f"<graph COIN TYPE>: Enter which coin you want to see a summary of, either bar or line type.")
         print(f"<stdout>: Toggles server stdout between periodic and OFF - server starts off in OFF state.")
-        print(f"<server_speed>: Allows user to modify server tick speed.")
         print(f"<request_interval>: Allows user to modify server communication interval with Binance for candle retreival (deafult 1 minute).")
         print(f"<notify>: Starts up the server notification mailing service. If first time, this will start the initialisation process.")
         print(f"<quit>: Shuts down server activity.")
@@ -140,7 +142,7 @@ class Notification_server():
             elif user_input == 'quit':
                 self.shutdown_server()
             elif user_input == 'score':
-                self.server_instruction['score'] = 1
+                self.bus.publish('stdout_request', StdoutRequest('score'))
             elif user_input == 'trend':
                 Thread(target=self.get_trend_graph(), name='get_trends', daemon=True).start()
             elif user_input == 'retain':
@@ -150,17 +152,15 @@ class Notification_server():
             elif user_input == 'signals':
                 self.get_latest_signals()
             elif user_input == 'clear signals':
-                self.server_messages['signals'] = {}
+                self.bus.publish('stdout_request', StdoutRequest('clear_signals'))
             elif user_input == 'stdout':
                 self.toggle_stdout()
             elif user_input == 'stdout_detail':
                 self.toggle_stdout_detail()                    
             elif user_input == 'request_interval':
                 self.update_timers('request_interval')
-            elif user_input == 'server_speed':
-                self.update_timers('server_speed')
             elif user_input == 'monitoring':
-                self.server_messages['current_monitoring'] = 1
+                self.bus.publish('stdout_request', StdoutRequest('monitoring'))
             elif user_input == 'monitor':
                 self.monitor_new_coin()
             elif user_input == 'all':
@@ -208,24 +208,25 @@ class Notification_server():
         print('Or to specify single timeframes to monitor, use `ETHBTC_1d`')
         print('Example: `RVN INJBTC ETHUSDT_4h DOGE XRPBTC_3d DOTUSDT[4h,3d,1w,1M]`')
         print('Seperate entries by space.\n')
-        self.server_instruction['pause_stdout'] = 1 # Stops all server stdout for cleaner user interaction.
+        self.set_stdout_pause(True) # Stops all server stdout for cleaner user interaction.
 
         to_monitor = set(input('To monitor >>> ').split())
-        self.server_instruction['pause_stdout'] = 0 # Unpause server stdout.
+        self.set_stdout_pause(False) # Unpause server stdout.
         Thread(target=self.add_to_monitoring, args=(to_monitor,), daemon=True).start()
-        # self.create_coin_threads(Thread(target=self.add_to_monitoring, args=(to_monitor,), daemon=True).start()) # verify input and make new coin threads
 
 
-    def create_coin_threads(self, added_coins):
+    def register_coins(self, added_coins):
         '''
-            Handles creating new coin threads if they are currently not being monitored by server
+            Handles registering new coins for coin_pool jobs if they are currently not being monitored by server
         '''
 
         print(f'added coins were: {added_coins}')
         for coin in added_coins:
-            if not [thread for thread in list_threads() if str(thread).split(',')[0].split('(')[1] == coin]:
-                # Means server is not currently monitoring this coin, so start new thread. 
-                Thread(target=self.monitored_coin, name=coin, args=(coin,), daemon=True).start()
+            if coin not in self.coin_registry:
+                # Means server is not currently monitoring this coin, its jobs start with the next request interval.
+                print(f'new coin ------------------ {coin} ----------------------')
+                with self.registry_lock:
+                    self.coin_registry[coin] = {'added':datetime.now(), 'refresh_queued':False, 'refreshes':0, 'last_refresh':None}
 
 
     def drop_coins(self):
@@ -241,10 +242,10 @@ class Notification_server():
         print('Entering a symbol_timeframe drops only that symbol_timeframe.')
         print('Example: `RVN INJBTC ETHUSDT_4h DOGE-drop XRPBTC_3d-drop`')
         print('Seperate entries by space.\n')
-        self.server_instruction['pause_stdout'] = 1 # Stops all server stdout for cleaner user interaction.
+        self.set_stdout_pause(True) # Stops all server stdout for cleaner user interaction.
 
         to_drop = set(input('To drop >>> ').split())
-        self.server_instruction['pause_stdout'] = 0 # Unpause server stdout.
+        self.set_stdout_pause(False) # Unpause server stdout.
         Thread(target=self.handle_coin_drop, args=(to_drop,), daemon=True).start()
 
 
@@ -253,20 +254,20 @@ class Notification_server():
             Handles removing given coin/tradingpair/timeframe from Server monitoring or database
         '''
 
-        Thread(target=self.boost_speed, args=(0.5,), daemon=True).start() # Temporarily boost server speed for faster processing. 
         print(f'to_drop is: {to_drop}')
 
-        # self.server_messages['removed_items'] = {'to_drop':to_drop.copy(), 'initial_queries':to_drop.copy(), 'completed':0}
-        self.server_messages['removed_items'] = {'dropped':set(), 'initial_queries':to_drop.copy(), 'completed':0}
+        drop_jobs = []
         for query in to_drop:
             drop_from_db = True if '-drop' in query else False
             query = query.replace('-drop', '')
             query = query.upper() if '_' not in query else f'{query.split("_")[0].upper()}_{query.split("_")[-1]}' # safeguard
-            self.server_instruction['to_drop'] = {'item':query, 'drop_db':drop_from_db}
-            while self.server_instruction['to_drop']['item']:
-                self.tickspeed_handler.wait()
-        self.server_instruction['boost'] = 0 # Turn off boost thread.
-        self.server_messages['removed_items']['completed'] = 1
+            coin = next((coin for coin in list(self.coin_registry) if coin in query), None) # registered coin within query
+            if coin:
+                drop_jobs.append(self.coin_pool.submit(coin, self.drop_from_coin, coin, {'item':query, 'drop_db':drop_from_db}))
+        # Drops of different coins run concurrently, drops of a coin in the order entered.
+        dropped = {job.result() for job in drop_jobs if not job.exception()}
+        dropped.discard(None)
+        self.bus.publish('removed_items', ItemsRemoved(dropped, to_drop.copy()))
 
 
     def add_to_monitoring(self, to_monitor): # TODO private
@@ -274,16 +275,17 @@ class Notification_server():
             Handles validating and adding coins, symbols or symbol_timeframes into the server monitoring and database
             An example input could be complex like `RVN INJBTC ETHUSDT_4h DOGE XRPBTC_3d, DOTUSDT[30m, 1h, 4h, 1w]`
         '''
+        from get_candles import Coin # Deferred past the welcome prompt, loads pandas and the binance package (see profile_startup)
+
         print(f'add_to_monitoring called +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++')
-        self.server_messages['new_monitorings'] = {
+        new_monitorings = {
             'added':set(),
             'invalid_syntax':set(),
             'invalid_timeframe':set(),
-            'binance_exceptions':set(),
-            'completed':0
+            'binance_exceptions':set()
         }
         print(f'to_monitor: {to_monitor}')
-        processed_to_monitor = self.process_to_monitor_query(to_monitor)
+        processed_to_monitor = self.process_to_monitor_query(to_monitor, new_monitorings)
         print(f'to_monitor processed: {processed_to_monitor}')
 
         validated_added_coins = set()
@@ -301,13 +303,13 @@ class Notification_server():
                     if f'{symbol}_{timeframe}' not in self.get_stored_symbol_timeframes(): # new timeframe not in db
                         Coin(coin).get_candles(tradingpair, [timeframe]) # we know symbol is valid with Binance
             elif not tradingpair and not Coin(coin).get_candles(tradingpair:='USDT', timeframes:=DEFAULT_TIMEFRAMES):
-                self.server_messages['new_monitorings']['binance_exceptions'].add(item)
+                new_monitorings['binance_exceptions'].add(item)
                 continue # rejected by Binance, invalid coin
             elif not timeframes and not Coin(coin).get_candles(tradingpair, timeframes:=DEFAULT_TIMEFRAMES):
-                self.server_messages['new_monitorings']['binance_exceptions'].add(item)
+                new_monitorings['binance_exceptions'].add(item)
                 continue # rejected by Binance, invalid coin or tradingpair
             elif not Coin(coin).get_candles(tradingpair, timeframes):
-                self.server_messages['new_monitorings']['binance_exceptions'].add(item)
+                new_monitorings['binance_exceptions'].add(item)
                 continue # rejected by Binance, invalid coin or tradingpair
 
             symbol = symbol if symbol else f'{coin}{tradingpair}'
@@ -320,19 +322,18 @@ class Notification_server():
             else:
                 self.coin_objs[coin] = Coin(coin)
                 self.monitored_coins[coin] = {symbol:timeframes}
-            print(f"input was: {coin, tradingpair, symbol, timeframes}, adding :{item} to monitoring: {self.server_messages['new_monitorings']['added']}")
-            self.server_messages['new_monitorings']['added'].add(item)
+            print(f"input was: {coin, tradingpair, symbol, timeframes}, adding :{item} to monitoring: {new_monitorings['added']}")
+            new_monitorings['added'].add(item)
             validated_added_coins.add(coin)
         
-        self.server_messages['new_monitorings']['completed'] = 1
-        print(f'self.server_messages is: {self.server_messages}')
-        self.create_coin_threads(validated_added_coins)
+        self.bus.publish('new_monitorings', MonitoringsAdded(**new_monitorings))
+        self.register_coins(validated_added_coins)
         # return added_coins # Return succesfully added coins.
 
 
-    def process_to_monitor_query(self, to_monitor): # TODO private
+    def process_to_monitor_query(self, to_monitor, new_monitorings): # TODO private
         '''
-            Splits query into coin, symbol, tradingpair, timeframes and filters some invalid entires
+            Splits query into coin, symbol, tradingpair, timeframes and filters some invalid entires into new_monitorings
         '''
 
         filtered_to_monitor = {}
@@ -345,7 +346,7 @@ class Notification_server():
                 symbol, timeframe = item.split('_')
                 print(f'item: {item} enters split with: {symbol} : {timeframe}')
                 if timeframe not in INTERVALS:
-                    self.server_messages['new_monitorings']['invalid_timeframe'].add(item)
+                    new_monitorings['invalid_timeframe'].add(item)
                     continue # invalid timeframe
                 timeframes.append(timeframe)
                 item = item[:item.index('_')]
@@ -355,7 +356,7 @@ class Notification_server():
                 timeframes.extend([tf.strip() for tf in item.split('[')[-1][:-1].split(',')])
                 print(f'timeframes is now: {timeframes} and valid: {[timeframe for timeframe in timeframes if timeframe not in INTERVALS]}')
                 if [tf for tf in timeframes if tf not in INTERVALS]:
-                    self.server_messages['new_monitorings']['invalid_timeframe'].add(item)
+                    new_monitorings['invalid_timeframe'].add(item)
                     continue # invalid timeframe present
                 item = item.split('[')[0]
                 print(f'Multiple timeframe split: item now {item}')
@@ -367,7 +368,7 @@ class Notification_server():
                     print(f'item: {item} split into : {coin} and {tradingpair} ==== the split looks like: {item.split(std_tradingpair)}')
                     break
             if not coin and timeframes:
-                self.server_messages['new_monitorings']['invalid_syntax'].add(item)
+                new_monitorings['invalid_syntax'].add(item)
                 continue # Invalid entry, e.g. BTC-30m, must include tradingpair
             elif not coin:
                 coin = item
@@ -376,70 +377,73 @@ class Notification_server():
         return filtered_to_monitor
 
 
-    def monitored_coin(self, coin):
+    def drop_from_coin(self, coin, to_drop):
         '''
-            Thread starts the monitoring and score calculation of given coin. Handles external signals to drop activity
+            Coin job which drops given coin, symbol or symbol_timeframe from monitoring (and database if requested),
+            returns the dropped item or None
         '''
-        print(f'new thread ------------------ {coin} ----------------------')
-        print(f'monitoring:::: {self.monitored_coins}')
+
         coin_obj = self.coin_objs[coin]
-        while True:
-            self.tickspeed_handler.wait() # Releases every server tick.
-
-            # Check to see whether coin needs to be dropped
-            if coin in self.server_instruction['to_drop']['item']:
-                to_drop = self.server_instruction['to_drop']
-                print(f'THREAD: {coin} to_drop: {to_drop}')
-                self.server_instruction['to_drop'] = {'item':''}
-                if to_drop['item'] in self.get_stored_coins():
-                    print(f'drop coin: {to_drop}')
-                    if to_drop['drop_db']:
-                        coin_obj.remove_coin() # Remove from database.
-                    self.monitored_coins.pop(to_drop['item'])
-                    self.server_messages['removed_items']['dropped'].add(to_drop['item'])
-                elif to_drop['item'] in self.get_stored_symbols():
-                    print(f'drop symbol: {to_drop}')
-                    if to_drop['drop_db']:
-                        coin_obj.remove_symbol(to_drop['item'])
-                    self.monitored_coins[coin].pop(to_drop['item'])
-                    self.server_messages['removed_items']['dropped'].add(to_drop['item'])
-                elif to_drop['item'] in self.get_stored_symbol_timeframes():
-                    symbol, timeframe = to_drop['item'].split('_')
-                    print(f'drop timeframe: {symbol}_{timeframe}')
-                    if to_drop['drop_db']:
-                        coin_obj.remove_timeframe(to_drop['item'])
-                    self.monitored_coins[coin][symbol].remove(timeframe)
-                    self.server_messages['removed_items']['dropped'].add(to_drop['item'])
-                if coin not in self.monitored_coins or not self.monitored_coins[coin]:
-                    print(f'dropping thread: {coin}')
-                    return 0 # Drop this coin thread.
-
-            # Check to see whether request timer has activated.
-            # if coin in self.server_instruction['request_interval']:
-            #     self.server_instruction['request_interval'].remove(coin) # Let's request_interval thread know which coins have started scoring.
-            #     for symbol in self.monitored_coins[coin]:
-            #         score_summary = coin_obj.current_score(symbol, self.monitored_coins[coin][symbol])
-            #         signal = score_summary[4]
-            #         if coin in self.server_instruction['to_drop']['to_drop']:
-            #             continue # If user just entered coin to drop when score already processed.
-            #         if symbol not in self.server_messages['current_score']:
-            #             self.server_messages['current_score'][symbol] = score_summary
-            #         if signal:
-            #             self.server_messages['signals'][symbol] = [
-            #                 signal,
-            #                 datetime.now().strftime("%I:%M %p"),
-            #                 score_summary
-            #             ]
-
-            #         try:
-            #             if self.mode_1_messages[coin] and not self.server_instruction['new_user']:
-            #                 self.mode_1_messages.pop(coin) # To prevent recuring posting of mode1 type messages.
-            #         except KeyError:
-            #             pass
-
-                if self.MODE_2_REQUEST:
-                    # coin_obj.generate_result_files(mode='update')
-                    self.MODE_2_REQUEST -= 1 # Once the value becomes zero, any user thread which is ready will send a mode 2 email.
+        dropped = None
+        print(f'JOB: {coin} to_drop: {to_drop}')
+        if to_drop['item'] in self.get_stored_coins():
+            print(f'drop coin: {to_drop}')
+            if to_drop['drop_db']:
+                coin_obj.remove_coin() # Remove from database.
+            self.monitored_coins.pop(to_drop['item'])
+            dropped = to_drop['item']
+        elif to_drop['item'] in self.get_stored_symbols():
+            print(f'drop symbol: {to_drop}')
+            if to_drop['drop_db']:
+                coin_obj.remove_symbol(to_drop['item'])
+            self.monitored_coins[coin].pop(to_drop['item'])
+            dropped = to_drop['item']
+        elif to_drop['item'] in self.get_stored_symbol_timeframes():
+            symbol, timeframe = to_drop['item'].split('_')
+            print(f'drop timeframe: {symbol}_{timeframe}')
+            if to_drop['drop_db']:
+                coin_obj.remove_timeframe(to_drop['item'])
+            self.monitored_coins[coin][symbol].remove(timeframe)
+            dropped = to_drop['item']
+        if coin not in self.monitored_coins or not self.monitored_coins[coin]:
+            print(f'dropping coin: {coin}')
+            with self.registry_lock:
+                self.coin_registry.pop(coin, None) # No more jobs are queued for this coin.
+        return dropped
+
+
+    def refresh_coin(self, coin):
+        '''
+            Coin job queued every request interval, starts the score calculation of given coin
+        '''
+
+        with self.registry_lock:
+            if coin not in self.coin_registry:
+                return # Dropped while this job was queued.
+            self.coin_registry[coin]['refresh_queued'] = False # Let's request_interval timer know this coin has started scoring.
+            self.coin_registry[coin]['refreshes'] += 1
+            self.coin_registry[coin]['last_refresh'] = datetime.now()
+            monitored_symbols = {symbol:list(timeframes) for symbol, timeframes in self.monitored_coins.get(coin, {}).items()}
+        coin_obj = self.coin_objs[coin]
+        for symbol, timeframes in monitored_symbols.items():
+            try:
+                score_summary = coin_obj.current_score(symbol, timeframes) # Shared with every consumer of this tick (see live_score_cache.py).
+            except Exception as e:
+                print(f'Error: current score of {symbol} raised {e!r}')
+                continue
+            if symbol not in self.monitored_coins.get(coin, {}):
+                continue # If user just dropped symbol when score already processed.
+            self.bus.publish('current_score', ScoreUpdate(coin, symbol, score_summary))
+            signal = score_summary[4]
+            if signal:
+                self.bus.publish('signal', Signal(coin, symbol, signal, datetime.now().strftime("%I:%M %p"), score_summary))
+
+        with self.registry_lock:
+            if self.MODE_2_REQUEST:
+                # coin_obj.generate_result_files(mode='update')
+                self.MODE_2_REQUEST -= 1 # Once the value becomes zero, any user thread which is ready will send a mode 2 email.
+                if not self.MODE_2_REQUEST:
+                    self.mode_2_ready.set()
 
 
     def get_retain_scoring(self):
@@ -451,7 +455,7 @@ class Notification_server():
             return
 
         path = self.coin_objs[self.find_coin(symbol)].generate_retain_score(symbol, self.monitored_coins[symbol])
-        self.server_messages['retain_score'] = [symbol, path]
+        self.bus.publish('result_file', ResultFile('retain_score', symbol, path))
 
 
     def get_latest_signals(self):
@@ -463,8 +467,7 @@ class Notification_server():
         for coin in self.monitored_coins:
             for symbol in self.monitored_coins[coin]:
                 signal_stats[symbol] = self.coin_objs[coin].get_latest_signal_stats(symbol)
-        for symbol in signal_stats:
-            self.server_messages['lastest_signals'][symbol] = signal_stats[symbol]
+        self.bus.publish('latest_signals', LatestSignals(signal_stats))
 
 
     def get_trend_graph(self, advanced=False):
@@ -477,7 +480,7 @@ class Notification_server():
             return
 
         path = self.coin_objs[self.find_coin(symbol)].graph_trend(symbol, self.monitored_coins[symbol])
-        self.server_messages['graph_trend'] = [symbol, path]
+        self.bus.publish('result_file', ResultFile('graph_trend', symbol, path))
 
 
     def get_look_ahead_graph(self):
@@ -489,7 +492,7 @@ class Notification_server():
             return
 
         path = self.coin_objs[self.find_coin(symbol)].graph_look_ahead_data(symbol, self.monitored_coins[symbol])
-        self.server_messages['graph_lookahead'] = [symbol, path]
+        self.bus.publish('result_file', ResultFile('graph_lookahead', symbol, path))
 
     
     def get_trading_simulation_graph(self):
@@ -500,7 +503,7 @@ class Notification_server():
             return
 
         path = self.coin_objs[self.find_coin(symbol)].graph_trading_simulation(symbol, self.monitored_coins[symbol])
-        self.server_messages['graph_trade_simulation'] = [symbol, path]
+        self.bus.publish('result_file', ResultFile('graph_trade_simulation', symbol, path))
 
     
     def get_pa_signal_graph(self):
@@ -511,67 +514,71 @@ class Notification_server():
             return
 
         path = self.coin_objs[self.find_coin(symbol)].graph_signal_against_pa(symbol, self.monitored_coins[symbol])
-        self.server_messages['graph_PA'] = [symbol, path]
+        self.bus.publish('result_file', ResultFile('graph_PA', symbol, path))
 
 
     def server_stdout(self):
-        '''Thread handles server stdout (so that thread stdouts don't overlap)'''
-
+        '''Thread handles server stdout (so that thread stdouts don't overlap), printing the messages published on STDOUT_TOPICS'''
+
+        current_scores = {} # Latest score summary of each symbol since the last score stdout.
+        signals = {} # Printed with every server message until the command 'clear signals'.
+        score_requested = 0
+        new_monitorings, removed_items, result_files, log_messages = [], [], [], [] # Held while stdout is paused.
+        latest_signal_stats = {}
+        current_monitoring = 0
         while True:
-            self.tickspeed_handler.wait() # Releases every server tick.
-            while True:
-                if self.server_instruction['pause_stdout']:
-                    time.sleep(1)
-                    continue
-                break
-
-            new_messages = [m_type for m_type in self.server_messages if self.server_messages[m_type]
-                        and m_type not in ['current_score', 'removed_items', 'new_monitorings']]
-
-            if len(self.server_messages['current_score']) == sum([len(self.monitored_coins[coin]) for coin in self.monitored_coins]):
-                if self.server_instruction['stdout']:
-                    self.server_instruction['score'] = 1 
-                if self.server_instruction['score']: # Can be turned on via user input also.
-                    new_messages.append('score_ready') # Only stdout when all symbol scores have been calculated
-            
-            if self.server_messages['removed_items']:
-                if self.server_messages['removed_items']['completed']:
-                    new_messages.append('remove_msg_ready')
-            
-            if self.server_messages['new_monitorings']:
-                if self.server_messages['new_monitorings']['completed']:
-                    new_messages.append('monitoring_msg_ready')
-            print(f'new_messages now: {new_messages}***********************************')
-            if new_messages:
+            messages = [self.stdout_messages.get()] # Sleeps until new server messages are published.
+            messages.extend(self.stdout_messages.drain()) # Read while paused too, so publishers never wait on a full subscription.
+            for topic, message in messages:
+                if topic == 'new_monitorings':
+                    new_monitorings.append(message)
+                elif topic == 'removed_items':
+                    removed_items.append(message)
+                elif topic == 'current_score':
+                    current_scores[message.symbol] = message.summary
+                elif topic == 'signal':
+                    signals[message.symbol] = [message.signal, message.timestamp, message.summary]
+                elif topic == 'latest_signals':
+                    latest_signal_stats.update(message.signal_stats)
+                elif topic == 'result_file':
+                    result_files.append(message)
+                elif topic == 'log':
+                    log_messages.append(message)
+                elif message.kind == 'score':
+                    score_requested = 1 # Can be turned on via user input also.
+                elif message.kind == 'monitoring':
+                    current_monitoring = 1
+                elif message.kind == 'clear_signals':
+                    signals = {}
+            if not self.stdout_resumed.is_set():
+                continue # Only printing waits, set_stdout_pause publishes a 'resume' request to print the held messages.
+
+            score_ready = 0
+            if len(current_scores) == sum([len(self.monitored_coins[coin]) for coin in self.monitored_coins]):
+                score_ready = score_requested or self.server_instruction['stdout'] # Only stdout when all symbol scores have been calculated
+
+            if new_monitorings or removed_items or score_ready or current_monitoring or signals or latest_signal_stats or result_files or log_messages:
                 print(f'{"*"*25} NEW server messages {"*"*25}')
                 print(f'Timestamp: {datetime.now().strftime("%d/%m/%y %I:%M %p")}\n')
 
-                if 'monitoring_msg_ready' in new_messages:
-                    newly_added_set = self.server_messages['new_monitorings']['added']
-                    invalid_syntax_set = self.server_messages['new_monitorings']['invalid_syntax']
-                    invalid_timeframes = self.server_messages['new_monitorings']['invalid_timeframe']
-                    binance_exceptions = self.server_messages['new_monitorings']['binance_exceptions']
-                    self.server_messages['new_monitorings'] = {}
+                for message in new_monitorings:
                     print('Adding coins to server monitoring has completed!')
-                    print(f'The following items will start being monitored: {newly_added_set}')
-                    if invalid_syntax_set:
-                        print(f'The following items won\'t be monitored due to invalid syntax: {invalid_syntax_set}')
-                    if invalid_timeframes:
-                        print(f'The following items won\'t be monitored due to invalid timeframes: {invalid_timeframes}')
+                    print(f'The following items will start being monitored: {message.added}')
+                    if message.invalid_syntax:
+                        print(f'The following items won\'t be monitored due to invalid syntax: {message.invalid_syntax}')
+                    if message.invalid_timeframe:
+                        print(f'The following items won\'t be monitored due to invalid timeframes: {message.invalid_timeframe}')
                         print(f'All valid timeframes are: {INTERVALS}')
-                    if binance_exceptions:
-                        print(f'The following items won\'t be monitored as they\'re not listed in Binance: {binance_exceptions}')
-                    self.server_messages['current_monitoring'] = 1 # stdout db and monitoring summary
-
-                if 'remove_msg_ready' in new_messages:
-                    removed_set = self.server_messages['removed_items']['dropped']
-                    original_set = self.server_messages['removed_items']['initial_queries']
-                    self.server_messages['removed_items'] = {}
-                    failed_queries = original_set.difference(removed_set)
+                    if message.binance_exceptions:
+                        print(f'The following items won\'t be monitored as they\'re not listed in Binance: {message.binance_exceptions}')
+                    current_monitoring = 1 # stdout db and monitoring summary
+
+                for message in removed_items:
+                    failed_queries = message.initial_queries.difference(message.dropped)
                     dropped_monitorings = []
                     dropped_databases = []
                     print('Drop command has completed!')
-                    for query in removed_set:
+                    for query in message.dropped:
                         if '-DROP' in query:
                             dropped_databases.append(query)
                         else:
@@ -582,12 +589,12 @@ class Notification_server():
                         print(f'The following queries were removed from database: {dropped_databases}')
                     if failed_queries:
                         print(f'The following queries were invalid or not present: {failed_queries}')
-                    self.server_messages['current_monitoring'] = 1
+                    current_monitoring = 1
 
-                if 'score_ready' in new_messages:
-                    self.server_instruction['score'] = 0
-                    symbol_scores = self.server_messages['current_score'].copy()
-                    self.server_messages['current_score'] = {}
+                if score_ready:
+                    score_requested = 0
+                    symbol_scores = current_scores
+                    current_scores = {}
                     print('Current score updates >>>')
                     for symbol in symbol_scores:
                         summary = symbol_scores[symbol]
@@ -608,14 +615,13 @@ class Notification_server():
                             print(f'{summary[0]} price: {summary[5]}, {mood} {score}/{max_score}, change: {summary[3]} signal: {summary[5]}')
                     print()
 
-                if self.server_messages['current_monitoring']:
-                    self.server_messages['current_monitoring'] = 0
+                if current_monitoring:
                     if not self.get_stored_coins() or not self.monitored_coins:
                         print(f"Server has no stored or monitored coins. Enter command 'monitor' to add new coins.")
                     else:
                         print(f"Server has the following coins in the database:")
                         for coin in self.get_stored_coins():
-                            stored_symbol_timeframes = Coin(coin).get_symbol_timeframes()
+                            stored_symbol_timeframes = self.get_coin_symbol_timeframes(coin)
                             for symbol in stored_symbol_timeframes:
                                 print(f'{symbol}: {stored_symbol_timeframes[symbol]}')
                         
@@ -624,8 +630,7 @@ class Notification_server():
                             print(f'{symbol}: {self.monitored_coins[symbol]}')
                     print()
 
-                if self.server_messages['signals']:
-                    signals = self.server_messages['signals'].copy()
+                if signals:
                     for symbol in signals:
                         signal, timestamp, summary = signals[symbol]
                         mood = 'BULL' if summary[1] > summary[2] else 'BEAR'
@@ -636,9 +641,7 @@ class Notification_server():
                         print(f'Price was: {summary[5]}, {mood} score {score}/{max_score}')
                     print('***To clear these signals, run the command "clear signals"***\n')
 
-                if self.server_messages['lastest_signals']:
-                    latest_signal_stats = self.server_messages['lastest_signals'].copy()
-                    self.server_messages['lastest_signals'] = {}
+                if latest_signal_stats:
                     for symbol in latest_signal_stats:
                         signal_stats = latest_signal_stats[symbol]
                         (symbol, signal, mood, score, change_score, max_score, signal_price, tf_scores, alt_action,
@@ -650,46 +653,32 @@ class Notification_server():
                         print(f'Max gain from {alt_action} would be {max_gain:.2f}% of {desired_assest} at ${best_gain_price},'
                             f'gain now from {alt_action} is {current_gain:.2f}% of {desired_assest} at ${current_price}\n')
 
-                if self.server_messages['retain_score']:
-                    symbol, path = self.server_messages['retain_score']
-                    timeframes = self.monitored_coins[self.find_coin(symbol)]
-                    self.server_messages['retain_score'] = []
-                    print(f'Retain scoring summary for {symbol} with timeframes {timeframes} has completed. File located at: {path}\n')
-
-                if self.server_messages['graph_trend']:
-                    symbol, path = self.server_messages['graph_trend']
-                    timeframes = self.monitored_coins[self.find_coin(symbol)]
-                    self.server_messages['graph_trend'] = []
-                    print(f'Trend graph for {symbol} with timeframes {timeframes} has completed. File located at: {path}\n')
-
-                if self.server_messages['graph_lookahead']:
-                    symbol, path = self.server_messages['graph_lookahead']
-                    timeframes = self.monitored_coins[self.find_coin(symbol)]
-                    self.server_messages['graph_lookahead'] = []
-                    print(f'Look ahead graph for {symbol} with timeframes {timeframes} has completed. File located at: {path}\n')
-                
-                if self.server_messages['graph_PA']:
-                    symbol, path = self.server_messages['graph_PA']
-                    timeframes = self.monitored_coins[self.find_coin(symbol)]
-                    self.server_messages['graph_PA'] = []
-                    print(f'PA and signal graph for {symbol} with timeframes {timeframes} has completed. File located at: {path}\n')
-
-                if self.server_messages['graph_trade_simulation']:
-                    symbol, path = self.server_messages['graph_trade_simulation']
-                    timeframes = self.monitored_coins[self.find_coin(symbol)]
-                    self.server_messages['graph_trade_simulation'] = []
-                    print(f'Trade simulation for {symbol} with timeframes {timeframes} has completed. File located at: {path}\n')
-
-                if self.server_messages['graph_binance_scan']:
-                    pass
+                for message in result_files:
+                    timeframes = self.monitored_coins[self.find_coin(message.symbol)]
+                    print(f'{self.RESULT_FILE_TITLES[message.kind]} for {message.symbol} with timeframes {timeframes} has completed. '
+                          f'File located at: {message.path}\n')
+
+                for message in log_messages:
+                    print(f'{message.level}: {message.text}')
+                if log_messages:
+                    print()
 
                 print(f'{"*"*25} END server messages {"*"*25}')
+            new_monitorings, removed_items, result_files, log_messages = [], [], [], []
+            latest_signal_stats = {}
+            current_monitoring = 0
 
 
     def get_stored_coins(self):
-        '''returns list of coins stored in database'''
+        '''returns list of coins stored in database, from the process wide catalogue (see candle_cache.py)'''
+
+        return candle_cache.stored_coins(self.data_path)
 
-        return [path.split('/')[-1] for path in glob(f'{self.data_path}/*') if 'binance_scan' not in path]
+
+    def get_coin_symbol_timeframes(self, coin):
+        '''returns a dictionary of the symbols stored for given coin and their timeframes, like Coin.get_symbol_timeframes'''
+
+        return candle_cache.symbol_timeframes(f'{self.data_path}/{coin}/candlestick_data', CANDLE_STORES[CANDLE_STORAGE].EXTENSION)
 
 
     def get_stored_symbols(self):
@@ -697,7 +686,7 @@ class Notification_server():
 
         stored_symbols = []
         for coin in self.get_stored_coins():
-            stored_symbols.extend(list(Coin(coin).get_symbol_timeframes()))
+            stored_symbols.extend(list(self.get_coin_symbol_timeframes(coin)))
         return stored_symbols
 
 
@@ -706,7 +695,7 @@ class Notification_server():
 
         stored_symbol_timeframes = []
         for coin in self.get_stored_coins():
-            for symbol, timeframes in Coin(coin).get_symbol_timeframes().items():
+            for symbol, timeframes in self.get_coin_symbol_timeframes(coin).items():
                 stored_symbol_timeframes.extend([f'{symbol}_{tf}' for tf in timeframes])
         return stored_symbol_timeframes
     
@@ -741,27 +730,26 @@ class Notification_server():
 
 
     def request_interval_handler(self):
-        '''Thread used to synchronise all monitored_coin method threads'''
+        '''Scheduled every REQUEST_INTERVAL, queues a refresh job for every monitored coin thread'''
 
-        while True:
-            threads = [str(thread).split(',')[0].split('(')[1] for thread in list_threads()] # List all activate threads.
-            coins = [coin for coin in threads if coin in self.monitored_coins] # List only active coin threads.
-            self.server_instruction['request_interval'] = coins # Change global variable to be list of coins ready to have scores checked.
-            Thread(target=self.boost_speed, args=(0.1,), daemon=True).start() # Temporarily boost server speed for faster processing. 
-            while self.server_instruction['request_interval'] != []:
-                self.tickspeed_handler.wait() # Keep checking every server tick whether all coin threads have starting scoring.
-            self.server_instruction['boost'] = 0 # Turn off boost thread.
-            time.sleep(self.REQUEST_INTERVAL) # Releases every request_interval time. 
-
-
-    def server_tick_speed(self):
-        '''Thread server speed, every SERVER_SPEED time elapsed will release the tickspeed_handler object'''
-        
-        while True:
-            self.tickspeed_handler.set() # Releases the event object for all active threads from waiting. 
-            self.tickspeed_handler.wait() # Just a small measure to ensure all server .wait() methods are reached.
-            self.tickspeed_handler.clear() # Locks server wide event object. 
-            time.sleep(self.SERVER_SPEED)
+        with self.registry_lock:
+            # Coins yet to start the previous refresh are not queued again.
+            coins = [coin for coin in self.coin_registry if coin in self.monitored_coins and not self.coin_registry[coin]['refresh_queued']]
+            for coin in coins:
+                self.coin_registry[coin]['refresh_queued'] = True
+        for coin in coins:
+            self.coin_pool.submit(coin, self.refresh_coin, coin)
+
+
+    def set_stdout_pause(self, paused):
+        '''Pauses or resumes server stdout, messages dispatched while paused print once resumed'''
+
+        self.server_instruction['pause_stdout'] = int(paused)
+        if paused:
+            self.stdout_resumed.clear()
+        else:
+            self.stdout_resumed.set()
+            self.bus.publish('stdout_request', StdoutRequest('resume')) # Wakes server_stdout to print the held messages.
 
     
     def update_timers(self, timer):
@@ -770,37 +758,23 @@ class Notification_server():
         words = []
         if timer == 'request_interval':
             words.extend([' (minute)', 'request_interval'])
-        elif timer == 'server_speed':
-            words.extend([' (second)', 'tick speed'])
 
-        self.server_instruction['pause_stdout'] = 1
+        self.set_stdout_pause(True)
         user_input = input(f"Please input a positive integer{words[0]} for new server {words[1]}: ")
-        self.server_instruction['pause_stdout'] = 0
+        self.set_stdout_pause(False)
         try:
             user_input = int(user_input)
             if user_input > 0:
                 print(f"Server {words[1]} updated to {user_input}{words[0]}.") 
                 if timer == 'request_interval':
                     self.REQUEST_INTERVAL = user_input * 60
-                elif timer == 'server_speed':
-                    self.SERVER_SPEED = user_input
+                    self.scheduler.reschedule(self.request_timer, self.REQUEST_INTERVAL)
                 return 1
         except ValueError:
             pass
         print(f"{user_input} is an invalid entry. Please input a positive integer.")
 
 
-    def boost_speed(self, boost):
-        '''Thread which toggles server speed from normal to responsive'''
-
-        original_SERVER_SPEED = self.SERVER_SPEED
-        self.SERVER_SPEED = boost
-        self.server_instruction['boost'] = boost
-        while self.server_instruction['boost']:
-            time.sleep(boost)
-        self.SERVER_SPEED = original_SERVER_SPEED
-
-
     def server_user(self, gmail, owner=False):
         '''Creates user. Each thread will handles one user. Each thread can create two modes of messages to be sent to the user via email.
 
@@ -820,34 +794,27 @@ class Notification_server():
             self.server_users[gmail] = {'username':username, 'gmail':gmail, 'privilege': 'user', 'coins':[], 'threshold':'ML', 'update_interval': 1}
         for coin in self.server_users[gmail]['coins']:
             Previous_scores[coin] = 0 
+        user_messages = self.bus.subscribe(['signal', 'mode_2'], name=f'server_user_{username}')
 
         Thread(target=self.server_user_mode_2_message_handler, name=f"server_user_message_handler_{username}", args=(self.server_users[gmail],), daemon=True).start()
 
         while True:
-            if self.mode_1_messages: # Checks for any signals (due to a coin passing their threshold) - Note, these messages get cleared elsewhere above.
-                coins = self.mode_1_messages.copy()
-                for coin in coins:
-                    score = coins[coin].split('_')[-1] 
-                    mood = coins[coin].split('_')[0]
-                    user_thresold = self.server_users[gmail]['threshold']
-                    if coin in self.server_users[gmail]['coins'] and (user_thresold == 'ML' or score >= user_thresold):
-                        if score < Previous_scores[coin]:
-                            continue 
-                        subject = f"SIGNAL ALERT: {coin} passed {mood}ish threshold!"
-                        details = (f"{subject} SCORE: {score}#These events are rare and usually a good time to perform a swing trade.#"
-                                    'The summary excel and historical score vs performance graphs have been attached to assist in your descision.')
-                        files = ','.join(glob(f"{self.root_path}/server_mail/outgoing/{coin}_SIGNAL*"))
-                        message = {'user':gmail, 'title':subject, 'details':details, 'files':files}
-                        self.outgoing_messages[username] = message # Send mode1 email.
-            
-            try:
-                message = self.mode_2_messages[gmail]
-                self.outgoing_messages[gmail] = message # send mode2 email.
-                self.mode_2_messages.pop(gmail)
-            except KeyError:
-                pass # After each users specified interval passes, their new mode2 message will become avaliable.
-            
-            self.tickspeed_handler.wait()
+            topic, message = user_messages.get() # Sleeps until a signal or a mode 2 message is published.
+            if topic == 'signal': # A coin passed its threshold.
+                coin, summary = message.coin, message.summary
+                score = max(summary[1], summary[2])
+                mood = 'BULL' if summary[1] > summary[2] else 'BEAR'
+                user_thresold = self.server_users[gmail]['threshold']
+                if coin in self.server_users[gmail]['coins'] and (user_thresold == 'ML' or score >= user_thresold):
+                    if score < Previous_scores.get(coin, 0):
+                        continue 
+                    subject = f"SIGNAL ALERT: {coin} passed {mood}ish threshold!"
+                    details = (f"{subject} SCORE: {score}#These events are rare and usually a good time to perform a swing trade.#"
+                                'The summary excel and historical score vs performance graphs have been attached to assist in your descision.')
+                    files = ','.join(glob(f"{self.root_path}/server_mail/outgoing/{coin}_SIGNAL*"))
+                    self.bus.publish('outgoing_mail', Mail(gmail, subject, details, files)) # Send mode1 email.
+            elif message.gmail == gmail:
+                self.bus.publish('outgoing_mail', message.message) # send mode2 email.
 
 
     def server_user_mode_2_message_handler(self, user_dict={}):
@@ -855,9 +822,11 @@ class Notification_server():
 
         # Thread will send mode 2 message upon creation, and then wait for update_interval time to send next one. 
         while True:
+            self.mode_2_ready.clear()
             self.MODE_2_REQUEST = len(self.monitored_coins)
-            while self.MODE_2_REQUEST:
-                self.tickspeed_handler.wait()
+            if not self.MODE_2_REQUEST:
+                self.mode_2_ready.set()
+            self.mode_2_ready.wait() # Set by the last coin thread to refresh.
             update_message_timer = user_dict['update_interval'] * 3600 # seconds.
             gmail = user_dict['gmail']
             coins = user_dict['coins']
@@ -868,8 +837,7 @@ class Notification_server():
                         'To scilence this type of message, email this address the command "silence".#' 
                         'To modify how often this type of message sends, email this address "update-X"')
             files = ','.join([','.join(file_group) for file_group in [glob(f"{self.root_path}/server_mail/outgoing/{coin}_UPDATE*") for coin in coins] if file_group != []])
-            message = {'user':gmail, 'title':subject, 'details':details, 'files':files}
-            self.mode_2_messages[gmail] = message
+            self.bus.publish('mode_2', UpdateMessage(gmail, Mail(gmail, subject, details, files)))
             
             time.sleep(update_message_timer) # If user decides to increase this frequency, destroy the thread and create new one
             #TODO For a situation where a new user joins, and the mode1 messages are passed thesholds, let this create a mode1 message just as their first message
@@ -884,15 +852,15 @@ class Notification_server():
 
 
     def recieve_mail_instructions(self):
-        '''Thread which handles listening for emails from server users'''
+        '''Checks for emails from server users, run every MAIL_CHECK_INTERVAL by the scheduler once notifications are set up'''
         #TODO
-        # Ideally waits in while loop, checking incoming mail each time (which come from script, generates new file for each mail) - by running recevie_mail.sh 
+        # Checks incoming mail (which come from script, generates new file for each mail) - by running recevie_mail.sh 
         # Once this checks the file, it deletes it (clearing inbox)
-        # This will read the incoming.txt (where the received instructions are) and make/modify each outgoing.txt which then gets picked up by notification_send_gmail
-
-        while self.postfix_init:
-            self.tickspeed_handler.wait()
+        # This will read the incoming.txt (where the received instructions are) and publish each instruction on the bus,
+        # as this runs on the scheduler thread
 
+        if self.postfix_init:
+            pass
             # commands:
             # new_user: creates a new server_user thread
             # drop: Requires user + coin/tradingpair
@@ -914,29 +882,19 @@ class Notification_server():
 
 
     def notification_send_gmail(self):
-        '''Thread which handles sending emails to server users'''
+        '''Thread which hands the mail published by server users to the mail queue, which batches and sends it (see mail_queue.py)'''
 
         while self.postfix_init:
-            while self.outgoing_messages:
-                to_send = self.outgoing_messages.copy()
-                print(f"self.outgoing_messages is: {self.outgoing_messages}")
-                self.tickspeed_handler.wait()
-                for user in to_send:
-                    self.outgoing_messages.pop(user)
-                    message = to_send[user]
-                    sendmail_process = subprocess.run([self.script_path + '/send_mail.sh', *[message[header] for header in message]])
-                    if sendmail_process.returncode == 0:
-                        continue
-                    else:
-                        print(f"Error: message for {user} did not send, script returned exit {sendmail_process.returncode}.")
-            self.tickspeed_handler.wait()
+            _, message = self.outgoing_mail.get() # Sleeps until a server user thread publishes outgoing mail.
+            print(f"outgoing message is: {message}")
+            self.mail_queue.put(message)
 
 
     def notification_init(self):
         '''Handles postfix initiation and SMTP communication with user gmail'''
 
         if not self.postfix_init:
-            self.server_instruction['pause_stdout'] = 1 # Stops all server stdout for cleaner user interaction.
+            self.set_stdout_pause(True) # Stops all server stdout for cleaner user interaction.
             notification_init_process = subprocess.run(['sudo', self.script_path + '/notification_init.sh'])
             if notification_init_process.returncode == 0:
                 postfix_init_process = subprocess.run(['sudo', self.script_path + '/postfix_init.sh'])
@@ -949,9 +907,12 @@ class Notification_server():
                             first_line = users.readline()
                             self.server_owner_gmail = first_line.split(':')[1]
                             gmail = first_line.split(':')[-1][:-1]
+                        self.outgoing_mail = self.bus.subscribe(['outgoing_mail'], name='notification_send_gmail')
+                        mail_path = f'{self.root_path}/server_mail'
+                        self.mail_queue = MailQueue(create_transport(MAIL_TRANSPORT, self.script_path, f'{mail_path}/sent'), f'{mail_path}/spool')
                         Thread(target=self.server_user, name='server_user_owner',args=(gmail, owner), daemon=True).start() 
                         Thread(target=self.notification_send_gmail, name='notification_send_gmail', daemon=True).start()
-                        Thread(target=self.recieve_mail_instructions, name='recieve_mail_instructions', daemon=True).start()
+                        self.mail_check_timer = self.scheduler.call_every(MAIL_CHECK_INTERVAL, self.recieve_mail_instructions)
                         break 
                     elif postfix_init_process.returncode == 1:
                         print("Server notification service will NOT commence. To retry, run 'notify' command again.")
@@ -959,7 +920,7 @@ class Notification_server():
                     elif postfix_init_process.returncode == 2:
                         postfix_init_process = subprocess.run(['sudo', self.script_path + '/postfix_init.sh'])
                     time.sleep(0.5)
-                self.server_instruction['pause_stdout'] = 0 # Unpause server stdout.
+                self.set_stdout_pause(False) # Unpause server stdout.
                 return
             print("Server notification service will NOT commence until this issue is resolved.")
 
@@ -970,8 +931,15 @@ class Notification_server():
         print('\nServer is currently running the following threads:\n')
         [print('Thread: ' + str(thread).split(',')[0].split('(')[1]) for thread in list_threads()]
         print(f"\nServer instructions are set as: \n{self.server_instruction}")
-        print(f"Server tick speed: {self.SERVER_SPEED}")
         print(f"Server interval speed: {self.REQUEST_INTERVAL}")
+        print(f"Server timers due in (seconds): {self.scheduler.pending()}")
+        print(f"Message bus: {self.bus.stats()}")
+        if self.mail_queue:
+            print(f"Mail queue: {self.mail_queue.stats()}")
+        print(f"Coin worker pool: {self.coin_pool.stats()}")
+        print(f"Live score cache: {live_score_cache.stats()}")
+        print(f"Cut point tables: {cut_point_tables.stats()}")
+        print(f"Coin registry: {self.coin_registry}")
 
 
     def shutdown_server(self):
@@ -991,8 +959,42 @@ class Notification_server():
 #TODO from the email side, make a PING command to check whether server is running
 # RESTART 
 
+def profile_startup(top=15):
+    '''
+    Reports the import time per module (python3 -X importtime) of the server startup, and of the imports deferred until
+    the first monitored coin (get_candles: pandas, the binance package) and the first graph (matplotlib)
+    '''
+
+    stages = {
+        'server startup': 'import notification_server',
+        'first monitored coin': 'import get_candles',
+        'first graph': 'import matplotlib.pyplot, matplotlib.dates'
+    }
+    code = '; '.join(f'import sys; sys.stderr.write("stage: {stage}\\n"); {statement}' for stage, statement in stages.items())
+    profile = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=os.path.dirname(os.path.realpath(__file__)),
+                             capture_output=True, text=True)
+    stage_imports = {}
+    for line in profile.stderr.splitlines():
+        if line.startswith('stage: '):
+            stage = line[len('stage: '):]
+            stage_imports[stage] = []
+        elif line.startswith('import time:') and stage_imports and 'imported package' not in line:
+            self_us, cumulative_us, module = line[len('import time:'):].split('|')
+            stage_imports[stage].append((int(self_us) / 1000, int(cumulative_us) / 1000, module.strip()))
+    if profile.returncode:
+        print('\n'.join(line for line in profile.stderr.splitlines() if not line.startswith(('import time:', 'stage: '))))
+
+    for stage, imports in stage_imports.items():
+        print(f'\n{stage}: {sum(self_ms for self_ms, _, _ in imports):.0f}ms importing {len(imports)} modules, slowest:')
+        for self_ms, cumulative_ms, module in sorted(imports, reverse=True)[:top]:
+            print(f'{module:<45} self {self_ms:8.1f}ms | cumulative {cumulative_ms:8.1f}ms')
+
+
 if __name__ == '__main__':
-    # Example: <python3 notification_server.py BTC LTC ETH INJ>
+    # Example: <python3 notification_server.py BTC LTC ETH INJ>, or <python3 notification_server.py --profile-startup>
+    if '--profile-startup' in sys.argv:
+        profile_startup()
+        sys.exit(0)
     server = Notification_server(to_monitor=sys.argv[1:])
     server.server_shutdown.wait() # Pauses main thread until shutdown_server method is invoked.
     print("Server shut down.")
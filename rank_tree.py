@@ -0,0 +1,187 @@
+from collections import Counter
+
+'''
+Order statistic structure for the growing percent change lists used by Coin.score_performance and Coin.score_amplitude.
+
+Coin.percent_changes rounds every metric to 0.1%, so values are stored as counts in 0.1% buckets of a Fenwick tree.
+insert, kth (sorted_list[k]) and rank (bisect position) are O(log buckets) rather than the O(n) memmove of bisect.insort.
+A RankTree can be indexed like the sorted list it replaces, e.g. Coin.score_performance(max_list=rank_tree, ...).
+'''
+
+
+class RankTree():
+    '''
+    Fenwick tree of value counts over buckets of 10^-decimals width. The bucket range grows as values are inserted.
+    '''
+
+    def __init__(self, values=(), decimals=1):
+
+        self.scale = 10 ** decimals
+        self.size = 0 # number of stored values
+        self.offset = 0 # bucket code of bucket index 0
+        self.counts = [] # count of values per bucket
+        self.tree = [0] # 1-indexed Fenwick tree over counts
+        self.cursors = {} # quantile: [bucket index, number of values in lower buckets], see thresholds()
+        self.add_codes(Counter(self.code(value) for value in values))
+
+
+    @classmethod
+    def from_counts(cls, value_counts, decimals=1):
+        '''
+        Builds a RankTree from (value, count) pairs, e.g. a ScoreHistogram
+        '''
+
+        rank_tree = cls(decimals=decimals)
+        codes = Counter()
+        for value, count in value_counts:
+            codes[rank_tree.code(value)] += count
+        rank_tree.add_codes(codes)
+        return rank_tree
+
+
+    def __len__(self):
+        return self.size
+
+
+    def __getitem__(self, k):
+        return self.kth(k)
+
+
+    def code(self, value):
+        return int(round(float(value) * self.scale))
+
+
+    def add_codes(self, codes):
+        '''
+        Bulk adds a dict of bucket code: count in O(buckets)
+        '''
+
+        if codes:
+            stored = {self.offset + i:count for i, count in enumerate(self.counts) if count}
+            codes = Counter(stored) + Counter(codes)
+            self.rebuild(min(codes), max(codes) - min(codes) + 1, codes)
+
+
+    def rebuild(self, offset, capacity, codes=None):
+        '''
+        Rebuilds the bucket arrays to cover bucket codes [offset, offset + capacity) in O(capacity)
+        '''
+
+        codes = codes if codes is not None else {self.offset + i:count for i, count in enumerate(self.counts) if count}
+        for cursor in self.cursors.values():
+            cursor[0] += self.offset - offset
+        self.offset = offset
+        self.counts = [0] * capacity
+        for code, count in codes.items():
+            self.counts[code - offset] += count
+        self.size = sum(self.counts)
+        self.tree = [0] + self.counts[:]
+        for i in range(1, capacity + 1): # linear time Fenwick construction
+            parent = i + (i & -i)
+            if parent <= capacity:
+                self.tree[parent] += self.tree[i]
+
+
+    def insert(self, value, count=1):
+        '''
+        Adds value to the structure
+        '''
+
+        code = self.code(value)
+        if not self.counts:
+            self.rebuild(code, 64)
+        elif code < self.offset:
+            self.rebuild(code - len(self.counts), 2 * len(self.counts) + self.offset - code)
+        elif code >= self.offset + len(self.counts):
+            self.rebuild(self.offset, 2 * (code - self.offset + 1))
+        bucket = code - self.offset
+        self.counts[bucket] += count
+        self.size += count
+        i = bucket + 1
+        while i < len(self.tree):
+            self.tree[i] += count
+            i += i & -i
+        for cursor in self.cursors.values():
+            if bucket < cursor[0]:
+                cursor[1] += count
+
+
+    def locate(self, k):
+        '''
+        Returns bucket index holding the k-th smallest value (0 indexed) and the number of values in lower buckets
+        '''
+
+        if not 0 <= k < self.size:
+            raise IndexError('RankTree index out of range')
+        position, remaining = 0, k
+        step = 1 << (len(self.tree) - 1).bit_length()
+        while step:
+            next_position = position + step
+            if next_position < len(self.tree) and self.tree[next_position] <= remaining:
+                position = next_position
+                remaining -= self.tree[next_position]
+            step >>= 1
+        return position, k - remaining
+
+
+    def kth(self, k):
+        '''
+        Returns the k-th smallest value, same as sorted_list[k]
+        '''
+
+        return (self.locate(k)[0] + self.offset) / self.scale
+
+
+    def rank(self, value, side='left'):
+        '''
+        Returns number of stored values less than value (side='left') or less than or equal to value (side='right'),
+        same as bisect.bisect_left/bisect_right on the sorted list
+        '''
+
+        code = self.code(value)
+        if side == 'left':
+            below = code if code / self.scale >= value else code + 1 # first bucket not included
+        else:
+            below = code + 1 if code / self.scale <= value else code
+        bucket = min(max(below - self.offset, 0), len(self.counts))
+        total = 0
+        while bucket > 0:
+            total += self.tree[bucket]
+            bucket -= bucket & -bucket
+        return total
+
+
+    def thresholds(self, quantiles):
+        '''
+        Returns [sorted_list[int(size * quantile)] for quantile in quantiles].
+        Each quantile keeps a cursor on its bucket, so repeated calls between inserts are usually O(1).
+        '''
+
+        values = []
+        for quantile in quantiles:
+            k = int(self.size * quantile)
+            cursor = self.cursors.get(quantile)
+            if not cursor or not cursor[1] <= k < cursor[1] + self.counts[cursor[0]]:
+                cursor = self.cursors[quantile] = list(self.locate(k))
+            values.append((cursor[0] + self.offset) / self.scale)
+        return values
+
+
+    def items(self):
+        '''
+        Returns (value, count) pairs of all non empty buckets in ascending order
+        '''
+
+        return [((bucket + self.offset) / self.scale, count) for bucket, count in enumerate(self.counts) if count]
+
+
+    def to_list(self):
+        '''
+        Returns all stored values as a sorted list
+        '''
+
+        values = []
+        for bucket, count in enumerate(self.counts):
+            if count:
+                values.extend([(bucket + self.offset) / self.scale] * count)
+        return values
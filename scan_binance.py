@@ -4,7 +4,6 @@ from config import client
 from utility import get_url
 from datetime import datetime
 from enums import EARLIEST_DATE
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 import json
@@ -139,6 +138,8 @@ def scan_binance_listing_trends(symbols, tradingpair, mode="short_term"):
 
 def graph(tradingpair, mode="short_term"):
 
+	import matplotlib.pyplot as plt # Deferred until a graph is requested
+
 	data_path = get_file_path('gains', tradingpair, mode)
 	stats_path = get_file_path('stats', tradingpair, mode)
 	graph = get_file_path('graph_gains', tradingpair, mode)
@@ -176,6 +177,8 @@ def graph(tradingpair, mode="short_term"):
 
 def graph2(tradingpair, mode="short_term"):
 
+	import matplotlib.pyplot as plt # Deferred until a graph is requested
+
 	stats_path = get_file_path('stats', tradingpair, mode)
 	graph = get_file_path('graph_dates', tradingpair, mode)
 	listing_stats = pd.read_csv(stats_path, index_col= 0)
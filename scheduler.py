@@ -0,0 +1,105 @@
+from threading import Thread, Condition
+from time import monotonic
+import heapq
+
+'''
+Timer thread of the notification server, which replaced the global server tick (an Event released every
+SERVER_SPEED seconds, which every thread woke on to check the shared dicts).
+
+Work is now dispatched on demand: each subsystem thread (coin, stdout, server user, mail) blocks on its own queue and
+is only woken when something is put on it. The Scheduler covers the periodic work, e.g. queueing a refresh job for
+every coin each REQUEST_INTERVAL. Its thread sleeps until the next timer is due (or a timer is added), so an idle
+server uses no CPU:
+    scheduler = Scheduler()
+    timer = scheduler.call_every(60, request_refresh, first_delay=0)
+    scheduler.reschedule(timer, 120)
+Callbacks run on the scheduler thread, so they should only queue work for other threads.
+'''
+
+
+class Scheduler():
+    '''
+    Runs callbacks at given times on one daemon thread
+    '''
+
+    def __init__(self, name='server_scheduler'):
+
+        self.timers = [] # heap of [due time, timer id]
+        self.callbacks = {} # timer id: [callback, args, interval or None]
+        self.next_id = 0
+        self.condition = Condition()
+        Thread(target=self.run, name=name, daemon=True).start()
+
+
+    def call_later(self, delay, callback, *args):
+        '''
+        Runs callback(*args) once after delay seconds, returns the timer id
+        '''
+
+        return self.add_timer(delay, callback, args, None)
+
+
+    def call_every(self, interval, callback, *args, first_delay=None):
+        '''
+        Runs callback(*args) every interval seconds (first after first_delay, default interval), returns the timer id
+        '''
+
+        return self.add_timer(interval if first_delay is None else first_delay, callback, args, interval)
+
+
+    def add_timer(self, delay, callback, args, interval):
+        with self.condition:
+            timer_id = self.next_id
+            self.next_id += 1
+            self.callbacks[timer_id] = [callback, args, interval]
+            heapq.heappush(self.timers, [monotonic() + delay, timer_id])
+            self.condition.notify()
+        return timer_id
+
+
+    def reschedule(self, timer_id, interval):
+        '''
+        Changes the interval of a repeating timer, the next run is interval seconds from now
+        '''
+
+        with self.condition:
+            if timer_id in self.callbacks:
+                self.callbacks[timer_id][2] = interval
+                self.timers = [timer for timer in self.timers if timer[1] != timer_id]
+                heapq.heapify(self.timers)
+                heapq.heappush(self.timers, [monotonic() + interval, timer_id])
+                self.condition.notify()
+
+
+    def cancel(self, timer_id):
+        with self.condition:
+            self.callbacks.pop(timer_id, None) # its heap entry is skipped once due
+
+
+    def pending(self):
+        '''
+        Returns {timer id: seconds until due}
+        '''
+
+        with self.condition:
+            now = monotonic()
+            return {timer_id:round(due - now, 1) for due, timer_id in self.timers if timer_id in self.callbacks}
+
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.timers or self.timers[0][0] > monotonic():
+                    self.condition.wait(self.timers[0][0] - monotonic() if self.timers else None)
+                due, timer_id = heapq.heappop(self.timers)
+                if timer_id not in self.callbacks:
+                    continue # cancelled
+                callback, args, interval = self.callbacks[timer_id]
+                if interval is None:
+                    self.callbacks.pop(timer_id)
+                else:
+                    heapq.heappush(self.timers, [max(due + interval, monotonic()), timer_id])
+            try:
+                callback(*args)
+            except Exception as e:
+                print(f'Error: scheduled {getattr(callback, "__name__", callback)} raised {e!r}')
@@ -0,0 +1,229 @@
+from itertools import accumulate, repeat
+from collections import Counter, defaultdict
+from rank_tree import RankTree
+from glob import glob
+import bisect
+import json
+import sys
+import os
+
+'''
+Compact histogram format for the analysis_<SYMBOL>.json files of Coin.
+
+Coin.percent_changes rounds every metric to 0.1%, so each sorted metric list is stored as its distinct values and
+their cumulative counts:
+    {"format": "histogram", "timeframes": {"1h": {"candle_change": {"values": [...], "cumulative": [...]}, ...}, ...}}
+
+load_score_json reads both this and the original format of plain sorted lists, and returns ScoreHistogram objects
+which can be indexed like the sorted lists (so Coin.score_performance and Coin.score_amplitude use them unchanged).
+save_score_json always writes the histogram format, hence old files convert on their next update, or all at once with:
+    <python3 score_histogram.py convert [COIN ...]>
+
+Hourly updates do not rewrite the json. Coin.update_score_jsons appends the value counts of newly closed candles to
+analysis_<SYMBOL>.log (one json line per symbol_timeframe update) together with the candle store position reached,
+so the next update seeks straight to the new rows:
+    {"timeframe": "1h", "start": 1200, "rows": 1201, "position": 161834, "counts": {"candle_change": [[0.3, 1]], ...}}
+load_score_state replays the log over the json, and once DELTA_LOG_LIMIT entries build up they are compacted into the json.
+'''
+
+SCORE_METRICS = ['candle_change', 'candle_amplitude', 'candle_max_up', 'candle_max_down']
+DELTA_LOG_LIMIT = 168 # delta log entries before compaction into the json, i.e. a week of hourly updates for one timeframe
+
+
+class ScoreHistogram():
+    '''
+    Read only sorted list view over distinct values and their cumulative counts
+    '''
+
+    def __init__(self, values=(), cumulative=()):
+
+        self.values = list(values)
+        self.cumulative = list(cumulative)
+
+
+    @classmethod
+    def from_list(cls, values):
+        return cls.from_counts(sorted(Counter(values).items()))
+
+
+    @classmethod
+    def from_counts(cls, value_counts):
+        '''
+        Builds histogram from ascending (value, count) pairs, e.g. RankTree.items()
+        '''
+
+        value_counts = list(value_counts)
+        return cls([value for value, _ in value_counts], accumulate(count for _, count in value_counts))
+
+
+    def __len__(self):
+        return self.cumulative[-1] if self.cumulative else 0
+
+
+    def __getitem__(self, k):
+        '''
+        Returns the k-th smallest value, same as sorted_list[k]
+        '''
+
+        k = k + len(self) if k < 0 else k
+        if not 0 <= k < len(self):
+            raise IndexError('ScoreHistogram index out of range')
+        return self.values[bisect.bisect_right(self.cumulative, k)]
+
+
+    def __iter__(self):
+        for value, count in self.items():
+            yield from repeat(value, count)
+
+
+    def items(self):
+        return zip(self.values, [count - prev for count, prev in zip(self.cumulative, [0, *self.cumulative])])
+
+
+    def thresholds(self, quantiles):
+        '''
+        Returns [sorted_list[int(size * quantile)] for quantile in quantiles]
+        '''
+
+        return [self[int(len(self) * quantile)] for quantile in quantiles]
+
+
+    def mean(self):
+        return sum(value * count for value, count in self.items()) / len(self) if len(self) else float('nan')
+
+
+    def to_rank_tree(self):
+        return RankTree.from_counts(self.items())
+
+
+    def add_counts(self, value_counts):
+        '''
+        Returns new histogram with the given dict of value: count added, O(distinct values)
+        '''
+
+        return ScoreHistogram.from_counts(sorted((Counter(dict(self.items())) + Counter(value_counts)).items()))
+
+
+    def to_json(self):
+        return {'values':self.values, 'cumulative':self.cumulative}
+
+
+def delta_log_path(path):
+    return f'{os.path.splitext(path)[0]}.log'
+
+
+def load_score_state(path):
+    '''
+    Returns ({timeframe: {metric: ScoreHistogram}}, {timeframe: [rows, position]}, number of delta log entries).
+    rows is the number of candles in the histograms of the timeframe and position the candle store position of that row.
+    '''
+
+    with open(path, 'r') as jf:
+        content = jf.read()
+    if not content.strip():
+        scoring_json, positions = {}, {} # newly created symbol
+    else:
+        scoring_json = json.loads(content)
+        if scoring_json.get('format') == 'histogram':
+            positions = scoring_json.get('positions', {})
+            scoring_json = {timeframe:{metric:ScoreHistogram(**histogram) for metric, histogram in metrics.items()}
+                            for timeframe, metrics in scoring_json['timeframes'].items()}
+        else:
+            positions = {}
+            scoring_json = {timeframe:{metric:ScoreHistogram.from_list(values) for metric, values in metrics.items()}
+                            for timeframe, metrics in scoring_json.items()}
+
+    entries = 0
+    if os.path.exists(delta_log_path(path)):
+        rows = {timeframe:len(metrics['candle_change']) for timeframe, metrics in scoring_json.items()}
+        counts = defaultdict(lambda: defaultdict(Counter))
+        with open(delta_log_path(path), 'r') as log:
+            for line in log:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue # partially written final entry
+                entries += 1
+                timeframe = entry['timeframe']
+                if rows.get(timeframe) != entry['start']:
+                    continue # timeframe removed since, or entry already compacted into the json
+                for metric, value_counts in entry['counts'].items():
+                    counts[timeframe][metric].update(dict(value_counts))
+                rows[timeframe] = entry['rows']
+                positions[timeframe] = [entry['rows'], entry['position']]
+        for timeframe in counts:
+            for metric in counts[timeframe]:
+                scoring_json[timeframe][metric] = scoring_json[timeframe][metric].add_counts(counts[timeframe][metric])
+
+    # drop positions which no longer match the histograms, e.g. of a timeframe re-added since
+    positions = {timeframe:position for timeframe, position in positions.items()
+                 if timeframe in scoring_json and position[0] == len(scoring_json[timeframe]['candle_change'])}
+    return scoring_json, positions, entries
+
+
+def load_score_json(path):
+    '''
+    Returns {timeframe: {metric: ScoreHistogram}} from either the histogram or the original sorted list format
+    '''
+
+    return load_score_state(path)[0]
+
+
+def save_score_json(path, scoring_json, positions={}):
+    '''
+    Writes {timeframe: {metric: ScoreHistogram}} in the histogram format, replacing the json and delta log
+    '''
+
+    with open(f'{path}.tmp', 'w') as jf:
+        json.dump({'format':'histogram', 'timeframes':{timeframe:{metric:histogram.to_json() for metric, histogram in metrics.items()}
+                                                       for timeframe, metrics in scoring_json.items()},
+                   'positions':positions}, jf, separators=(',', ':'))
+    os.replace(f'{path}.tmp', path) # json holds all logged entries before the log is removed
+    if os.path.exists(delta_log_path(path)):
+        os.remove(delta_log_path(path))
+
+
+def append_score_delta(path, timeframe, start, rows, position, value_counts):
+    '''
+    Appends the value counts of candles [start, rows) of a timeframe to the delta log, value_counts is {metric: {value: count}}
+    '''
+
+    entry = {'timeframe':timeframe, 'start':start, 'rows':rows, 'position':position,
+             'counts':{metric:sorted(counts.items()) for metric, counts in value_counts.items()}}
+    with open(delta_log_path(path), 'a') as log:
+        log.write(json.dumps(entry, separators=(',', ':')) + '\n')
+
+
+def compact_score_json(path):
+    '''
+    Folds the delta log into the json
+    '''
+
+    scoring_json, positions, _ = load_score_state(path)
+    save_score_json(path, scoring_json, positions)
+
+
+def convert_score_jsons(coindata_path, coins=[]):
+    '''
+    Rewrites all analysis jsons in the histogram format. Returns list of (path, old size, new size).
+    '''
+
+    coin_paths = [f'{coindata_path}/{coin.upper()}' for coin in coins] if coins else glob(f'{coindata_path}/*')
+    converted = []
+    for coin_path in coin_paths:
+        for json_path in glob(f'{coin_path}/candlestick_data/*/analysis_*.json'):
+            old_size = os.path.getsize(json_path)
+            scoring_json, positions, _ = load_score_state(json_path)
+            save_score_json(json_path, scoring_json, positions)
+            converted.append((json_path, old_size, os.path.getsize(json_path)))
+    return converted
+
+
+if __name__ == "__main__":
+    # Example: <python3 score_histogram.py convert INJ BTC>
+    if len(sys.argv) < 2 or sys.argv[1] != 'convert':
+        print('Usage: python3 score_histogram.py convert [COIN ...]')
+        sys.exit(1)
+    coindata_path = os.path.dirname(os.path.realpath(__file__)) + '/coindata'
+    for json_path, old_size, new_size in convert_score_jsons(coindata_path, sys.argv[2:]):
+        print(f'{os.path.basename(json_path)}: {old_size / 1000:.1f}KB -> {new_size / 1000:.1f}KB')
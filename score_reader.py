@@ -0,0 +1,212 @@
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from bisect import bisect_left, bisect_right
+from time_index import TimeIndex
+import numpy as np
+import mmap
+import sys
+import os
+
+'''
+Reverse record reader of the historical_scoring csv files, used by Coin.get_trend_stdout and
+Coin.get_latest_signal_stats, which only need the latest rows of years of 5m scores.
+
+The csv is memory-mapped and rows are found by their line breaks, so no byte block size has to be guessed from the
+row width (which varies with the price and score digits) and only the rows of a query are decoded:
+    last_rows(num_rows, interval_ms), the latest row and the last row at or before every interval before it
+    scan_backwards(predicate), the rows from the latest back to the first row matching predicate
+Rows are seeked by UTS with a byte bisection of the file, where every probed row is kept in a sparse UTS -> offset
+index that narrows later seeks (e.g. the next, earlier interval of last_rows). The index starts from the entries of
+the csv's sidecar time index (see time_index.py) when it has one.
+
+Benchmark against reading the whole csv on a synthetic scoring csv with: <python3 score_reader.py [DAYS]>
+'''
+
+
+class ScoreReader():
+    '''
+    Memory-mapped historical_scoring csv, use as a context manager: with ScoreReader(path) as reader: ...
+    Rows are returned as lists of strings, like csv.reader.
+    '''
+
+    def __init__(self, path):
+
+        self.path = path
+        self.file = None
+        self.data = b''
+        self.data_start = 0 # offset of the first row after the header
+        self.data_end = 0 # offset just past the final row
+        self.index = [] # sparse index, sorted (uts, offset) of probed rows
+
+
+    def __enter__(self):
+
+        self.file = open(self.path, 'rb')
+        if os.fstat(self.file.fileno()).st_size:
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        header_end = self.data.find(b'\n')
+        self.data_start = len(self.data) if header_end == -1 else header_end + 1
+        self.data_end = len(self.data)
+        while self.data_end > self.data_start and self.data[self.data_end - 1] in b'\r\n':
+            self.data_end -= 1 # trailing line break
+        self.index = [(uts, offset) for uts, offset, _ in TimeIndex(self.path).load()[1].tolist() if offset < self.data_end]
+        return self
+
+
+    def __exit__(self, *exc_info):
+
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.file.close()
+
+
+    def line_start(self, offset):
+        '''
+        Returns the offset of the row holding the byte at offset
+        '''
+
+        return max(self.data.rfind(b'\n', self.data_start, offset) + 1, self.data_start)
+
+
+    def row_at(self, offset):
+        line_end = self.data.find(b'\n', offset, self.data_end)
+        return self.data[offset:self.data_end if line_end == -1 else line_end].decode().rstrip('\r').split(',')
+
+
+    def uts_at(self, offset):
+        '''
+        Returns the UTS of the row at offset, which is added to the index
+        '''
+
+        uts = int(self.data[offset:self.data.find(b',', offset)])
+        position = bisect_left(self.index, (uts, offset))
+        if position == len(self.index) or self.index[position] != (uts, offset):
+            self.index.insert(position, (uts, offset))
+        return uts
+
+
+    def reverse_offsets(self, end=None):
+        '''
+        Yields the offset of every row before end (default eof), from the latest row back to the first
+        '''
+
+        stop = self.data_end if end is None else end
+        while stop > self.data_start:
+            start = self.line_start(stop)
+            if start < stop: # skips empty lines
+                yield start
+            stop = start - 1
+
+
+    def seek_uts(self, uts, end=None):
+        '''
+        Returns the offset of the last row with a UTS at or before uts (and before end), or None
+        '''
+
+        lo = None # latest offset known to be at or before uts
+        hi = self.data_end if end is None else end # offset known to be past uts
+        position = bisect_right(self.index, (uts, float('inf')))
+        if position:
+            lo = self.index[position - 1][1]
+        if position < len(self.index):
+            hi = min(hi, self.index[position][1])
+        if lo is not None and lo >= hi:
+            lo = None
+        if lo is None:
+            if self.data_start >= hi or self.uts_at(self.data_start) > uts:
+                return None
+            lo = self.data_start
+        while True:
+            start = self.line_start((lo + hi) // 2)
+            if start <= lo: # no row starts between lo and the middle, try the row after lo
+                start = self.data.find(b'\n', lo, hi) + 1
+                if start <= 0 or start >= hi:
+                    return lo
+            if self.uts_at(start) <= uts:
+                lo = start
+            else:
+                hi = start
+
+
+    def last_rows(self, num_rows, interval_ms):
+        '''
+        Returns up to num_rows rows (oldest first): the latest row, and the last row at or before each interval_ms
+        before it. Fewer rows are returned when the csv does not go back far enough.
+        '''
+
+        offset = next(self.reverse_offsets(), None)
+        if offset is None:
+            return []
+        latest_uts = self.uts_at(offset)
+        offsets = [offset]
+        for count in range(1, num_rows):
+            target_uts = latest_uts - count * interval_ms
+            offset = offsets[-1] # rows after it are past the previous interval
+            if self.uts_at(offset) > target_uts:
+                offset = next(self.reverse_offsets(offset - 1), None) # the answer when interval_ms is 5 minutes
+                if offset is not None and self.uts_at(offset) > target_uts:
+                    offset = self.seek_uts(target_uts, offset)
+            if offset is None:
+                break
+            offsets.append(offset)
+        return [self.row_at(offset) for offset in reversed(offsets)]
+
+
+    def scan_backwards(self, predicate):
+        '''
+        Returns the rows from the latest back to (and including) the first row where predicate(row) is true,
+        or None when no row matches
+        '''
+
+        rows = []
+        for offset in self.reverse_offsets():
+            rows.append(self.row_at(offset))
+            if predicate(rows[-1]):
+                return rows
+        return None
+
+
+def benchmark_queries(days=365, num_rows=48, interval_ms=3600000, seed=0):
+    '''
+    Writes a synthetic historical_scoring csv of given days of 5m rows (with missing rows and varying row widths),
+    then times both queries against reading the whole csv with pandas, which they have to match.
+    '''
+
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    num_5m_rows = days * 288
+    uts = 1577836800000 + np.arange(num_5m_rows) * 300000
+    uts = uts[rng.random(num_5m_rows) > 0.001] # Binance maintenance leaves gaps
+    historical_DF = pd.DataFrame({'UTS':uts, 'price':np.round(10 * np.exp(np.cumsum(rng.normal(0, 0.004, len(uts)))), 6),
+                                  'bull_scores':rng.integers(0, 25, len(uts)), 'bear_scores':rng.integers(0, 25, len(uts))})
+    is_signal = lambda row: int(row[2]) >= 23 and int(row[2]) > int(row[3])
+
+    with TemporaryDirectory() as data_path:
+        path = f'{data_path}/historical_scoring_FIXUSDT.csv'
+        historical_DF.to_csv(path, index=False)
+        start = perf_counter()
+        full_DF = pd.read_csv(path, dtype=str)
+        targets = full_DF.UTS.astype(np.int64).iloc[-1] - np.arange(num_rows)[::-1] * interval_ms
+        positions = np.searchsorted(full_DF.UTS.astype(np.int64), targets, side='right') - 1
+        expected_last_rows = full_DF.iloc[positions[positions >= 0]].values.tolist()
+        full_rows = full_DF.values.tolist()
+        expected_scan = next(full_rows[i:][::-1] for i in range(len(full_rows) - 1, -1, -1) if is_signal(full_rows[i]))
+        full_time = perf_counter() - start
+
+        start = perf_counter()
+        with ScoreReader(path) as reader:
+            last_rows = reader.last_rows(num_rows, interval_ms)
+            scan = reader.scan_backwards(is_signal)
+        reader_time = perf_counter() - start
+    identical = last_rows == expected_last_rows and scan == expected_scan
+
+    print(f'{days} days of 5m rows ({len(uts)} rows), last {num_rows} rows every {interval_ms}ms and scan back {len(scan)} rows')
+    print(f'whole csv: {full_time:.3f}s | score reader: {reader_time:.4f}s | speed up: {full_time / reader_time:.0f}x')
+    print(f'rows identical: {identical}')
+    return identical
+
+
+if __name__ == "__main__":
+    # Example: <python3 score_reader.py 365>
+    sys.exit(0 if benchmark_queries(int(sys.argv[1]) if len(sys.argv) > 1 else 365) else 1)
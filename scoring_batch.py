@@ -0,0 +1,124 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing.shared_memory import SharedMemory
+from collections import defaultdict
+from time import perf_counter
+from enums import CANDLE_STORAGE
+from utility import get_filename_extension
+import numpy as np
+import sys
+import os
+
+'''
+Batch historical scoring across coins, symbols and timeframe sets, used by Coin.compute_historical_scores.
+
+compute_historical_scores first updates the candles of every coin in this process (network bound), then loads the
+candle arrays of each symbol once into shared memory and fans the (coin, symbol, custom_timeframes) jobs out to a
+ProcessPoolExecutor. Workers attach to the shared arrays read-only (no copies or csv parsing per job) and run
+Coin.score_history_numpy, which replaces each historical_scoring csv and json atomically.
+
+Score the whole database with: <python3 scoring_batch.py [WORKERS]>
+'''
+
+
+def share_arrays(candle_data):
+    '''
+    Copies {timeframe: {column: array}} into shared memory blocks.
+    Returns the blocks and a picklable spec of {timeframe: {column: (block name, length, dtype)}}.
+    '''
+
+    blocks, spec = [], defaultdict(dict)
+    for timeframe, columns in candle_data.items():
+        for column, values in columns.items():
+            values = np.asarray(values)
+            block = SharedMemory(create=True, size=max(values.nbytes, 1))
+            np.ndarray(values.shape, dtype=values.dtype, buffer=block.buf)[:] = values
+            blocks.append(block)
+            spec[timeframe][column] = (block.name, len(values), values.dtype.str)
+    return blocks, dict(spec)
+
+
+def attach_arrays(spec):
+    '''
+    Returns the shared memory blocks and read-only arrays of a share_arrays spec
+    '''
+
+    blocks, candle_data = [], {}
+    for timeframe, columns in spec.items():
+        candle_data[timeframe] = {}
+        for column, (name, length, dtype) in columns.items():
+            block = SharedMemory(name=name)
+            values = np.ndarray((length,), dtype=dtype, buffer=block.buf)
+            values.flags.writeable = False
+            blocks.append(block)
+            candle_data[timeframe][column] = values
+    return blocks, candle_data
+
+
+def score_job(coin, symbol, custom_timeframes, candle_storage, data_path, spec):
+    '''
+    Worker process entry point, scores one job from the shared candle arrays. Returns elapsed seconds.
+    '''
+
+    from get_candles import Coin
+
+    start = perf_counter()
+    blocks, candle_data = attach_arrays(spec)
+    try:
+        Coin(coin, candle_storage, data_path).score_history_numpy(symbol, custom_timeframes, candle_data)
+    finally:
+        del candle_data # release the buffers before closing
+        [block.close() for block in blocks]
+    return perf_counter() - start
+
+
+def compute_historical_scores(jobs, max_workers=None, candle_storage=CANDLE_STORAGE, data_path=None, update=True):
+    '''
+    Scores list of (coin, symbol, custom_timeframes) jobs in parallel processes, see compute_historical_score.
+    Returns list of (coin, symbol, custom_timeframes, error or None) in job order.
+    Jobs writing the same historical_scoring files are only scored once.
+    '''
+
+    from get_candles import Coin
+
+    symbol_timeframes = defaultdict(set) # (coin, symbol): every timeframe scored by its jobs
+    for coin, symbol, custom_timeframes in jobs:
+        coin_obj = Coin(coin, candle_storage, data_path)
+        symbol_timeframes[(coin, symbol)].update(custom_timeframes if custom_timeframes else coin_obj.deafult_scoring_timeframes)
+    if update:
+        for coin in {coin for coin, _, _ in jobs}:
+            coin_obj = Coin(coin, candle_storage, data_path)
+            coin_obj.update_database() # Get latest candles from Binance
+            coin_obj.get_all_candles({symbol.split(coin)[-1]:['5m'] for job_coin, symbol in symbol_timeframes if job_coin == coin})
+
+    shared = {}
+    errors = {}
+    try:
+        for coin, symbol in symbol_timeframes:
+            candle_data = Coin(coin, candle_storage, data_path).read_scoring_candles(symbol, sorted(symbol_timeframes[(coin, symbol)]))
+            shared[(coin, symbol)] = share_arrays(candle_data)
+        unique_jobs = {(coin, symbol, get_filename_extension(custom_timeframes)):(coin, symbol, custom_timeframes)
+                       for coin, symbol, custom_timeframes in reversed(jobs)} # first job of each file set
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(score_job, coin, symbol, custom_timeframes, candle_storage, data_path,
+                                       shared[(coin, symbol)][1]):key
+                       for key, (coin, symbol, custom_timeframes) in unique_jobs.items()}
+            for future in as_completed(futures):
+                errors[futures[future]] = future.exception()
+    finally:
+        for blocks, _ in shared.values():
+            for block in blocks:
+                block.close()
+                block.unlink()
+    return [(coin, symbol, custom_timeframes, errors.get((coin, symbol, get_filename_extension(custom_timeframes))))
+            for coin, symbol, custom_timeframes in jobs]
+
+
+if __name__ == "__main__":
+    # Example: <python3 scoring_batch.py 8>
+    from get_candles import Coin
+    coindata_path = os.path.dirname(os.path.realpath(__file__)) + '/coindata'
+    jobs = [(coin, symbol, []) for coin in sorted(os.listdir(coindata_path)) for symbol in Coin(coin).get_symbol_timeframes()]
+    start = perf_counter()
+    for coin, symbol, custom_timeframes, error in compute_historical_scores(jobs, int(sys.argv[1]) if len(sys.argv) > 1 else None):
+        print(f'{symbol}: {error if error else "scored"}')
+    print(f'{len(jobs)} jobs scored in {perf_counter() - start:.1f}s')
@@ -0,0 +1,15 @@
+from fixtures import candle_coin, FILENAME_EXT
+from filecmp import cmp
+import json
+
+
+def test_numpy_engine_matches_loop_engine(tmp_path):
+    coins = {engine:candle_coin(str(tmp_path / engine), days=40) for engine in ['loop', 'numpy']}
+    coins['loop'].score_history_loop('FIXUSDT', [])
+    coins['numpy'].score_history_numpy('FIXUSDT', [])
+
+    paths = [f'{coin.historical_scoring_path}/FIXUSDT/historical_scoring_FIXUSDT_{FILENAME_EXT}' for coin in coins.values()]
+    assert cmp(f'{paths[0]}.csv', f'{paths[1]}.csv', shallow=False)
+    json_paths = [path.replace('historical_scoring_FIXUSDT', 'historical_analysis_FIXUSDT') + '.json' for path in paths]
+    with open(json_paths[0]) as loop_jf, open(json_paths[1]) as numpy_jf:
+        assert json.load(loop_jf) == json.load(numpy_jf)
@@ -0,0 +1,55 @@
+from binance.exceptions import BinanceAPIException # Third party
+from binance.client import Client # Third party
+from kline_fetcher import KlineFetcher, FakeKlineServer, KLINE_PAGE_LIMIT, KLINE_REQUEST_WEIGHT
+from time import perf_counter
+import pytest
+
+START_UTS = 1609459200000 # 1 Jan 2021 UTC
+
+
+def fake_client(server):
+    client = Client(ping=False)
+    client.API_URL = f'{server.url}/api'
+    return client
+
+
+def test_fetch_pages_through_every_kline():
+    with FakeKlineServer(['FAKEUSDT'], latency=0) as server:
+        klines = KlineFetcher(fake_client(server)).fetch_klines('FAKEUSDT', '1h', START_UTS)
+
+        assert len(klines) == 365 * 24
+        assert klines == server.klines('FAKEUSDT', '1h', START_UTS, len(klines))
+        assert server.requests == len(klines) // KLINE_PAGE_LIMIT + 1
+
+
+@pytest.mark.parametrize('status', [429, 418])
+def test_rate_limited_request_is_retried_after_retry_after(status):
+    with FakeKlineServer(['FAKEUSDT'], latency=0, rate_limit_every=2, rate_limit_status=status, retry_after=0.2) as server:
+        fetcher = KlineFetcher(fake_client(server), backoff=0.001)
+        start = perf_counter()
+        klines = fetcher.fetch_klines('FAKEUSDT', '1h', START_UTS, max_klines=2000) # the second page is rate limited
+
+        assert perf_counter() - start >= 0.2 # not the 1ms backoff
+        assert fetcher.retries == 1 and server.requests == 3
+        assert klines == server.klines('FAKEUSDT', '1h', START_UTS, 2000)
+
+
+def test_fetch_returns_rejected_jobs_as_exceptions_in_job_order():
+    with FakeKlineServer(['FAKEUSDT', 'OTHERUSDT'], latency=0) as server:
+        results = KlineFetcher(fake_client(server)).fetch([('FAKEUSDT', '1d', START_UTS), ('NOTLISTED', '1d', START_UTS),
+                                                          ('OTHERUSDT', '3d', '1 Jan, 2021')])
+
+        assert results[0] == server.klines('FAKEUSDT', '1d', START_UTS, 365)
+        assert isinstance(results[1], BinanceAPIException) and results[1].code == -1121
+        assert results[2] == server.klines('OTHERUSDT', '3d', START_UTS, 365)
+
+
+def test_requests_stay_within_the_weight_limit():
+    with FakeKlineServer([f'FAKE{i}USDT' for i in range(10)], latency=0) as server:
+        fetcher = KlineFetcher(fake_client(server), weight_per_minute=2400) # 40 weight per second
+        fetcher.bucket.tokens = 0 # budget of the minute spent
+        start = perf_counter()
+        results = fetcher.fetch([(f'FAKE{i}USDT', '1w', START_UTS) for i in range(10)])
+
+        assert all(len(klines) == 52 for klines in results)
+        assert perf_counter() - start >= 10 * KLINE_REQUEST_WEIGHT / 40 * 0.95
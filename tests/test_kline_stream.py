@@ -0,0 +1,80 @@
+from kline_stream import KlineStream, WebsocketTransport, ReplayServer
+from enums import KLINE_STREAM_MAX_AGE
+from time import time, sleep
+import kline_stream
+import json
+
+HOUR_MS = 3600000
+START_UTS = 1609459200000 # 1 Jan 2021 UTC
+
+
+def kline_message(symbol, timeframe, open_uts, close):
+    '''
+    Returns a combined stream kline message as recorded from Binance
+    '''
+
+    return json.dumps({'stream':f'{symbol.lower()}@kline_{timeframe}', 'data':{'e':'kline', 'E':open_uts, 's':symbol, 'k':{
+        't':open_uts, 'T':open_uts + HOUR_MS - 1, 's':symbol, 'i':timeframe, 'o':'10.0', 'c':close, 'h':'11.0', 'l':'9.0',
+        'v':'100', 'n':10, 'x':False, 'q':'1000', 'V':'50', 'Q':'500'}}})
+
+
+def wait_for(condition, timeout=10):
+    end = time() + timeout
+    while not condition():
+        assert time() < end, 'timed out'
+        sleep(0.01)
+
+
+def recording(tmp_path):
+    '''
+    Writes a recording of 5 BTCUSDT_1h candles, each updated once while forming, and one ETHUSDT_1h candle
+    '''
+
+    messages = [kline_message('BTCUSDT', '1h', START_UTS + candle * HOUR_MS, close)
+                for candle in range(5) for close in [f'{candle}.5', f'{candle}.9']]
+    messages.append(kline_message('ETHUSDT', '1h', START_UTS, '3.0'))
+    path = tmp_path / 'recording.jsonl'
+    path.write_text('\n'.join(messages) + '\n')
+    return str(path)
+
+
+def test_replayed_klines_fill_the_ring_buffers(tmp_path):
+    with ReplayServer.from_file(recording(tmp_path)) as server:
+        stream = KlineStream(WebsocketTransport(server.url), buffer_size=3)
+        stream.subscribe('BTCUSDT', '1h')
+        wait_for(lambda : server.sent == 10 and stream.latest_kline('BTCUSDT', '1h') and stream.latest_kline('BTCUSDT', '1h')[4] == '4.9')
+
+        assert [kline[0] for kline in stream.klines('BTCUSDT', '1h')] == [START_UTS + candle * HOUR_MS for candle in [2, 3, 4]]
+        assert [kline[4] for kline in stream.klines('BTCUSDT', '1h')] == ['2.9', '3.9', '4.9'] # forming candles updated in place
+        assert stream.latest_kline('BTCUSDT', '1h') == [START_UTS + 4 * HOUR_MS, '10.0', '11.0', '9.0', '4.9', '100',
+                                                        START_UTS + 5 * HOUR_MS - 1, '1000', 10, '50', '500', '0']
+        assert stream.latest_kline('ETHUSDT', '1h') is None # not subscribed
+        stream.stop()
+
+
+def test_stream_reconnects_and_resubscribes_after_the_connection_drops(tmp_path, caplog):
+    with ReplayServer.from_file(recording(tmp_path)) as server:
+        stream = KlineStream(WebsocketTransport(server.url))
+        stream.subscribe('BTCUSDT', '1h')
+        wait_for(lambda : server.sent == 10)
+        server.messages.append(kline_message('BTCUSDT', '1h', START_UTS + 5 * HOUR_MS, '5.5')) # opens after the drop
+        server.drop()
+        wait_for(lambda : stream.latest_kline('BTCUSDT', '1h') and stream.latest_kline('BTCUSDT', '1h')[0] == START_UTS + 5 * HOUR_MS)
+
+        assert server.num_connections == 2
+        assert len(stream.klines('BTCUSDT', '1h')) == 6
+        assert 'connection lost' in caplog.text
+        stream.stop()
+
+
+def test_stale_stream_falls_back_after_max_age(tmp_path, monkeypatch):
+    with ReplayServer.from_file(recording(tmp_path)) as server:
+        stream = KlineStream(WebsocketTransport(server.url))
+        stream.subscribe('BTCUSDT', '1h')
+        wait_for(lambda : server.sent == 10)
+        stream.stop()
+
+    assert stream.latest_kline('BTCUSDT', '1h')
+    monkeypatch.setattr(kline_stream, 'time', lambda : time() + KLINE_STREAM_MAX_AGE + 1)
+    assert stream.latest_kline('BTCUSDT', '1h') is None # current_score uses the REST api instead
+    assert stream.klines('BTCUSDT', '1h') # still buffered
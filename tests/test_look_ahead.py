@@ -0,0 +1,19 @@
+from fixtures import scored_coin, synthetic_scoring
+from filecmp import cmp
+
+HISTORICAL_DF = synthetic_scoring(days=20, gap_rate=0.005) # peaks look ahead up to two weeks
+THRESHOLD = 'BULL:12|BEAR:12'
+
+
+def test_numpy_engine_matches_loop_engine_fresh_and_resumed(tmp_path):
+    paths = {}
+    for engine in ['loop', 'numpy']:
+        for end_row in [len(HISTORICAL_DF) - 288, len(HISTORICAL_DF)]: # fresh, then resumed after a day of new rows
+            coin = scored_coin(str(tmp_path / engine), HISTORICAL_DF, end_row)
+            paths[engine] = coin.generate_look_ahead_gains('FIXUSDT', [], THRESHOLD, engine=engine)
+    fresh_path = scored_coin(str(tmp_path / 'fresh'), HISTORICAL_DF).generate_look_ahead_gains('FIXUSDT', [], THRESHOLD, engine='numpy')
+
+    assert cmp(paths['loop'], paths['numpy'], shallow=False)
+    assert cmp(paths['numpy'], fresh_path, shallow=False)
+    with open(fresh_path) as f:
+        assert sum(1 for _ in f) > 1 # peaks were found
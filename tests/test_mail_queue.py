@@ -0,0 +1,38 @@
+from mail_queue import MailQueue, BenchmarkTransport
+from message_bus import Mail
+from glob import glob
+import json
+import os
+
+
+def signal_mail(signal, num_users=5):
+    return Mail(f'user{signal % num_users}@gmail.com', f'SIGNAL ALERT: S{signal}', f'signal {signal}#score {signal % 30}', '')
+
+
+def test_every_mail_is_delivered_once_despite_failed_sends(tmp_path):
+    transport = BenchmarkTransport(str(tmp_path / 'sent'), send_time=0, fail_every=3)
+    mail_queue = MailQueue(transport, str(tmp_path / 'spool'), num_workers=2, batch_window=0.01, min_interval=0.02, backoff=0.01)
+    for signal in range(100):
+        mail_queue.put(signal_mail(signal))
+
+    assert mail_queue.join(timeout=30)
+    assert sorted(transport.delivered) == list(range(100))
+    assert mail_queue.stats()['retries'] and not mail_queue.stats()['failed']
+    assert len(glob(str(tmp_path / 'sent' / '*.eml'))) == mail_queue.stats()['digests']
+    assert not glob(str(tmp_path / 'spool' / '*'))
+    for times in transport.send_times.values():
+        assert all(later - earlier >= 0.02 for earlier, later in zip(times, times[1:]))
+
+
+def test_spooled_mail_is_sent_after_a_restart(tmp_path):
+    spool_path = tmp_path / 'spool'
+    os.makedirs(spool_path)
+    for signal in range(10): # queued by a server which stopped before sending
+        with open(spool_path / f'{signal:06d}.json', 'w') as f:
+            json.dump(list(signal_mail(signal)), f)
+    transport = BenchmarkTransport(str(tmp_path / 'sent'), send_time=0, fail_every=0)
+    mail_queue = MailQueue(transport, str(spool_path), num_workers=2, batch_window=0.01, min_interval=0.02, backoff=0.01)
+
+    assert mail_queue.join(timeout=30)
+    assert sorted(transport.delivered) == list(range(10))
+    assert not glob(str(spool_path / '*'))
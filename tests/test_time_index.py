@@ -0,0 +1,29 @@
+from fixtures import synthetic_scoring
+from time_index import TimeIndex
+import pandas as pd
+
+HISTORICAL_DF = synthetic_scoring(days=10, gap_rate=0.005).iloc[:, :5]
+
+
+def test_index_updated_on_append_matches_rebuilt_index(tmp_path):
+    path = str(tmp_path / 'historical_scoring_FIXUSDT.csv')
+    end_row = len(HISTORICAL_DF) - 288
+    HISTORICAL_DF.iloc[:end_row].to_csv(path, index=False)
+    time_index = TimeIndex(path, stride=50)
+    time_index.update()
+    HISTORICAL_DF.iloc[end_row:].to_csv(path, mode='a', header=False, index=False)
+    appended_entries = time_index.update()
+    time_index.remove()
+
+    assert appended_entries.tolist() == time_index.update().tolist()
+
+
+def test_range_read_matches_whole_csv(tmp_path):
+    path = str(tmp_path / 'historical_scoring_FIXUSDT.csv')
+    HISTORICAL_DF.to_csv(path, index=False)
+    full_DF = pd.read_csv(path, index_col=0, header=None, skiprows=1)
+    time_index = TimeIndex(path, stride=50)
+    time_index.update()
+
+    for uts in HISTORICAL_DF['UTS'].iloc[[0, 1, 49, 50, 51, -289, -1]]:
+        assert time_index.read_from(int(uts)).equals(full_DF.loc[uts:])
@@ -0,0 +1,49 @@
+from fixtures import scored_coin, synthetic_scoring, FILENAME_EXT
+from trading_simulation import load_checkpoint
+
+HISTORICAL_DF = synthetic_scoring(days=2)
+NUM_ROWS = len(HISTORICAL_DF)
+
+
+def trade_simulation_path(coin):
+    return f'{coin.trading_simulation_path}/FIXUSDT/trade_simulation_FIXUSDT_{FILENAME_EXT}.csv'
+
+
+def trade_simulation_csv(coin):
+    with open(trade_simulation_path(coin), 'rb') as f:
+        return f.read()
+
+
+def test_numpy_engine_matches_loop_engine(tmp_path):
+    coins = {engine:scored_coin(str(tmp_path / engine), HISTORICAL_DF) for engine in ['loop', 'numpy']}
+    for engine, coin in coins.items():
+        coin.simulate_trading('FIXUSDT', [], engine=engine, rescore=False)
+    assert trade_simulation_csv(coins['numpy']) == trade_simulation_csv(coins['loop'])
+
+    trade_logs = [coin.simulate_trading('FIXUSDT', [], 'BULL:8|BEAR:8', engine=engine, rescore=False) for engine, coin in coins.items()]
+    assert trade_logs[0] == trade_logs[1] and len(trade_logs[0]) > 1
+
+
+def test_resumed_simulation_matches_full_simulation(tmp_path):
+    for engine in ['loop', 'numpy']:
+        full_coin = scored_coin(str(tmp_path / f'{engine}_full'), HISTORICAL_DF)
+        full_coin.simulate_trading('FIXUSDT', [], engine=engine, rescore=False)
+        resumed_coin = scored_coin(str(tmp_path / f'{engine}_resumed'), HISTORICAL_DF, NUM_ROWS - 12)
+        resumed_coin.simulate_trading('FIXUSDT', [], engine=engine, rescore=False)
+        scored_coin(str(tmp_path / f'{engine}_resumed'), HISTORICAL_DF) # the final hour of scores
+        assert load_checkpoint(trade_simulation_path(resumed_coin), int(HISTORICAL_DF['UTS'].iloc[0]))
+        resumed_coin.simulate_trading('FIXUSDT', [], engine=engine, rescore=False)
+
+        assert trade_simulation_csv(resumed_coin) == trade_simulation_csv(full_coin)
+
+
+def test_stale_checkpoint_is_not_resumed(tmp_path):
+    coin = scored_coin(str(tmp_path / 'stale'), HISTORICAL_DF)
+    coin.simulate_trading('FIXUSDT', [], rescore=False)
+    start_uts = int(HISTORICAL_DF['UTS'].iloc[0])
+    assert load_checkpoint(trade_simulation_path(coin), start_uts)
+
+    assert load_checkpoint(trade_simulation_path(coin), start_uts + 300000) == {} # scored from another start
+    with open(trade_simulation_path(coin), 'a') as f:
+        f.write('\n') # csv written by another run
+    assert load_checkpoint(trade_simulation_path(coin), start_uts) == {}
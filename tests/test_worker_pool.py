@@ -0,0 +1,35 @@
+from worker_pool import WorkerPool
+from threading import Lock
+from time import sleep
+import pytest
+
+
+def test_jobs_run_in_submission_order_per_key():
+    pool = WorkerPool(4, name='test_worker')
+    order = {coin:[] for coin in range(20)}
+    running, overlaps, lock = set(), [], Lock()
+    def refresh(coin, count):
+        with lock:
+            overlaps.append(coin in running)
+            running.add(coin)
+        sleep(0.001)
+        order[coin].append(count)
+        with lock:
+            running.discard(coin)
+
+    futures = [pool.submit(coin, refresh, coin, count) for count in range(3) for coin in order]
+    futures += [pool.submit(coin, refresh, coin, count) for coin in order for count in range(3, 6)]
+    [future.result(timeout=10) for future in futures]
+
+    assert all(order[coin] == list(range(6)) for coin in order)
+    assert not any(overlaps) # never two jobs of a key at once
+
+
+def test_job_exception_is_raised_by_its_future():
+    pool = WorkerPool(2, name='test_worker')
+    def fail():
+        raise ValueError('refresh failed')
+
+    with pytest.raises(ValueError):
+        pool.submit('BTC', fail).result(timeout=10)
+    assert pool.submit('BTC', lambda : 'next job').result(timeout=10) == 'next job'
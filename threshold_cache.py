@@ -0,0 +1,70 @@
+from threading import Lock
+from utility import atomic_file
+import json
+import os
+
+'''
+Cache of the optimal signal thresholds of Coin.optimise_signal_threshold, shared by every Coin of the process.
+
+Entries are kept per symbol and timeframe set (filename_ext), in memory and in a json file next to the symbol's
+trade simulations:
+    {filename_ext: {'scored_uts':1650000000000, 'overall':'BULL:12|BEAR:9', 'max':'BULL:14|BEAR:7'}}
+An entry is only valid for the historical scoring it was simulated on, i.e. while the latest scored uts is unchanged.
+Coin.simulate_trading stores the thresholds of every full simulation and Coin.compute_historical_score invalidates
+them once new scores are appended. All access is locked, so coin threads of the notification server can share it.
+'''
+
+
+class ThresholdCache():
+    '''
+    Thread-safe, persisted cache of optimal thresholds, keyed by (json path, filename_ext)
+    '''
+
+    def __init__(self):
+
+        self.entries = {} # json path: {filename_ext: entry}
+        self.lock = Lock()
+
+
+    def symbol_entries(self, path):
+        '''
+        Returns the entries of a json path, loaded on first use. Call with the lock held.
+        '''
+
+        if path not in self.entries:
+            self.entries[path] = {}
+            if os.path.exists(path):
+                try:
+                    with open(path, 'r') as f:
+                        self.entries[path] = json.load(f)
+                except ValueError:
+                    pass # corrupt cache, entries are simulated again
+        return self.entries[path]
+
+
+    def save(self, path):
+        if os.path.isdir(os.path.dirname(path)):
+            with atomic_file(path) as f:
+                json.dump(self.entries[path], f, indent=4)
+
+
+    def get(self, path, filename_ext, scored_uts):
+        '''
+        Returns the cached entry simulated on scores up to scored_uts, or None
+        '''
+
+        with self.lock:
+            entry = self.symbol_entries(path).get(filename_ext)
+            return dict(entry) if entry and entry['scored_uts'] == scored_uts else None
+
+
+    def put(self, path, filename_ext, scored_uts, overall, max_gain):
+        with self.lock:
+            self.symbol_entries(path)[filename_ext] = {'scored_uts':scored_uts, 'overall':overall, 'max':max_gain}
+            self.save(path)
+
+
+    def invalidate(self, path, filename_ext):
+        with self.lock:
+            if self.symbol_entries(path).pop(filename_ext, None):
+                self.save(path)
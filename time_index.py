@@ -0,0 +1,196 @@
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from utility import atomic_file
+import numpy as np
+import sys
+import os
+
+'''
+Sidecar time index of the csv files which start with a header row followed by one row per UTS in ascending order,
+i.e. the historical_scoring csv files and the candlestick csv files of CsvCandleStore.
+
+The index of <file>.csv is <file>.csv.idx, a little endian int64 array of (uts, byte offset, row number) of every
+INDEX_STRIDE'th row (row 0 included), preceded by one (indexed file size, stride, 0) row. Rows are only ever appended
+to these files (the forming candle is rewritten in-place), so the index is extended on append by scanning the bytes
+after its final entry: Coin.candlestick_data_file_marker and the historical scoring writers call update().
+A stale index (e.g. the csv was recreated) is detected and rebuilt.
+
+Seeking a UTS or row number is a binary search of the index followed by reading at most INDEX_STRIDE rows, so
+range reads such as TimeIndex(path).read_from(uts) cost time proportional to the range rather than the history.
+
+Benchmark against reading the whole csv on a synthetic scoring csv with: <python3 time_index.py [DAYS]>
+'''
+
+INDEX_STRIDE = 288 # one day of 5m rows
+
+
+class TimeIndex():
+    '''
+    Sparse UTS -> (byte offset, row number) index of a csv file, persisted next to it
+    '''
+
+    def __init__(self, path, stride=INDEX_STRIDE):
+
+        self.path = path
+        self.index_path = f'{path}.idx'
+        self.stride = stride
+
+
+    def load(self):
+        '''
+        Returns the stored (indexed file size, entries) where entries is an array of (uts, offset, row) rows,
+        or (0, empty entries) when there is no valid index of the csv file
+        '''
+
+        empty = (0, np.empty((0, 3), dtype=np.int64))
+        if not os.path.exists(self.index_path) or not os.path.exists(self.path):
+            return empty
+        index = np.fromfile(self.index_path, dtype='<i8')
+        if len(index) < 6 or len(index) % 3 or index[1] != self.stride:
+            return empty
+        indexed_size, entries = int(index[0]), index[3:].reshape(-1, 3)
+        if indexed_size > os.path.getsize(self.path) or not self.valid_entry(*entries[-1][:2]):
+            return empty # csv was recreated
+        return indexed_size, entries
+
+
+    def valid_entry(self, uts, offset):
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            return f.read(21).startswith(b'%d,' % uts)
+
+
+    def update(self):
+        '''
+        Indexes the rows appended since the last update (all rows when there is no valid index), returns the entries
+        '''
+
+        indexed_size, entries = self.load()
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        if size == indexed_size:
+            return entries
+        with open(self.path, 'rb') as f:
+            if len(entries):
+                _, offset, row = entries[-1].tolist()
+                f.seek(offset)
+            else:
+                f.readline() # header
+                offset, row = f.tell(), 0
+            data = f.read()
+        line_breaks = np.flatnonzero(np.frombuffer(data, dtype=np.uint8) == ord('\n'))
+        starts = np.concatenate([[0], line_breaks + 1])
+        starts = starts[starts < len(data)] # the final line break does not start a row
+        rows = row + np.arange(len(starts))
+        new = (rows % self.stride == 0) & (rows > (row if len(entries) else -1))
+        new_entries = np.array([(int(data[start:data.index(b',', start)]), offset + start, new_row)
+                                for start, new_row in zip(starts[new].tolist(), rows[new].tolist())], dtype=np.int64).reshape(-1, 3)
+        entries = np.concatenate([entries, new_entries])
+        with atomic_file(self.index_path, 'wb') as f:
+            f.write(np.concatenate([[size, self.stride, 0], entries.ravel()]).astype('<i8').tobytes())
+        return entries
+
+
+    def entries(self):
+        '''
+        Returns the entries of the up to date index
+        '''
+
+        indexed_size, entries = self.load()
+        if not len(entries) or indexed_size != os.path.getsize(self.path):
+            entries = self.update()
+        return entries
+
+
+    def seek_uts(self, uts):
+        '''
+        Returns (offset, row) of the indexed row at or before uts (the first row when uts precedes it), or None
+        when the csv has no rows
+        '''
+
+        entries = self.entries()
+        if not len(entries):
+            return None
+        position = max(int(np.searchsorted(entries[:, 0], uts, side='right')) - 1, 0)
+        return tuple(entries[position, 1:].tolist())
+
+
+    def seek_row(self, row):
+        '''
+        Returns (offset, row) of the indexed row at or before row, or None when the csv has no rows
+        '''
+
+        entries = self.entries()
+        if not len(entries):
+            return None
+        position = max(int(np.searchsorted(entries[:, 2], row, side='right')) - 1, 0)
+        return tuple(entries[position, 1:].tolist())
+
+
+    def read_from(self, uts, **read_csv_kwargs):
+        '''
+        Returns the rows with a UTS at or after uts as a DataFrame indexed by UTS (columns 1.., like
+        pd.read_csv(path, index_col=0, header=None, skiprows=1)), reading only from the indexed row before uts
+        '''
+
+        import pandas as pd # Imported on first read, so importing time_index stays cheap (see notification_server)
+
+        position = self.seek_uts(uts)
+        if position is None:
+            return pd.read_csv(self.path, index_col=0, header=None, skiprows=1, **read_csv_kwargs)
+        with open(self.path, 'rb') as f:
+            f.seek(position[0])
+            range_DF = pd.read_csv(f, index_col=0, header=None, **read_csv_kwargs)
+        return range_DF.iloc[range_DF.index.searchsorted(uts):]
+
+
+    def remove(self):
+        if os.path.exists(self.index_path):
+            os.remove(self.index_path)
+
+
+def benchmark_index(days=1095, seed=0):
+    '''
+    Writes a synthetic historical_scoring csv of given days of 5m rows (with missing rows), then times reading the
+    final day (the range of an hourly rerun) through the index against reading the whole csv, which it has to match.
+    Also appends a day of rows to time the index update on append.
+    '''
+
+    from fixtures import synthetic_scoring
+    import pandas as pd
+
+    historical_DF = synthetic_scoring(days, seed, gap_rate=0.001).iloc[:, :5] # Binance maintenance leaves gaps
+    uts = historical_DF['UTS'].to_numpy()
+    end_row = len(uts) - 288
+
+    with TemporaryDirectory() as data_path:
+        path = f'{data_path}/historical_scoring_FIXUSDT.csv'
+        historical_DF.iloc[:end_row].to_csv(path, index=False)
+        time_index = TimeIndex(path)
+        start = perf_counter()
+        time_index.update()
+        build_time = perf_counter() - start
+        historical_DF.iloc[end_row:].to_csv(path, mode='a', header=False, index=False)
+        start = perf_counter()
+        time_index.update()
+        update_time = perf_counter() - start
+
+        start = perf_counter()
+        full_DF = pd.read_csv(path, index_col=0, header=None, skiprows=1)
+        full_DF = full_DF.loc[uts[end_row]:]
+        full_time = perf_counter() - start
+        start = perf_counter()
+        range_DF = time_index.read_from(int(uts[end_row]))
+        range_time = perf_counter() - start
+        appended_entries = time_index.load()[1]
+        time_index.remove()
+        identical = full_DF.equals(range_DF) and appended_entries.tolist() == time_index.update().tolist() # same as rebuilt
+
+    print(f'{days} days of 5m rows ({len(uts)} rows), index built in {build_time:.3f}s, updated on append in {update_time:.4f}s')
+    print(f'final day: whole csv: {full_time:.3f}s | indexed range: {range_time:.4f}s | speed up: {full_time / range_time:.0f}x')
+    print(f'rows identical: {identical}')
+    return identical
+
+
+if __name__ == "__main__":
+    # Example: <python3 time_index.py 1095>
+    sys.exit(0 if benchmark_index(int(sys.argv[1]) if len(sys.argv) > 1 else 1095) else 1)
@@ -0,0 +1,230 @@
+from tempfile import TemporaryDirectory
+from time import perf_counter
+import numpy as np
+import csv
+import io
+import os
+import sys
+
+'''
+Threshold grid kernel for Coin.simulate_trading, the batched alternative to iterating every 5m row per strategy.
+Both engines write identical trade_simulation csv files.
+
+Each strategy (bull threshold, bear threshold) is a state machine driven by the bull/bear score of every row. A row
+only has one of five outcomes for a strategy:
+    NONE = neither threshold met, SELL/BUY = a threshold met with a new signal, HOLD = a threshold met without a new
+    signal (the previous signal is kept), SKIP = both thresholds met (indecision, the row is ignored)
+Repeating the outcome of the previous non SKIP row never changes the state, neither can a row with the same scores as
+the row before it. So the score arrays are split once into runs of equal (bull, bear) scores shared by every strategy,
+and each strategy only steps its state machine through the runs where its outcome changes.
+
+The state of every strategy (the state machine, its last simulated uts and summary holdings) is checkpointed in a
+compact binary file next to the trade_simulation csv, along with the position of the strategy's trade log in the csv.
+Reruns continue every strategy from its checkpoint, so only new 5m rows are simulated, and the csv is rewritten in
+the new overall rank order by copying each stored trade log block from the previous csv and appending its new
+trades, without parsing or holding the previous csv in memory. A missing or stale checkpoint means a full simulation.
+
+Benchmark against the loop engine on a synthetic historical_scoring csv with: <python3 trading_simulation.py [DAYS]>
+'''
+
+NONE, SELL, BUY, HOLD, SKIP = 0, 1, 2, 3, 4
+TRADE_LOG_COLUMNS = ['prev_price', 'price', 'action', 'coin_holdings', 'pair_holdings',
+                     'action_coin_profit', 'action_pair_profit', 'action_coin_gain', 'action_pair_gain']
+CHECKPOINT_DTYPE = np.dtype([('bull_threshold', 'i2'), ('bear_threshold', 'i2'), ('last_uts', 'i8'), ('prev_price', 'f8'), ('prev_signal', 'U4'),
+                             ('holdings', 'f8'), ('move_made', '?'), ('signal', 'U4'), ('num_trades', 'i8'),
+                             ('max_holdings', 'f8'), ('overall', 'f8'), ('last_coin_holdings', 'f8'),
+                             ('block_start', 'i8'), ('block_end', 'i8')]) # trade log position (bytes) in the csv
+
+
+def trade_log_header(strat):
+    return [f'UTS_{strat}', *TRADE_LOG_COLUMNS]
+
+
+def csv_bytes(rows):
+    '''
+    Returns rows encoded as csv.writer writes them
+    '''
+
+    buffer = io.StringIO()
+    csv.writer(buffer, delimiter=',').writerows(rows)
+    return buffer.getvalue().encode()
+
+
+def initial_state(holdings):
+    '''
+    Returns the state of a strategy which has not simulated any rows
+    '''
+
+    return {'last_uts':-1, 'prev_price':0, 'prev_signal':'SELL', 'holdings':holdings, 'move_made':False, 'signal':'',
+            'num_trades':0, 'max_holdings':0, 'overall':0, 'last_coin_holdings':0, 'block_start':0, 'block_end':0}
+
+
+def record_trades(state, trades):
+    '''
+    Updates the summary holdings of a strategy state with its new trades: overall (final coin holdings, or the coin
+    holdings before the final trade when it was a sell) and max coin holdings
+    '''
+
+    for trade in trades:
+        coin_holdings = trade[4]
+        state['max_holdings'] = max(state['max_holdings'], coin_holdings) if state['num_trades'] else coin_holdings
+        state['overall'] = coin_holdings if coin_holdings else state['last_coin_holdings']
+        state['last_coin_holdings'] = coin_holdings
+        state['num_trades'] += 1
+    return state
+
+
+def checkpoint_path(trade_simulation_path):
+    return os.path.splitext(trade_simulation_path)[0] + '.npz'
+
+
+def load_checkpoint(trade_simulation_path, start_uts):
+    '''
+    Returns {strat: state} of the checkpoint of a trade_simulation csv, or {} when there is none or it is stale,
+    i.e. the csv was written by another run or the historical scoring was recomputed from another start uts.
+    '''
+
+    path = checkpoint_path(trade_simulation_path)
+    if not os.path.exists(path) or not os.path.exists(trade_simulation_path):
+        return {}
+    try:
+        with np.load(path) as checkpoint:
+            checkpoint_start_uts, csv_size = checkpoint['meta'].tolist()
+            states = checkpoint['states']
+            if states.dtype != CHECKPOINT_DTYPE:
+                return {} # written by another version
+    except (OSError, ValueError, KeyError):
+        return {}
+    if checkpoint_start_uts != start_uts or csv_size != os.path.getsize(trade_simulation_path):
+        return {}
+    return {f"BULL:{state['bull_threshold']}|BEAR:{state['bear_threshold']}":state
+            for state in (dict(zip(CHECKPOINT_DTYPE.names, row)) for row in states.tolist())}
+
+
+def save_checkpoint(trade_simulation_path, states, start_uts):
+    '''
+    Writes the {strat: state} checkpoint of the trade_simulation csv, which has to be written first
+    '''
+
+    from utility import atomic_file
+
+    records = np.zeros(len(states), dtype=CHECKPOINT_DTYPE)
+    for i, (strat, state) in enumerate(states.items()):
+        state = {**state, 'bull_threshold':int(strat.split('|')[0].split(':')[-1]), 'bear_threshold':int(strat.split(':')[-1])}
+        records[i] = tuple(state[name] for name in CHECKPOINT_DTYPE.names)
+    with atomic_file(checkpoint_path(trade_simulation_path), 'wb') as f:
+        np.savez(f, states=records, meta=np.array([start_uts, os.path.getsize(trade_simulation_path)], dtype=np.int64))
+
+
+def score_runs(bull, bear):
+    '''
+    Returns the first row index of every run of rows with unchanged bull and bear scores
+    '''
+
+    return np.flatnonzero(np.diff(bull, prepend=bull[:1] - 1) | np.diff(bear, prepend=bear[:1] - 1))
+
+
+def row_outcomes(bull, bear, bull_threshold, bear_threshold):
+    '''
+    Returns the outcome (NONE, SELL, BUY, HOLD or SKIP) of each row for the given strategy
+    '''
+
+    bull_met = bull >= bull_threshold
+    bear_met = bear >= bear_threshold
+    outcomes = np.where(bull_met | bear_met, HOLD, NONE)
+    outcomes[bull_met & (bull > bear)] = SELL
+    outcomes[bear_met & (bear > bull)] = BUY
+    outcomes[bull_met & bear_met] = SKIP
+    return outcomes
+
+
+def event_rows(bull, bear, run_starts, bull_threshold, bear_threshold, start_row=0):
+    '''
+    Returns the rows from start_row onwards which can change the state of the given strategy
+    '''
+
+    rows = np.concatenate([[start_row], run_starts[run_starts > start_row]])
+    outcomes = row_outcomes(bull[rows], bear[rows], bull_threshold, bear_threshold)
+    rows, outcomes = rows[outcomes != SKIP], outcomes[outcomes != SKIP]
+    return rows[np.diff(outcomes, prepend=-1) != 0]
+
+
+def simulate_strategy(rows, uts, prices, bull, bear, bull_threshold, bear_threshold, state, trade_log):
+    '''
+    Steps the state machine of Coin.simulate_trading through the given rows, appending trades to trade_log.
+    uts, prices, bull and bear are lists (python scalars keep the rounding identical).
+    state holds prev_price, prev_signal, holdings, move_made and signal (see initial_state), which are updated.
+    '''
+
+    prev_price, prev_signal, holdings = state['prev_price'], state['prev_signal'], state['holdings']
+    move_made, signal = state['move_made'], state['signal']
+    for row in rows:
+        bull_score = bull[row]
+        bear_score = bear[row]
+        if bull_score >= bull_threshold and bull_score > bear_score:
+            signal = 'SELL'
+        elif bear_score >= bear_threshold and bear_score > bull_score:
+            signal = 'BUY'
+        if prev_signal != signal:
+            if bull_score >= bull_threshold or bear_score >= bear_threshold:
+                if not move_made:
+                    move_made = True
+                    price = prices[row]
+                    coin_holdings, coin_profit, coin_gain, pair_holdings, pair_profit, pair_gain = 0, 0, 0, 0, 0, 0
+                    if prev_price == 0:
+                        prev_price = price
+                    if signal == 'BUY':
+                        coin_holdings = round(holdings / price, 5)
+                        coin_profit = round(coin_holdings - (holdings / prev_price), 5)
+                        coin_gain = round((prev_price / price)*100 - 100, 3)
+                    else:
+                        pair_holdings = round(holdings * price, 5)
+                        pair_profit = round(pair_holdings - (holdings * prev_price), 5)
+                        pair_gain = round((price / prev_price)*100 - 100, 3)
+                    trade_log.append([uts[row], prev_price, price, signal, coin_holdings, pair_holdings,
+                                      coin_profit, pair_profit, coin_gain, pair_gain])
+                    holdings = coin_holdings if coin_holdings else pair_holdings
+                    prev_price = price
+            elif move_made:
+                prev_signal = signal
+                move_made = False
+    state.update(prev_price=prev_price, prev_signal=prev_signal, holdings=holdings, move_made=move_made, signal=signal)
+    return state
+
+
+def benchmark_engines(days=30, seed=0):
+    '''
+    Writes a synthetic historical_scoring csv of given days of 5m rows for a fixture coin, then times both
+    simulate_trading engines over the full threshold grid: a full simulation of all but the final hour, the hourly
+    rerun resuming from the checkpoint, and a full simulation of every row, which the rerun has to match.
+    '''
+
+    from fixtures import scored_coin, synthetic_scoring, FILENAME_EXT
+
+    historical_DF = synthetic_scoring(days, seed)
+    num_rows = len(historical_DF)
+    max_score = 6 * len(FILENAME_EXT.split('-'))
+    runs = {'full (all but final hour)':('resumed', num_rows - 12), 'hourly rerun':('resumed', num_rows), 'full':('full', num_rows)}
+    timings, single_trade_logs, csvs = {'loop':{}, 'numpy':{}}, {}, {}
+    with TemporaryDirectory() as data_path:
+        for engine in timings:
+            for run, (name, end_row) in runs.items():
+                coin = scored_coin(f'{data_path}/{engine}_{name}', historical_DF, end_row)
+                start = perf_counter()
+                coin.simulate_trading('FIXUSDT', [], engine=engine)
+                timings[engine][run] = perf_counter() - start
+                with open(f'{coin.trading_simulation_path}/FIXUSDT/trade_simulation_FIXUSDT_{FILENAME_EXT}.csv', 'rb') as f:
+                    csvs[(engine, name)] = f.read()
+            single_trade_logs[engine] = scored_coin(f'{data_path}/{engine}', historical_DF).simulate_trading('FIXUSDT', [], 'BULL:12|BEAR:9', engine=engine)
+        identical = len(set(csvs.values())) == 1 and single_trade_logs['loop'] == single_trade_logs['numpy']
+
+    print(f'{days} days of 5m rows ({num_rows} rows), {(max_score - 2)**2} strategies')
+    for run in runs:
+        print(f"{run}: loop engine: {timings['loop'][run]:.2f}s | numpy engine: {timings['numpy'][run]:.2f}s")
+    print(f'trade_simulation csv of both engines, resumed and full, and single threshold trade log identical: {identical}')
+    return identical
+
+
+if __name__ == "__main__":
+    # Example: <python3 trading_simulation.py 90>
+    sys.exit(0 if benchmark_engines(int(sys.argv[1]) if len(sys.argv) > 1 else 30) else 1)
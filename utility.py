@@ -1,4 +1,7 @@
 from enums import SYMBOLS_URL1, SYMBOLS_URL2, SYMBOLS_URL3, DEFAULT_SCORING_TIMEFRAMES
+from contextlib import contextmanager
+import shutil
+import os
 
 def get_url(mode):
 	if mode == "spot":
@@ -28,6 +31,26 @@ def get_filename_extension(custom_timeframes=[]):
     return '-'.join(custom_timeframes) if custom_timeframes else '-'.join(DEFAULT_SCORING_TIMEFRAMES)
 
 
+@contextmanager
+def atomic_file(path, mode='w'):
+    '''
+    Yields a temporary file which replaces path once writing succeeded, so readers never see a partially written file.
+    Mode 'a' starts from a copy of the existing file, binary modes (e.g. 'wb') are supported.
+    '''
+
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    if mode == 'a' and os.path.exists(path):
+        shutil.copyfile(path, tmp_path)
+    try:
+        with open(tmp_path, mode, newline=None if 'b' in mode else '') as f:
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
 def loading_bar():
 	# Use this functions throughout the processes that take noticeable time in server/get_candles
 	pass
\ No newline at end of file
@@ -0,0 +1,155 @@
+from concurrent.futures import Future
+from collections import deque
+from threading import Thread, Lock, Condition
+from time import monotonic, perf_counter, sleep
+from enums import MONITOR_WORKERS
+import os
+import sys
+
+'''
+Bounded worker pool of the notification server, which runs the refresh and drop jobs of every monitored coin on
+a fixed number of threads instead of one thread per coin.
+
+Jobs are submitted with a key (the coin) and run in submission order per key, never two of a key at once, as a
+Coin object is not thread-safe. Different keys run concurrently on the workers:
+    coin_pool = WorkerPool(MONITOR_WORKERS)
+    future = coin_pool.submit('BTC', refresh_coin, 'BTC')
+    future.result() # waits for the job, raises its exception
+Only keys with queued jobs take a place in the ready queue, so idle coins cost nothing and a coin with a long job
+(e.g. a first database download) holds one worker while the other coins carry on.
+
+stats() reports the queue depth and the wait (submitted to started) and run times of recent jobs.
+Size the pool with MONITOR_WORKERS (None is 4 workers per cpu up to 32, as the jobs mostly wait on Binance and disk).
+
+Compare against one thread per coin on sleeping jobs with: <python3 worker_pool.py [COINS] [WORKERS]>
+'''
+
+LATENCY_WINDOW = 1000 # number of recent jobs of the latency stats
+
+
+class WorkerPool():
+    '''
+    Fixed size thread pool running jobs serially per key
+    '''
+
+    def __init__(self, num_workers=MONITOR_WORKERS, name='coin_worker'):
+
+        self.num_workers = num_workers or min(32, 4 * (os.cpu_count() or 1))
+        self.jobs = {} # key: deque of (future, callback, args, submitted time)
+        self.ready = deque() # keys with queued jobs and no running job
+        self.running = set() # keys with a running job
+        self.num_queued = 0
+        self.completed, self.failed = 0, 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW) # (wait, run) seconds of recent jobs
+        self.condition = Condition(Lock())
+        for number in range(self.num_workers):
+            Thread(target=self.run, name=f'{name}_{number}', daemon=True).start()
+
+
+    def submit(self, key, callback, *args):
+        '''
+        Queues callback(*args) behind the other jobs of key, returns a Future of its result
+        '''
+
+        future = Future()
+        with self.condition:
+            self.jobs.setdefault(key, deque()).append((future, callback, args, monotonic()))
+            self.num_queued += 1
+            if key not in self.running and len(self.jobs[key]) == 1:
+                self.ready.append(key)
+                self.condition.notify()
+        return future
+
+
+    def queued(self, key):
+        '''
+        Returns the number of jobs of key waiting to start
+        '''
+
+        with self.condition:
+            return len(self.jobs.get(key, ()))
+
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.ready:
+                    self.condition.wait()
+                key = self.ready.popleft()
+                future, callback, args, submitted = self.jobs[key].popleft()
+                if not self.jobs[key]:
+                    self.jobs.pop(key)
+                self.num_queued -= 1
+                self.running.add(key)
+            started = monotonic()
+            failed = False
+            if future.set_running_or_notify_cancel(): # cancelled futures are not started
+                try:
+                    future.set_result(callback(*args))
+                except Exception as e:
+                    print(f'Error: {key} job {getattr(callback, "__name__", callback)} raised {e!r}')
+                    future.set_exception(e)
+                    failed = True
+            with self.condition:
+                self.running.discard(key)
+                if failed:
+                    self.failed += 1
+                else:
+                    self.completed += 1
+                self.latencies.append((started - submitted, monotonic() - started))
+                if key in self.jobs:
+                    self.ready.append(key)
+                    self.condition.notify()
+
+
+    def stats(self):
+        '''
+        Returns queue depth, job counts and the mean/max wait and run seconds of the last LATENCY_WINDOW jobs
+        '''
+
+        with self.condition:
+            waits = [wait for wait, _ in self.latencies]
+            runs = [run for _, run in self.latencies]
+            return {'workers':self.num_workers, 'queued':self.num_queued, 'running':len(self.running),
+                    'completed':self.completed, 'failed':self.failed,
+                    'mean_wait':round(sum(waits) / len(waits), 4) if waits else 0, 'max_wait':round(max(waits, default=0), 4),
+                    'mean_run':round(sum(runs) / len(runs), 4) if runs else 0, 'max_run':round(max(runs, default=0), 4)}
+
+
+def benchmark_pool(num_coins=500, num_workers=16, rounds=3, job_time=0.005):
+    '''
+    Runs rounds of one refresh job (sleeping job_time, like waiting on a request) for num_coins coins, on one
+    thread per coin and on the pool, then queues two more jobs per coin at once to check they run in order per coin.
+    '''
+
+    start = perf_counter()
+    for _ in range(rounds):
+        threads = [Thread(target=sleep, args=(job_time,), daemon=True) for _ in range(num_coins)]
+        [thread.start() for thread in threads]
+        [thread.join() for thread in threads]
+    thread_time = perf_counter() - start
+
+    pool = WorkerPool(num_workers, name='benchmark_worker')
+    order = {coin:[] for coin in range(num_coins)}
+    def refresh(coin, count):
+        sleep(job_time)
+        order[coin].append(count)
+    start = perf_counter()
+    for count in range(rounds):
+        futures = [pool.submit(coin, refresh, coin, count) for coin in range(num_coins)]
+        [future.result() for future in futures]
+    pool_time = perf_counter() - start
+    futures = [pool.submit(coin, refresh, coin, count) for coin in range(num_coins) for count in [rounds, rounds + 1]]
+    [future.result() for future in futures]
+    in_order = all(order[coin] == list(range(rounds + 2)) for coin in order)
+
+    print(f'{num_coins} coins, {rounds} rounds of {job_time * 1000:.0f}ms jobs')
+    print(f'thread per coin: {thread_time:.3f}s with {num_coins} threads | pool: {pool_time:.3f}s with {num_workers} threads')
+    print(f'pool stats: {pool.stats()}')
+    print(f'jobs ran in order per coin: {in_order}')
+    return in_order
+
+
+if __name__ == "__main__":
+    # Example: <python3 worker_pool.py 500 16>
+    sys.exit(0 if benchmark_pool(*[int(arg) for arg in sys.argv[1:3]]) else 1)